@@ -0,0 +1,123 @@
+from NeuralNetwork.matrix_net import MatrixNet, count_links
+import numpy as np
+
+"""
+Genome Pool Object
+variables:
+    nn_shape (tuple): shape of every network of the pool (inputs, outputs, hidden nodes, hidden layers)
+    capacity (int): the most networks a generation can have
+    depth (int): number of generations whose networks stay valid at once
+    num_links (int): number of links of every network
+    buffers (ndarray): (depth x capacity x links) weights of every network of the pool
+    nets (list): one list of capacity MatrixNets per generation slot, each a view over its row of buffers
+    active (int): slot of buffers holding the newest generation
+    scratch (ndarray): (2 x capacity x links) buffer for the random draws of a mutation
+    mutate_mask (ndarray): (capacity x links) buffer marking the links getting a large mutation
+    mutate_rows (ndarray): (capacity x 1) buffer marking the networks that get mutated at all
+    num_bred (int): number of networks of the last bred generation
+purpose:
+    breeds generations of networks into preallocated weight buffers, reusing the same MatrixNet objects every time
+    instead of creating new ones, and mutates a whole generation with a single batched random draw
+Notes:
+    Breeding writes over the slot after the active one, so a network from the pool is only valid for depth - 1 more
+    generations. Keep depth above the number of generations whose cars are kept around (like GenerationArchive's window),
+    and copy (create_copy) any network that has to live longer.
+"""
+class GenomePool:
+
+    """
+    Constructor
+    parameters:
+        nn_shape (tuple): inputs, outputs, hidden nodes and hidden layers of the networks
+        capacity (int): the most networks a generation can have
+        depth (int): number of generations whose networks stay valid at once (at least 2)
+    result:
+        allocates every buffer of the pool and creates the MatrixNet views over it
+    return:
+        Genome Pool object
+    """
+    def __init__(self, nn_shape, capacity, depth=2):
+        assert depth >= 2
+        self.nn_shape = tuple(nn_shape)
+        self.capacity = capacity
+        self.depth = depth
+
+        num_in_nodes, num_out_nodes, num_hidden_nodes, num_hidden_layers = self.nn_shape
+        self.num_links = count_links([num_in_nodes] + [num_hidden_nodes] * num_hidden_layers + [num_out_nodes])
+
+        self.buffers = np.zeros((depth, capacity, self.num_links))
+        self.nets = [[MatrixNet(*self.nn_shape, weights=self.buffers[slot, i]) for i in range(capacity)] for slot in range(depth)]
+        self.active = 0
+
+        self.scratch = np.empty((2, capacity, self.num_links))
+        self.mutate_mask = np.empty((capacity, self.num_links), dtype=bool)
+        self.mutate_rows = np.empty((capacity, 1), dtype=bool)
+        self.num_bred = 0
+
+    """
+    function: breed
+    parameters:
+        source_nets (list): network every network of the new generation comes from (any MatrixNets of the pool's shape)
+        mutation_factors (list): mutation factor of every new network (as in MatrixNet.create_mutation), None for an exact copy
+        rng (Generator): numpy random generator drawing the mutations
+    results:
+        writes the new generation into the next slot of the pool: copies the source weights, then mutates the rows that
+        have a mutation factor, with the same comp_factor / rand_factor rule as MatrixNet.create_mutation
+    returns:
+        (list) the pool's networks holding the new generation, in the order of source_nets
+    """
+    def breed(self, source_nets, mutation_factors, rng):
+        num_nets = len(source_nets)
+        assert num_nets <= self.capacity
+
+        # the sources may live in any slot (even the one being written), so they are all read before any row is written
+        slot = (self.active + 1) % self.depth
+        weights = self.buffers[slot, :num_nets]
+        changes, values = self.scratch[:, :num_nets]
+        for i, nn in enumerate(source_nets):
+            changes[i] = nn.weights
+        np.copyto(weights, changes)
+
+        comp_factors = np.zeros((num_nets, 1))
+        rand_factors = np.zeros((num_nets, 1))
+        mutate_rows = self.mutate_rows[:num_nets]
+        for i, mutation_factor in enumerate(mutation_factors):
+            mutate_rows[i] = mutation_factor is not None
+            if mutation_factor is not None:
+                comp_factors[i] = mutation_factor / 120
+                rand_factors[i] = mutation_factor / 1
+
+        # one draw gives every link a uniform value to pick its kind of change, and one to size it
+        rng.random(out=self.scratch[:, :num_nets])
+
+        # each link gets a -0.5 to 0.5 * rand_factor change with a chance of comp_factor, else a tiny -5e-7 to 5e-7 one
+        mutate_mask = self.mutate_mask[:num_nets]
+        np.less(changes, comp_factors, out=mutate_mask)
+        np.subtract(values, 0.5, out=values)
+        np.multiply(values, 0.000001, out=changes)
+        np.multiply(values, rand_factors, out=values)
+        np.copyto(changes, values, where=mutate_mask)
+        np.add(weights, changes, out=weights, where=mutate_rows)
+
+        self.active = slot
+        self.num_bred = num_nets
+        for nn in self.nets[slot][:num_nets]:
+            nn.weights_changed()
+        return self.nets[slot][:num_nets]
+
+    """
+    function: mutation_stats
+    parameters: none
+    results:
+        summarizes the mutations of the last bred generation from the buffers breed left behind
+    returns:
+        (dict) number of mutated networks, number of links that got a large change and the mean size of the changes
+    """
+    def mutation_stats(self):
+        mutate_rows = self.mutate_rows[:self.num_bred, 0]
+        changes = self.scratch[0, :self.num_bred][mutate_rows]
+        return {
+            'mutated_nets': int(np.count_nonzero(mutate_rows)),
+            'large_changes': int(np.count_nonzero(self.mutate_mask[:self.num_bred][mutate_rows])),
+            'mean_abs_change': float(np.abs(changes).mean()) if len(changes) > 0 else 0.0,
+        }
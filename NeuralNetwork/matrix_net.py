@@ -0,0 +1,196 @@
+import random
+import numpy as np
+
+"""
+Matrix Neural Net Object
+variables:
+    parameters
+    layer_sizes (list): number of nodes within each layer, starting from the input layer and ending with the output layer
+    weights (ndarray): flat array storing every link modifier of the network, layer after layer
+    matrices (list): views into weights, one (left layer size x right layer size) matrix per pair of neighbouring layers
+    scales (list): the 1 / len(layer) scale of every left layer
+    scaled_matrices (list): every matrix multiplied by its scale, built on the first forward pass (None until then)
+purpose:
+    same network as NeuralNet, but each layer is stored as a contiguous weight matrix and run as a vectorized forward pass
+Notes:
+    matrices[l][i][j] holds the modifier of the link from node i of layer l to node j of layer l + 1. NeuralNet creates its
+    links right node by right node, so the random values are drawn in that order to give the exact same network for a seed.
+    The forward pass is one vector-matrix product per layer with the scale folded into the matrix, so its outputs only
+    agree with NeuralNet's up to rounding. Code that writes into weights in place (GenomePool) has to call weights_changed.
+"""
+class MatrixNet:
+
+    """
+    Constructor
+    parameters:
+        num_in_nodes (int): number of input nodes for neural net
+        num_out_nodes (int): number of output nodes for neural net
+        num_hidden_nodes (int): number of nodes within each hidden layer
+        num_hidden_layers (int): number of hidden layers within neural net
+        weights (ndarray): optional flat array of link modifiers to use instead of random ones (not copied)
+    result:
+        creates a new Matrix Neural Network object, with random -1 to 1 link values unless weights are given
+    return:
+        Matrix Neural Network object
+    """
+    def __init__(self, num_in_nodes, num_out_nodes, num_hidden_nodes, num_hidden_layers, weights=None):
+
+        # initialize parameters
+        self.num_in_nodes = num_in_nodes
+        self.num_out_nodes = num_out_nodes
+        self.num_hidden_nodes = num_hidden_nodes
+        self.num_hidden_layers = num_hidden_layers
+
+        self.layer_sizes = [num_in_nodes] + [num_hidden_nodes] * num_hidden_layers + [num_out_nodes]
+        num_links = count_links(self.layer_sizes)
+
+        # draws a random value for every link in the same order NeuralNet would (per right node, then per left node)
+        if weights is None:
+            weights = np.empty(num_links)
+            offset = 0
+            for n_left, n_right in zip(self.layer_sizes[:-1], self.layer_sizes[1:]):
+                drawn = [random.random() * 2 - 1 for _ in range(n_left * n_right)]
+                weights[offset:offset + n_left * n_right] = np.array(drawn).reshape(n_right, n_left).T.ravel()
+                offset += n_left * n_right
+
+        assert len(weights) == num_links
+        self.weights = weights
+
+        # creates the per layer matrix views and the 1 / len(layer) scale of every left layer
+        self.matrices = list()
+        self.scales = list()
+        offset = 0
+        for n_left, n_right in zip(self.layer_sizes[:-1], self.layer_sizes[1:]):
+            self.matrices.append(self.weights[offset:offset + n_left * n_right].reshape(n_left, n_right))
+            self.scales.append(1 / n_left)
+            offset += n_left * n_right
+        self.scaled_matrices = None
+
+        self.out_values = [0] * num_out_nodes
+
+    """
+    function: run_neural_network
+    parameters:
+        input_values (list): list of input values
+    results:
+        runs neural network given the input, and returns the output
+    return:
+        (list) values of output layer
+    """
+    def run_neural_network(self, input_values):
+
+        # makes sure the # of input variables is the same as the # of input nodes on network
+        assert self.num_in_nodes == len(input_values)
+
+        # folds the 1 / len(left layer) scales into the matrices once
+        if self.scaled_matrices is None:
+            self.scaled_matrices = [matrix * scale for matrix, scale in zip(self.matrices, self.scales)]
+
+        # pushes the values through every layer, each right value the sum of left value * link modifier * (1 / len(left layer))
+        values = np.asarray(input_values, dtype=float)
+        for matrix in self.scaled_matrices:
+            values = values @ matrix
+
+        # stores and returns the output values as a plain list
+        self.out_values = values.tolist()
+        return list(self.out_values)
+
+    """
+    function: create_mutation
+    parameters:
+        mutation_factor (float): how strongly the new neural net gets mutated
+    results:
+        creates a new neural net mutated from the source neural net
+    returns:
+        (MatrixNet) mutation of given neural net
+    """
+    def create_mutation(self, mutation_factor):
+
+        # NeuralNet drew a random value for each link of its blank mutation, draw them too so seeded runs stay the same
+        for _ in range(len(self.weights)):
+            random.random()
+
+        comp_factor = mutation_factor / 120
+        rand_factor = mutation_factor / 1
+
+        # goes through each link (in NeuralNet's link order) and slightly modifies it
+        changes = np.empty(len(self.weights))
+        for i in link_order(self.layer_sizes):
+            if random.random() < comp_factor:
+                changes[i] = random.random() * rand_factor - 0.5 * rand_factor
+            else:
+                changes[i] = random.random() * 0.000001 - 0.0000005
+
+        # returns newly created mutated neural network object
+        return self.create_from_weights(self.weights + changes)
+
+    """
+    function: create_copy
+    parameters: none
+    results:
+        creates a new neural network that is an exact copy of the source neural net
+    returns:
+        (MatrixNet) copy of given neural net
+    """
+    def create_copy(self):
+
+        # NeuralNet drew a random value for each link of its copy, draw them too so seeded runs stay the same
+        for _ in range(len(self.weights)):
+            random.random()
+
+        return self.create_from_weights(self.weights.copy())
+
+    """
+    function: weights_changed
+    parameters: none
+    results:
+        drops the scaled matrices, so the next forward pass uses the weights as they are now
+    returns:
+        none
+    """
+    def weights_changed(self):
+        self.scaled_matrices = None
+
+    """
+    function: create_from_weights
+    parameters:
+        weights (ndarray): flat array of link modifiers for the new neural net
+    results:
+        creates a neural net with the same shape as the source neural net and the given link values
+    returns:
+        (MatrixNet) new neural net
+    """
+    def create_from_weights(self, weights):
+        return MatrixNet(self.num_in_nodes, self.num_out_nodes, self.num_hidden_nodes, self.num_hidden_layers, weights)
+
+    def get_out_values(self):
+        return list(self.out_values)
+
+'''
+count_links function
+parameters:
+    layer_sizes (list): number of nodes within each layer
+results:
+    counts the links of a fully connected network with the given layers
+returns:
+    (int) number of links
+'''
+def count_links(layer_sizes):
+    return sum(n_left * n_right for n_left, n_right in zip(layer_sizes[:-1], layer_sizes[1:]))
+
+'''
+link_order function
+parameters:
+    layer_sizes (list): number of nodes within each layer
+results:
+    maps NeuralNet's link order onto the flat weights of a MatrixNet
+returns:
+    (ndarray) index into MatrixNet.weights of every NeuralNet link, in the order of NeuralNet.links
+'''
+def link_order(layer_sizes):
+    order = list()
+    offset = 0
+    for n_left, n_right in zip(layer_sizes[:-1], layer_sizes[1:]):
+        order.append(np.arange(n_left * n_right).reshape(n_left, n_right).T.ravel() + offset)
+        offset += n_left * n_right
+    return np.concatenate(order)
@@ -0,0 +1,96 @@
+import numpy as np
+
+"""
+Population Neural Net Object
+variables:
+    layer_sizes (list): number of nodes within each layer, shared by every network of the population
+    num_nets (int): number of networks in the population
+    rows (ndarray): indices of the networks currently held in matrices (dead networks get dropped over time)
+    matrices (list): one (len(rows) x left layer size x right layer size) weight tensor per pair of neighbouring layers
+    scales (list): the 1 / len(layer) scale of every left layer
+purpose:
+    runs the neural networks of a whole generation at once, with one batched matrix operation per layer
+Notes:
+    All networks must have the same shape. The products are summed over the left layer axis in the order NeuralNet adds
+    them, so each network's outputs are exactly the ones its NeuralNet would give (MatrixNet.run_neural_network agrees
+    up to rounding).
+"""
+class PopulationNet:
+
+    """
+    Constructor
+    parameters:
+        layer_sizes (list): number of nodes within each layer
+        weights (ndarray): (number of networks x number of links) array, each row laid out like MatrixNet.weights
+    result:
+        creates the batched weight tensors of every layer
+    return:
+        Population Neural Net object
+    """
+    def __init__(self, layer_sizes, weights):
+        self.layer_sizes = list(layer_sizes)
+        self.num_nets = len(weights)
+        self.rows = np.arange(self.num_nets)
+
+        self.matrices = list()
+        self.scales = list()
+        offset = 0
+        for n_left, n_right in zip(self.layer_sizes[:-1], self.layer_sizes[1:]):
+            layer_weights = weights[:, offset:offset + n_left * n_right]
+            self.matrices.append(np.ascontiguousarray(layer_weights).reshape(self.num_nets, n_left, n_right))
+            self.scales.append(1 / n_left)
+            offset += n_left * n_right
+
+    """
+    function: run_population
+    parameters:
+        input_values (ndarray): (number of networks x number of input nodes) input values
+        mask (ndarray): optional boolean array, False for networks that do not need to run (crashed cars)
+    results:
+        runs every live network of the population on its row of input values
+    return:
+        (ndarray) (number of networks x number of output nodes) output values, 0 for the masked out networks
+    """
+    def run_population(self, input_values, mask=None):
+        input_values = np.asarray(input_values, dtype=float)
+        assert input_values.shape == (self.num_nets, self.layer_sizes[0])
+
+        # drops the dead networks from the weight tensors once they make up half of them
+        if mask is not None and np.count_nonzero(mask[self.rows]) <= len(self.rows) // 2:
+            self.keep_rows(np.flatnonzero(mask[self.rows]))
+
+        # pushes the values of every network through each layer at once
+        values = input_values[self.rows]
+        for matrix, scale in zip(self.matrices, self.scales):
+            values = (values[:, :, None] * matrix * scale).sum(axis=1)
+
+        out_values = np.zeros((self.num_nets, self.layer_sizes[-1]))
+        out_values[self.rows] = values
+        if mask is not None:
+            out_values[~mask] = 0
+        return out_values
+
+    """
+    function: keep_rows
+    parameters:
+        keep (ndarray): positions within rows of the networks to keep
+    results:
+        shrinks the weight tensors down to the kept networks
+    returns:
+        none
+    """
+    def keep_rows(self, keep):
+        self.rows = self.rows[keep]
+        self.matrices = [matrix[keep] for matrix in self.matrices]
+
+'''
+stack_nets function
+parameters:
+    nets (list): MatrixNets of the same shape, one per car
+results:
+    stacks the weights of every network into one population network
+returns:
+    (PopulationNet) batched version of the given networks
+'''
+def stack_nets(nets):
+    return PopulationNet(nets[0].layer_sizes, np.stack([nn.weights for nn in nets]))
@@ -0,0 +1,179 @@
+from NeuralNetwork.matrix_net import MatrixNet
+import collections, json, os, struct, tempfile
+import numpy as np
+
+'''
+Generation Archive Object
+variables:
+    window (int): number of most recent generations kept as Car objects
+    recent (deque): (generation, ranked cars, fitness) of the generations within the window, oldest first
+    path (str): path of the append-only file holding the older generations
+    is_temp_file (bool): whether the file was created by the archive (and gets removed by close)
+    nn_shape (tuple): shape of the archived neural networks (inputs, outputs, hidden nodes, hidden layers)
+    record_dtype (dtype): layout of one archived car (generation, rank, fitness, color, float32 weights)
+    header_size (int): number of bytes before the first record of the file
+    num_records (int): number of cars written to the file
+    generation_records (dict): maps an archived generation to the (first record, number of records) of its cars
+purpose:
+    keeps memory bounded over long runs: only the last few generations stay as cars, older ones are kept as flat float32
+    weight vectors (plus fitness and color) in a memory-mapped file, from which any past champion can be looked up
+Notes:
+    The file starts with 8 bytes "GENARCH1", a 4 byte header length and a JSON header holding the network shape. The
+    records follow, padded to 8 bytes. Archived weights are float32, so a rebuilt network is only as exact as that.
+'''
+class GenerationArchive:
+
+    '''
+    Constructor
+    parameters:
+        window (int): number of most recent generations to keep as Car objects
+        path (str): optional path of the archive file (a temporary file is used by default)
+    results:
+        creates an empty archive
+    returns:
+        a generation archive object
+    '''
+    def __init__(self, window=10, path=None):
+        self.window = window
+        self.recent = collections.deque()
+
+        self.is_temp_file = path is None
+        if path is None:
+            file_handle, path = tempfile.mkstemp(suffix=".genarch")
+            os.close(file_handle)
+        self.path = path
+        self.file = None
+
+        self.nn_shape = None
+        self.record_dtype = None
+        self.header_size = 0
+        self.num_records = 0
+        self.generation_records = dict()
+        self.records = None
+
+    '''
+    add function
+    parameters:
+        generation (int): number of the finished generation
+        ranked_cars (list): cars of the generation, best first
+        fitness (list): total distance of every car, best first
+    results:
+        adds the generation to the window, and writes the generations that fall out of it to the file
+    returns:
+        none
+    '''
+    def add(self, generation, ranked_cars, fitness):
+        self.recent.append((generation, ranked_cars, fitness))
+        while len(self.recent) > self.window:
+            self.write_generation(*self.recent.popleft())
+
+    '''
+    write_generation function
+    parameters:
+        generation (int): number of the generation
+        ranked_cars (list): cars of the generation, best first
+        fitness (list): total distance of every car, best first
+    results:
+        appends one record per car to the archive file
+    returns:
+        none
+    '''
+    def write_generation(self, generation, ranked_cars, fitness):
+        if self.file is None:
+            self.open_file(ranked_cars[0].nn)
+
+        records = np.zeros(len(ranked_cars), dtype=self.record_dtype)
+        records['generation'] = generation
+        records['rank'] = np.arange(len(ranked_cars))
+        records['fitness'] = fitness
+        records['color'] = [car.color for car in ranked_cars]
+        records['weights'] = np.stack([car.nn.weights for car in ranked_cars])
+
+        self.file.write(records.tobytes())
+        self.file.flush()
+
+        self.generation_records[generation] = (self.num_records, len(ranked_cars))
+        self.num_records += len(ranked_cars)
+
+    '''
+    open_file function
+    parameters:
+        nn (MatrixNet): a network of the population, giving the shape of the records
+    results:
+        creates the archive file and writes its header
+    returns:
+        none
+    '''
+    def open_file(self, nn):
+        self.nn_shape = (nn.num_in_nodes, nn.num_out_nodes, nn.num_hidden_nodes, nn.num_hidden_layers)
+        self.record_dtype = np.dtype([('generation', '<u4'), ('rank', '<u4'), ('fitness', '<f4'), ('color', 'u1', (3,)),
+                                      ('weights', '<f4', (len(nn.weights),))], align=True)
+
+        header = json.dumps({'nn_shape': self.nn_shape}).encode()
+        header += b' ' * (-(12 + len(header)) % 8)
+        self.header_size = 12 + len(header)
+
+        self.file = open(self.path, 'wb')
+        self.file.write(b'GENARCH1' + struct.pack('<I', len(header)) + header)
+
+    '''
+    get_records function
+    parameters:
+        generation (int): number of an archived generation
+    results:
+        memory-maps the archive file (again, if records were written since it was last mapped)
+    returns:
+        (ndarray) the records of the generation's cars, best first
+    '''
+    def get_records(self, generation):
+        if self.records is None or len(self.records) < self.num_records:
+            self.records = np.memmap(self.path, dtype=self.record_dtype, mode='r', offset=self.header_size, shape=(self.num_records,))
+
+        first, count = self.generation_records[generation]
+        return self.records[first:first + count]
+
+    '''
+    get_champion function
+    parameters:
+        generation (int): number of a finished generation
+    results:
+        looks the best car of the generation up, from the window or from the archive file
+    returns:
+        (3 tuple) the champion's neural network (MatrixNet), total distance and color
+    '''
+    def get_champion(self, generation):
+        for recent_generation, ranked_cars, fitness in self.recent:
+            if recent_generation == generation:
+                return ranked_cars[0].nn, fitness[0], ranked_cars[0].color
+
+        record = self.get_records(generation)[0]
+        nn = MatrixNet(*self.nn_shape, weights=record['weights'].astype(float))
+        return nn, float(record['fitness']), tuple(int(c) for c in record['color'])
+
+    '''
+    get_generations function
+    parameters:
+        none
+    results:
+        lists every generation the archive knows of
+    returns:
+        (list) the generation numbers, oldest first
+    '''
+    def get_generations(self):
+        return sorted(self.generation_records) + [generation for generation, _, _ in self.recent]
+
+    '''
+    close function
+    parameters:
+        none
+    results:
+        closes the archive file, and removes it if it was a temporary file
+    returns:
+        none
+    '''
+    def close(self):
+        self.records = None
+        if self.file is not None:
+            self.file.close()
+        if self.is_temp_file and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,438 @@
+from level_generator import Level, generate_level
+from car import Car
+from sensors import RaySensor
+from physics import CarPhysics
+from simulation import Simulation
+from scheduler import GenerationScheduler
+from checkpoint import load_checkpoint
+from NeuralNetwork.neural_net import NeuralNet
+from NeuralNetwork.matrix_net import MatrixNet
+from trainer import evaluate_generation, rank_cars, train
+import argparse, functools, json, math, os, random, shutil, sys, tempfile, time
+import numpy as np
+
+# final total distance of every car of a few training runs, which every optimization has to keep exactly
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_golden.json")
+
+# a trained population (a checkpoint of 50 cars, with the random state seeded to 82), so the golden runs and the generation
+# benchmark drive hundreds of ticks over many segments instead of crashing into the first corner like untrained cars
+POPULATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_population.bin")
+
+# settings of the golden training runs, which carry on from the trained population (a new level is generated for generation 3)
+GOLDEN_SETTINGS = dict(generations=4, new_level_settings=(100, 20000, 200, 300), level_interval=3, max_cycle_time=600)
+
+# the golden runs: the segment walking sensor, and the compiled sensor with a scheduler strict enough to stop a slow car
+GOLDEN_RUNS = {
+    'walk': dict(compiled=False, scheduler=None),
+    'compiled_scheduled': dict(compiled=True, scheduler=dict(window=100, check_interval=25, min_progress=475)),
+}
+
+# every generation of every golden run has to last this many ticks and get a car this many segments into its level, and the
+# scheduled run has to stop at least one car, or the golden check would no longer cover those paths
+GOLDEN_MIN_TICKS = 500
+GOLDEN_MIN_SEGMENTS = 10
+GOLDEN_MIN_RETIRED = 1
+
+# the scheduler check runs the trained population with and without the default scheduler on its own level and on the
+# levels of these seeds, for up to SCHEDULER_CHECK_TICKS ticks
+SCHEDULER_CHECK_SEEDS = (1, 2)
+SCHEDULER_CHECK_TICKS = 1500
+
+'''
+time_ticks function
+parameters:
+    run_ticks (function): function simulating the given number of ticks
+    ticks (int): number of ticks to time
+    rounds (int): number of times to time it (the fastest round counts)
+results:
+    times the function, keeping the best round to filter out noise from other processes
+returns:
+    (float) seconds the fastest round took
+'''
+def time_ticks(run_ticks, ticks, rounds=3):
+    best = None
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        run_ticks(ticks)
+        seconds = time.perf_counter() - start_time
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+'''
+print_row function
+parameters:
+    name (str): name of the benchmark
+    seconds (float): seconds the benchmark took
+    ticks (int): number of ticks (or calls) the benchmark ran
+    num_cars (int): number of cars each tick handled
+results:
+    prints one line of results in ticks/sec and cars*ticks/sec
+returns:
+    none
+'''
+def print_row(name, seconds, ticks, num_cars=1):
+    seconds = max(seconds, 1e-9)
+    print(name.ljust(44) + str(round(ticks / seconds)).rjust(12) + " ticks/sec" +
+          str(round(ticks * num_cars / seconds)).rjust(14) + " cars*ticks/sec")
+
+'''
+bench_neural_net function
+parameters:
+    ticks (int): number of forward passes to time
+results:
+    times one forward pass of the node/link NeuralNet and of the MatrixNet with the same weights
+returns:
+    none
+'''
+def bench_neural_net(ticks):
+    random.seed(1)
+    graph_net = NeuralNet(5, 3, 6, 10)
+    random.seed(1)
+    matrix_net = MatrixNet(5, 3, 6, 10)
+    inputs = [0.5, 0.25, 0.125, 0.75, 1.0]
+
+    def run_graph(n):
+        for _ in range(n):
+            graph_net.run_neural_network(inputs)
+
+    def run_matrix(n):
+        for _ in range(n):
+            matrix_net.run_neural_network(inputs)
+
+    print_row("NeuralNet.run_neural_network", time_ticks(run_graph, ticks), ticks)
+    print_row("MatrixNet.run_neural_network", time_ticks(run_matrix, ticks), ticks)
+
+'''
+bench_distance_from_boundary function
+parameters:
+    ticks (int): number of ticks of car sensing to time (5 rays per tick)
+results:
+    times the 5 rays of a car with Car.distance_from_boundary, and of 50 cars at once with RaySensor
+returns:
+    none
+'''
+def bench_distance_from_boundary(ticks):
+    random.seed(2)
+    level = Level(100, 20000, 200, 210)
+    car = Car(0, 0, level)
+    car.rotation = 10
+
+    def run_car(n):
+        for _ in range(n):
+            car.calculate_nn_inputs()
+
+    physics = CarPhysics(50, level)
+    physics.rotation[:] = [i * 7 - 175 for i in range(50)]
+    sensor = RaySensor()
+
+    def run_sensor(n):
+        for _ in range(n):
+            sensor.read_inputs(physics, physics.is_alive)
+
+    print_row("Car.distance_from_boundary (5 rays)", time_ticks(run_car, ticks), ticks)
+    print_row("RaySensor.read_inputs (50 cars, 5 rays)", time_ticks(run_sensor, ticks // 10), ticks // 10, 50)
+
+'''
+bench_car_update function
+parameters:
+    ticks (int): number of ticks to time
+results:
+    times moving a car and tracking its progress with Car.update, and 50 cars at once with CarPhysics.step
+returns:
+    none
+'''
+def bench_car_update(ticks):
+    random.seed(3)
+    level = Level(100, 20000, 200, 210)
+    car = Car(0, 0, level)
+
+    # turning hard at about 1 speed drives a circle of radius ~21 around (0, 21), which stays on the first segment
+    def run_car(n):
+        car.reset_car(0, 0)
+        for _ in range(n):
+            car.set_inputs(-1 if car.vel > 1 else 1, 0, 1)
+            car.update()
+
+    physics = CarPhysics(50, level)
+
+    def run_physics(n):
+        for name in ('x', 'y', 'vel', 'rotation'):
+            getattr(physics, name)[:] = 0
+        physics.is_alive[:] = True
+        physics.current_segment_index[:] = 0
+        physics.turn[:] = 1
+        for _ in range(n):
+            physics.acc[:] = -1 if physics.vel[0] > 1 else 1
+            physics.step()
+
+    print_row("Car.update + track_progress", time_ticks(run_car, ticks), ticks)
+    print_row("CarPhysics.step (50 cars)", time_ticks(run_physics, ticks // 10), ticks // 10, 50)
+
+'''
+bench_level function
+parameters:
+    path_lengths (list): path lengths to generate levels of
+results:
+    times Level.__init__ for every path length, reported as levels per second, with the generation counters of the level
+returns:
+    none
+'''
+def bench_level(path_lengths):
+    for path_length in path_lengths:
+        random.seed(4)
+        state = random.getstate()
+        levels = list()
+
+        def run_level(n):
+            random.setstate(state)
+            for _ in range(n):
+                levels.append(Level(100, path_length, 200, 300))
+
+        print_row("Level.__init__ (length " + str(path_length) + ")", time_ticks(run_level, 1), 1)
+        stats = levels[-1].generation_stats()
+        print("    " + str(stats['segments']) + " segments, " + str(stats['tries']) + " tries, " + str(stats['rejected']) +
+              " rejected, " + str(stats['backtracks']) + " backtracks")
+
+'''
+load_population function
+parameters:
+    population_size (int): number of cars
+results:
+    loads the trained population, repeating its networks as often as needed to make up the number of cars
+returns:
+    (2 tuple) the level the population was trained on and the cars
+'''
+def load_population(population_size):
+    checkpoint = load_checkpoint(POPULATION_FILE)
+    cars = list()
+    for i in range(population_size):
+        car = Car(0, 0, checkpoint.level)
+        car.take_nn(MatrixNet(*checkpoint.nn_shape, weights=np.array(checkpoint.weights[i % len(checkpoint.weights)])))
+        cars.append(car)
+    return checkpoint.level, cars
+
+'''
+bench_generation function
+parameters:
+    population_sizes (list): numbers of cars to time a generation of
+    max_ticks (int): the most ticks each generation can last
+results:
+    times a whole headless generation (sensing, networks, physics) of the trained population for every population size
+returns:
+    none
+'''
+def bench_generation(population_sizes, max_ticks):
+    for population_size in population_sizes:
+        random.seed(5)
+        level, cars = load_population(population_size)
+        sensor = RaySensor()
+
+        # every round reruns the same cars from the start, so the rounds all simulate the same ticks
+        ticks = 0
+        best = None
+        for _ in range(3):
+            for car in cars:
+                car.reset_car(0, 0)
+            start_time = time.perf_counter()
+            _, ticks = evaluate_generation(cars, level, sensor, max_ticks)
+            seconds = time.perf_counter() - start_time
+            best = seconds if best is None else min(best, seconds)
+
+        print_row("generation (" + str(population_size) + " cars, " + str(ticks) + " ticks)", best, ticks, population_size)
+
+'''
+evaluate_with_coverage function
+parameters:
+    cars (list): cars of the generation
+    level (Level): level object the cars drive on
+    sensor (RaySensor): sensor giving the cars their neural network inputs
+    max_ticks (int): the most ticks the generation can last
+    coverage (list): list to add the coverage of the generation to
+    scheduler (GenerationScheduler): optional scheduler stopping stalled cars and ending the generation early
+results:
+    simulates the generation like evaluate_generation, noting how many ticks it lasted, the furthest segment any car
+    reached and how many cars the scheduler stopped
+returns:
+    (2 tuple) total distance of every car (ndarray, in the order of cars) and number of ticks the generation lasted
+'''
+def evaluate_with_coverage(cars, level, sensor, max_ticks, coverage, scheduler=None):
+    simulation = Simulation(cars, level, sensor)
+    ticks = simulation.run(max_ticks, scheduler)
+    retired = int(scheduler.retired.sum()) if scheduler is not None else 0
+    coverage.append({'ticks': ticks, 'segments': int(simulation.physics.current_segment_index.max()), 'retired': retired})
+    return simulation.fitness(), ticks
+
+'''
+golden_trajectory function
+parameters:
+    name (str): name of the golden run (see GOLDEN_RUNS)
+results:
+    runs the golden training run from (a copy of) the trained population
+returns:
+    (2 tuple) the final total distance of every car of every generation, best first, and the coverage of every generation
+'''
+def golden_trajectory(name):
+    run = GOLDEN_RUNS[name]
+    scheduler = None
+    if run['scheduler'] is not None:
+        scheduler = GenerationScheduler(0.5, GOLDEN_SETTINGS['max_cycle_time'], **run['scheduler'])
+    coverage = list()
+    evaluate = functools.partial(evaluate_with_coverage, coverage=coverage, scheduler=scheduler)
+
+    # the run resumes from a copy, as train would otherwise write its own checkpoints over the stored population
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "population.bin")
+        shutil.copyfile(POPULATION_FILE, path)
+        results = train(sensor=RaySensor(compiled=run['compiled']), evaluate=evaluate, checkpoint_path=path,
+                        checkpoint_interval=GOLDEN_SETTINGS['generations'] + 1, resume=True, **GOLDEN_SETTINGS)
+    return [result.fitness for result in results], coverage
+
+'''
+check_coverage function
+parameters:
+    name (str): name of the golden run
+    coverage (list): coverage of every generation of the run
+results:
+    checks that every generation lasted GOLDEN_MIN_TICKS and reached GOLDEN_MIN_SEGMENTS, and that a scheduled run stopped
+    GOLDEN_MIN_RETIRED cars
+returns:
+    (bool) whether the run covered enough
+'''
+def check_coverage(name, coverage):
+    for generation, generation_coverage in enumerate(coverage, start=1):
+        if generation_coverage['ticks'] < GOLDEN_MIN_TICKS or generation_coverage['segments'] < GOLDEN_MIN_SEGMENTS:
+            print("golden run " + name + " covers too little: generation " + str(generation) + " lasted " +
+                  str(generation_coverage['ticks']) + " ticks and reached segment " + str(generation_coverage['segments']) +
+                  " (needs " + str(GOLDEN_MIN_TICKS) + " ticks and segment " + str(GOLDEN_MIN_SEGMENTS) + ")")
+            return False
+    retired = sum(generation_coverage['retired'] for generation_coverage in coverage)
+    if GOLDEN_RUNS[name]['scheduler'] is not None and retired < GOLDEN_MIN_RETIRED:
+        print("golden run " + name + " covers too little: the scheduler stopped " + str(retired) + " cars (needs " +
+              str(GOLDEN_MIN_RETIRED) + ")")
+        return False
+    return True
+
+'''
+check_golden function
+parameters:
+    update (bool): whether to store the current results as the new golden file instead of checking against it
+results:
+    runs every golden training run, checks its coverage and compares every car's final total distance to the golden file,
+    exactly
+returns:
+    (bool) whether the results match and cover enough (only the coverage counts when updating)
+'''
+def check_golden(update=False):
+    fitness = dict()
+    coverage = dict()
+    for name in GOLDEN_RUNS:
+        fitness[name], coverage[name] = golden_trajectory(name)
+        if not check_coverage(name, coverage[name]):
+            return False
+
+    if update or not os.path.exists(GOLDEN_FILE):
+        with open(GOLDEN_FILE, 'w') as file:
+            json.dump({'settings': GOLDEN_SETTINGS, 'runs': GOLDEN_RUNS, 'fitness': fitness}, file, indent=1)
+        print("golden trajectory written to " + GOLDEN_FILE)
+        return True
+
+    with open(GOLDEN_FILE) as file:
+        golden = json.load(file)['fitness']
+
+    for name in GOLDEN_RUNS:
+        if name not in golden:
+            print("golden trajectory MISMATCH: no golden results for the " + name + " run")
+            return False
+        for generation, (golden_fitness, new_fitness) in enumerate(zip(golden[name], fitness[name]), start=1):
+            for rank, (golden_dis, new_dis) in enumerate(zip(golden_fitness, new_fitness)):
+                if golden_dis != new_dis:
+                    print("golden trajectory MISMATCH: " + name + " run, generation " + str(generation) + ", rank " +
+                          str(rank) + ": " + repr(new_dis) + " != " + repr(golden_dis))
+                    return False
+        if len(golden[name]) != len(fitness[name]):
+            print("golden trajectory MISMATCH: " + name + " run has " + str(len(fitness[name])) + " generations instead of " +
+                  str(len(golden[name])))
+            return False
+
+    num_cars = sum(len(generation) for run_fitness in fitness.values() for generation in run_fitness)
+    min_segments = min(generation['segments'] for run_coverage in coverage.values() for generation in run_coverage)
+    print("golden trajectory OK (" + str(num_cars) + " cars match exactly, every generation reached segment " +
+          str(min_segments) + ")")
+    return True
+
+'''
+check_scheduler function
+parameters:
+    percent_taken (float): part of every generation that gets copied into the next one
+results:
+    runs the trained population without a scheduler, checking that no car still driving ever gains more total distance than
+    GenerationScheduler.get_reach allows, then with the default scheduler, checking that it selects the same parents
+returns:
+    (bool) whether the bound held and the parents match on every level
+'''
+def check_scheduler(percent_taken=0.5):
+    level, cars = load_population(50)
+    levels = [level]
+    for seed in SCHEDULER_CHECK_SEEDS:
+        random.seed(seed)
+        levels.append(generate_level(GOLDEN_SETTINGS['new_level_settings']))
+    num_taken = math.ceil(len(cars) * percent_taken)
+    sensor = RaySensor(compiled=True)
+
+    min_margin = None
+    for level_number, level in enumerate(levels):
+
+        # the full length run, keeping the total distance of the cars that were still driving after every tick
+        for car in cars:
+            car.reset_car(0, 0)
+        scheduler = GenerationScheduler(percent_taken, SCHEDULER_CHECK_TICKS)
+        simulation = Simulation(cars, level, sensor)
+        history = list()
+        while simulation.ticks < SCHEDULER_CHECK_TICKS and simulation.physics.is_alive.any():
+            simulation.step()
+            alive = simulation.physics.is_alive.copy()
+            history.append((simulation.ticks, alive, simulation.fitness()[alive]))
+        fitness = simulation.fitness()
+
+        for ticks, alive, tick_fitness in history:
+            if not alive.any():
+                continue
+            margin = scheduler.get_reach(simulation.physics, ticks) - (fitness[alive] - tick_fitness).max()
+            min_margin = margin if min_margin is None else min(min_margin, margin)
+            if margin < 0:
+                print("scheduler MISMATCH: level " + str(level_number) + ", a car gained " + str(round(-margin, 2)) +
+                      " more total distance after tick " + str(ticks) + " than the scheduler's reach allows")
+                return False
+
+        # the scheduled run has to pick the same parents, in the same order
+        for car in cars:
+            car.reset_car(0, 0)
+        simulation = Simulation(cars, level, sensor)
+        simulation.run(SCHEDULER_CHECK_TICKS, scheduler)
+        parents = rank_cars(cars, fitness)[0][:num_taken]
+        scheduled_parents = rank_cars(cars, simulation.fitness())[0][:num_taken]
+        if any(parent is not scheduled_parent for parent, scheduled_parent in zip(parents, scheduled_parents)):
+            print("scheduler MISMATCH: level " + str(level_number) + ", the scheduled run selects different parents")
+            return False
+
+    print("scheduler OK (the same parents on " + str(len(levels)) + " levels, the reach bound held with a margin of " +
+          str(round(min_margin, 2)) + ")")
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="times the simulation hot paths and checks the golden trajectory")
+    parser.add_argument('--quick', action='store_true', help="fewer ticks and smaller sizes, for a fast check")
+    parser.add_argument('--update-golden', action='store_true', help="store the current results as the golden trajectory")
+    parser.add_argument('--golden-only', action='store_true', help="only check the golden trajectory and the scheduler")
+    args = parser.parse_args()
+
+    if not args.golden_only:
+        ticks = 200 if args.quick else 2000
+        bench_neural_net(ticks)
+        bench_distance_from_boundary(ticks)
+        bench_car_update(ticks * 5)
+        bench_level([20000, 100000] if args.quick else [20000, 100000, 500000, 2000000])
+        bench_generation([10, 50] if args.quick else [10, 50, 200, 1000], 300 if args.quick else 1000)
+
+    if not check_golden(args.update_golden) or not check_scheduler():
+        sys.exit(1)
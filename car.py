@@ -1,37 +1,58 @@
-from NeuralNetwork.neural_net import NeuralNet
-import math, pygame, random
+from NeuralNetwork.matrix_net import MatrixNet
+from physics import CarPhysics, physics_property
+import math, random
 
 '''
 Car object
 variables:
     x, y (floats): position in the game world
     level (Level): the level object the car runs on
-    nn (NeuralNet): the neural network the car runs on
+    nn (MatrixNet): the neural network the car runs on
     has_nn (bool): whether the car drives on human input or nn input
     max_vel, acc_force, turn_multiplier (floats/ints): static car movement properties
     vel, rotation, acc, turn (floats): dynamic car movement properties
     is_alive (bool): whether the car is still intact or has driven off the track
     color (3 tuple): displayed color of the car in pygame
     current_segment_index (int): the index of the segment of the level that the car is currently on
-    total_dis (float): total distance that the car has traveled on the given track
+    total_dis (float): total distance that the car has traveled on the given track (calculated when read)
+    progress_x, progress_y (floats): the last position where the car was checked to be on the track, which total_dis is measured from
+    physics (CarPhysics): the physics engine storing the car's dynamic properties, is_alive, current_segment_index and progress point
+    index (int): the car's slot within the physics engine
 purpose:
     code allowing a car that can drive down a track, either controlled by its own NeuralNet or by the human player
 '''
 class Car:
 
+    # the dynamic state of the car lives in its physics engine, so a population engine can move every car at once
+    x = physics_property('x')
+    y = physics_property('y')
+    vel = physics_property('vel')
+    rotation = physics_property('rotation')
+    acc = physics_property('acc')
+    left = physics_property('left')
+    right = physics_property('right')
+    turn = physics_property('turn')
+    is_alive = physics_property('is_alive')
+    current_segment_index = physics_property('current_segment_index')
+    progress_x = physics_property('progress_x')
+    progress_y = physics_property('progress_y')
+
     '''
     Constructor
     parameters:
         x, y (floats): starting position of the car (usually 0)
         level (Level): level object that the car drives on
     results:
-        creates and resets a new car
+        creates and resets a new car, with its own single car physics engine until bound to a population's (see CarPhysics.bind_cars)
     returns:
         a newly created car (defaulted to player use)
     '''
     def __init__(self, x, y, level):
         self.level = level
 
+        self.physics = CarPhysics(1, level)
+        self.index = 0
+
         self.has_nn = False
 
         self.max_vel = 5
@@ -70,6 +91,9 @@ class Car:
         self.current_segment_index = 0
         self.distance_to_next = 0
 
+        self.progress_x = x
+        self.progress_y = y
+
     '''
     setup_nn function
     parameters:
@@ -83,14 +107,14 @@ class Car:
         none
     '''
     def setup_nn(self, num_in_nodes, num_out_nodes, num_hidden_nodes, num_hidden_layers):
-        self.nn = NeuralNet(num_in_nodes, num_out_nodes, num_hidden_nodes, num_hidden_layers)
+        self.nn = MatrixNet(num_in_nodes, num_out_nodes, num_hidden_nodes, num_hidden_layers)
         self.has_nn = True
 
 
     '''
     take_nn function
     parameters:
-        nn (NeuralNet): the neural net to use as the driver (either a copy or mutation of a previous gen car's nn)
+        nn (MatrixNet): the neural net to use as the driver (either a copy or mutation of a previous gen car's nn)
     results:
         sets the given neural network for the car and sets it as its default driving mode
     returns:
@@ -115,15 +139,39 @@ class Car:
         if not self.is_alive:
             return False
 
-        # calculate the 5 inputs for the car's neural network (distance in front, distance 45/90 to right/left)
+        # run the neural network on the car's sensor inputs, and apply the output
+        nn_output = self.nn.run_neural_network(self.calculate_nn_inputs())
+        self.apply_nn_output(nn_output)
+        return True
+
+    '''
+    calculate_nn_inputs function
+    parameters:
+        none
+    results:
+        calculates the 5 inputs for the car's neural network (distance in front, distance 45/90 to right/left)
+    returns
+        (list) the neural network inputs
+    '''
+    def calculate_nn_inputs(self):
         dis_st = self.distance_from_boundary(0) / 500
         dis_l_45 = self.distance_from_boundary(-45) / 500
         dis_l_90 = self.distance_from_boundary(-90) / 500
         dis_r_45 = self.distance_from_boundary(45) / 500
         dis_r_90 = self.distance_from_boundary(90) / 500
+        return [dis_st, dis_l_45, dis_l_90, dis_r_45, dis_r_90]
 
-        # run the neural network, and retrieve the output
-        nn_output = self.nn.run_neural_network([dis_st, dis_l_45, dis_l_90, dis_r_45, dis_r_90])
+    '''
+    apply_nn_output function
+    parameters:
+        nn_output (list): output values of the car's neural network
+    results:
+        turns the neural network output into the car's movement input
+    returns
+        none
+    '''
+    def apply_nn_output(self, nn_output):
+        nn_output = list(nn_output)
 
         '''
         output 0 = left turn
@@ -136,9 +184,8 @@ class Car:
             nn_output[0] = 0
             nn_output[1] = 0
 
-        # set the inputs of the car and return that a decision was made
+        # set the inputs of the car
         self.set_inputs(1, nn_output[0], nn_output[1])
-        return True
 
     '''
     set_inputs function
@@ -220,43 +267,48 @@ class Car:
         if not is_on_track:
             self.is_alive = False
 
-        # calculate the total distance the car has traveled
-        self.calc_total_distance()
+        # remember where the car last was on the track, the total distance is only calculated when it is needed
+        if self.is_alive:
+            self.progress_x = self.x
+            self.progress_y = self.y
+
+    '''
+    total_dis property
+    results:
+        calculates the total distance the car has traveled when it is read (selection and the camera are the only users)
+    returns:
+        (float) total distance traveled on the track
+    '''
+    @property
+    def total_dis(self):
+        return self.calc_total_distance()
 
     '''
     calc_total_distance function
     parameters:
         none
     results:
-        calculates the total distance the car traveled
+        calculates the total distance the car traveled, up to the last point it was seen on the track
     returns
-        none
+        (float) the total distance
     '''
     def calc_total_distance(self):
-
-        # don't calculate if the car isn't on the track
-        if not self.is_alive:
-            return
+        x = self.progress_x
+        y = self.progress_y
 
         # car can possibly be on two segments at once, this sets the variables to the further segment
-        seg = self.level.path[self.current_segment_index]
         seg_ind = self.current_segment_index
-        if self.current_segment_index + 1 < len(self.level.path):
-            n_seg = self.level.path[self.current_segment_index + 1]
-            if self.is_on_segment(n_seg):
-                seg = n_seg
+        if seg_ind + 1 < len(self.level.path):
+            n_seg = self.level.path[seg_ind + 1]
+            if x >= n_seg.x1 and x <= n_seg.x2 and y >= n_seg.y1 and y <= n_seg.y2:
                 seg_ind += 1
+        seg = self.level.path[seg_ind]
 
         # finds the destination point to the NEXT seg (basically the middle of the furthest edge from the start)
         dest_pt = (seg.x + (seg.size / 2 + seg.distance) * seg.dir_x, seg.y + (seg.size / 2 + seg.distance) * seg.dir_y)
 
-        # add up the previous segments' distances, including the current segment
-        self.total_dis = 0
-        for s in range(seg_ind + 1):
-            self.total_dis += self.level.path[s].distance
-
-        # subtract the distance from the end of the current segment, which should result in the total distance
-        self.total_dis -= math.dist((self.x, self.y), dest_pt)
+        # the length of the track up to the end of the current segment, minus the distance from the end of the current segment
+        return self.level.cum_distance[seg_ind] - math.dist((x, y), dest_pt)
 
     '''
     is_on_segment function
@@ -296,81 +348,89 @@ class Car:
     def calculate_points_distance(self, p1, p2):
         return math.sqrt(pow(p1[0] - p2[0], 2) + pow(p1[1] - p2[1], 2))
 
+    '''
+    distance_from_boundary function
+    parameters:
+        angle (float): angle of the ray relative to the car's rotation (degrees)
+    results:
+        casts a ray from the car and follows it through the neighbouring segments until it leaves the track
+    returns:
+        the distance from the car to the edge of the track in the given direction
+    '''
     def distance_from_boundary(self, angle):
         theta = self.rotation + angle
 
-        seg = self.level.path[self.current_segment_index]
-        x_dir = math.cos(math.radians(theta))
-        y_dir = math.sin(math.radians(theta))
-        x_to_side = math.copysign(seg.width / 2, x_dir) - (self.x - seg.m_x)
-        y_to_side = math.copysign(seg.height / 2, y_dir) - (self.y - seg.m_y)
-        horiz_p = (self.x + (1 / (math.tan(math.radians(theta) + 0.0001))) * y_to_side, self.y + y_to_side)
-        vert_p = (self.x + x_to_side, self.y + (math.tan(math.radians(theta))) * x_to_side)
+        # finds where the ray leaves the car's segment, then follows it forward and backward along the track
+        use_point = self.ray_exit_point(self.level.path[self.current_segment_index], theta)
+        next_point = self.follow_ray(use_point, theta, 1)
+        prev_point = self.follow_ray(use_point, theta, -1)
 
-        if self.is_point_on_segment(horiz_p, seg):
-            use_point = horiz_p
-        elif self.is_point_on_segment(vert_p, seg):
-            use_point = vert_p
-        else:
-            use_point = (self.x, self.y)
+        distance = max(math.dist(prev_point, (self.x, self.y)), math.dist(next_point, (self.x, self.y)))
 
-        next_point = use_point
-        prev_point = use_point
+        return distance
 
-        next_index = self.current_segment_index + 1
-        prev_index = self.current_segment_index - 1
-        while next_index in range(0, len(self.level.path)):
-            n_seg = self.level.path[next_index]
+    '''
+    follow_ray function
+    parameters:
+        point (2 tuple): point where the ray leaves the car's segment
+        theta (float): angle of the ray (degrees)
+        step (int): 1 to follow the track forward, -1 to follow it backward
+    results:
+        keeps moving the exit point to the next segment along the track while the ray enters it
+    returns:
+        the last point where the ray leaves the track
+    '''
+    def follow_ray(self, point, theta, step):
+        index = self.current_segment_index + step
+        while index in range(0, len(self.level.path)):
+            n_seg = self.level.path[index]
 
-            if self.is_point_on_segment(next_point, n_seg):
-                next_index += 1
+            if self.is_point_on_segment(point, n_seg):
+                index += step
             else:
                 break
 
-            x_dir = math.cos(math.radians(theta))
-            y_dir = math.sin(math.radians(theta))
-            x_to_side = math.copysign(n_seg.width / 2, x_dir) - (self.x - n_seg.m_x)
-            y_to_side = math.copysign(n_seg.height / 2, y_dir) - (self.y - n_seg.m_y)
-            horiz_p = (self.x + (1 / (math.tan(math.radians(theta) + 0.0001))) * y_to_side, self.y + y_to_side)
-            vert_p = (self.x + x_to_side, self.y + (math.tan(math.radians(theta))) * x_to_side)
-
-            if self.is_point_on_segment(horiz_p, n_seg):
-                next_point = horiz_p
-            elif self.is_point_on_segment(vert_p, n_seg):
-                next_point = vert_p
-            else:
-                next_point = (self.x, self.y)
-
-        while prev_index in range(0, len(self.level.path)):
-            n_seg = self.level.path[prev_index]
-
-            if self.is_point_on_segment(prev_point, n_seg):
-                prev_index -= 1
-            else:
-                break
+            point = self.ray_exit_point(n_seg, theta)
 
-            x_dir = math.cos(math.radians(theta))
-            y_dir = math.sin(math.radians(theta))
-            x_to_side = math.copysign(n_seg.width / 2, x_dir) - (self.x - n_seg.m_x)
-            y_to_side = math.copysign(n_seg.height / 2, y_dir) - (self.y - n_seg.m_y)
-            horiz_p = (self.x + (1 / (math.tan(math.radians(theta) + 0.0001))) * y_to_side, self.y + y_to_side)
-            vert_p = (self.x + x_to_side, self.y + (math.tan(math.radians(theta))) * x_to_side)
-
-            if self.is_point_on_segment(horiz_p, n_seg):
-                prev_point = horiz_p
-            elif self.is_point_on_segment(vert_p, n_seg):
-                prev_point = vert_p
-            else:
-                prev_point = (self.x, self.y)
+        return point
 
-        distance = max(math.dist(prev_point, (self.x, self.y)), math.dist(next_point, (self.x, self.y)))
+    '''
+    ray_exit_point function
+    parameters:
+        seg (Segment): segment the ray goes through
+        theta (float): angle of the ray (degrees)
+    results:
+        intersects the ray with the horizontal and the vertical side of the segment it is heading towards
+    returns:
+        the point where the ray leaves the segment (the car's position if neither side is hit)
+    '''
+    def ray_exit_point(self, seg, theta):
+        x_dir = math.cos(math.radians(theta))
+        y_dir = math.sin(math.radians(theta))
+        x_to_side = math.copysign(seg.width / 2, x_dir) - (self.x - seg.m_x)
+        y_to_side = math.copysign(seg.height / 2, y_dir) - (self.y - seg.m_y)
+        horiz_p = (self.x + (1 / (math.tan(math.radians(theta) + 0.0001))) * y_to_side, self.y + y_to_side)
+        vert_p = (self.x + x_to_side, self.y + (math.tan(math.radians(theta))) * x_to_side)
 
-        return distance
+        if self.is_point_on_segment(horiz_p, seg):
+            return horiz_p
+        elif self.is_point_on_segment(vert_p, seg):
+            return vert_p
+        else:
+            return (self.x, self.y)
 
+    '''
+    draw_car function
+    parameters:
+        draw_surface (Surface): pygame surface object to draw on
+        cx, cy (floats): the point on the WORLD space that the screen is centering (middle of screen)
+        zoom (float): zoom factor
+        res ([int, int]): dimensions of surface
+    results:
+        draws the car with renderer.draw_car (imported only here, so simulating cars never loads pygame)
+    returns:
+        none
+    '''
     def draw_car(self, draw_surface, cx, cy, zoom, res):
-
-        px = (self.x - cx) * zoom + (res[0] / 2)
-        py = (self.y - cy) * zoom + (res[1] / 2)
-        pz = 8 * zoom
-
-        pygame.draw.circle(draw_surface, self.color, (px, py), pz)
\ No newline at end of file
+        from renderer import draw_car
+        draw_car(draw_surface, self, cx, cy, zoom, res)
\ No newline at end of file
@@ -0,0 +1,152 @@
+from level_generator import Level
+from car import Car
+from NeuralNetwork.matrix_net import MatrixNet
+import json, os, random, struct
+import numpy as np
+
+# first bytes of every checkpoint file, followed by the 4 byte length of the JSON header
+MAGIC = b'CARCKPT1'
+
+# every array starts at a multiple of this many bytes from the start of the file
+ALIGNMENT = 64
+
+'''
+Checkpoint Object
+variables:
+    generation (int): number of the generation the cars are about to drive
+    rng_state (tuple): state of the random module when the checkpoint was written
+    level (Level): the level the cars drive on, rebuilt from the stored segments
+    nn_shape (tuple): shape of every car's neural network (inputs, outputs, hidden nodes, hidden layers)
+    weights (ndarray): (cars x links) memory-mapped weights of every car's neural network
+    colors (ndarray): (cars x 3) memory-mapped colors of the cars
+    extra (dict): any other JSON values stored with the checkpoint
+purpose:
+    holds a loaded checkpoint, from which the population can be recreated to carry on training where it stopped
+'''
+class Checkpoint:
+
+    def __init__(self, generation, rng_state, level, nn_shape, weights, colors, extra):
+        self.generation = generation
+        self.rng_state = rng_state
+        self.level = level
+        self.nn_shape = nn_shape
+        self.weights = weights
+        self.colors = colors
+        self.extra = extra
+
+    '''
+    restore_cars function
+    parameters:
+        none
+    results:
+        creates the cars of the checkpoint on its level, each with its own copy of its weights
+    returns:
+        (list) the cars, in the order they were saved
+    '''
+    def restore_cars(self):
+        cars = list()
+        for car_weights, color in zip(self.weights, self.colors):
+            car = Car(0, 0, self.level)
+            car.take_nn(MatrixNet(*self.nn_shape, weights=np.array(car_weights)))
+            car.color = tuple(int(c) for c in color)
+            cars.append(car)
+        return cars
+
+    '''
+    restore_random function
+    parameters:
+        none
+    results:
+        sets the state of the random module back to the one saved in the checkpoint
+    returns:
+        none
+    Notes:
+        Creating a car draws its random color, so this has to be called after restore_cars.
+    '''
+    def restore_random(self):
+        random.setstate(self.rng_state)
+
+'''
+save_checkpoint function
+parameters:
+    path (str): file to write the checkpoint to
+    generation (int): number of the generation the cars are about to drive
+    cars (list): cars of the generation (each with a MatrixNet of the same shape)
+    level (Level): level object the cars drive on
+    rng_state (tuple): state of the random module to store (random.getstate() if not given)
+    extra (dict): optional JSON values to store with the checkpoint
+results:
+    writes the checkpoint to a temporary file next to path, then renames it over path, so a crash while writing never
+    leaves a broken checkpoint behind
+returns:
+    none
+Notes:
+    The file holds MAGIC, the header length, a JSON header and then the raw little endian arrays (weights, colors and the
+    level's segment table), each aligned to ALIGNMENT bytes so they can be memory-mapped in place.
+'''
+def save_checkpoint(path, generation, cars, level, rng_state=None, extra=None):
+    if rng_state is None:
+        rng_state = random.getstate()
+
+    nn = cars[0].nn
+    arrays = {
+        'weights': np.ascontiguousarray(np.stack([car.nn.weights for car in cars]), dtype='<f8'),
+        'colors': np.array([car.color for car in cars], dtype='u1'),
+        'segments': np.ascontiguousarray(level.segment_table(), dtype='<f8'),
+    }
+
+    # the array offsets are relative to the end of the header, as its length is not known until they are set
+    offset = 0
+    array_info = dict()
+    for name, array in arrays.items():
+        offset += -offset % ALIGNMENT
+        array_info[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': array.shape}
+        offset += array.nbytes
+
+    header = json.dumps({
+        'generation': generation,
+        'rng_state': [rng_state[0], list(rng_state[1]), rng_state[2]],
+        'level_settings': [level.path_width, level.path_length, level.min_seg_length, level.max_seg_length],
+        'nn_shape': [nn.num_in_nodes, nn.num_out_nodes, nn.num_hidden_nodes, nn.num_hidden_layers],
+        'arrays': array_info,
+        'extra': extra or dict(),
+    }).encode()
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % ALIGNMENT)
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        start = file.tell()
+        for name, array in arrays.items():
+            file.write(b'\0' * (start + array_info[name]['offset'] - file.tell()))
+            file.write(array.tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+'''
+load_checkpoint function
+parameters:
+    path (str): file the checkpoint was written to
+results:
+    reads the header and memory-maps the arrays of the checkpoint, rebuilding its level from the stored segments
+returns:
+    (Checkpoint) the loaded checkpoint
+'''
+def load_checkpoint(path):
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a checkpoint file")
+        header_length = struct.unpack('<I', file.read(4))[0]
+        header = json.loads(file.read(header_length))
+    start = len(MAGIC) + 4 + header_length
+
+    arrays = dict()
+    for name, info in header['arrays'].items():
+        arrays[name] = np.memmap(path, dtype=np.dtype(info['dtype']), mode='r', offset=start + info['offset'], shape=tuple(info['shape']))
+
+    version, internal_state, gauss_next = header['rng_state']
+    rng_state = (version, tuple(internal_state), gauss_next)
+
+    level = Level(*header['level_settings'], segments=arrays['segments'])
+    return Checkpoint(header['generation'], rng_state, level, tuple(header['nn_shape']), arrays['weights'], arrays['colors'], header['extra'])
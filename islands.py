@@ -0,0 +1,189 @@
+from trainer import train, rank_cars
+from level_cache import LevelProvider
+from NeuralNetwork.matrix_net import MatrixNet
+import argparse, copy, multiprocessing, os, queue, tempfile, time
+import numpy as np
+
+'''
+Island Model Object
+variables:
+    num_islands (int): number of populations, each evolved in its own worker process
+    migration_interval (int): generations between migrations
+    num_migrants (int): number of top networks every island sends to the next one at each migration
+    settings (dict): the train settings every island runs with (population_size, generations, level settings, ...)
+    cache_dir (str): directory the islands share their levels through
+purpose:
+    evolves several independent populations at once, one per process, every one with its own selection loop, and
+    every migration_interval generations moves the best networks of each island to the next one around a ring
+Notes:
+    Every island runs trainer.train with its own seed (seed + island number) on the same seeded levels, shared through a
+    LevelProvider cache, so the total distances of different islands are comparable. At a migration an island sends the
+    flat weights of its top num_migrants networks (and their total distances) to the next island through a queue, and
+    they take the places of the receiving island's worst cars before it breeds. Islands only wait on each other at
+    migrations, so the throughput grows with the number of cores.
+'''
+class IslandModel:
+
+    '''
+    Constructor
+    parameters:
+        num_islands (int): number of populations (defaults to the number of CPU cores)
+        migration_interval (int): generations between migrations
+        num_migrants (int): number of top networks sent to the next island at each migration
+        cache_dir (str): directory to share the levels through, a temporary one by default
+        settings (dict): settings every island is trained with, as for trainer.train (seed is the first island's seed)
+    results:
+        stores the settings of the islands
+    returns:
+        an island model object
+    '''
+    def __init__(self, num_islands=None, migration_interval=10, num_migrants=2, cache_dir=None, **settings):
+        self.num_islands = num_islands or os.cpu_count()
+        self.migration_interval = migration_interval
+        self.num_migrants = num_migrants
+        self.settings = settings
+        self.cache_dir = cache_dir
+
+    '''
+    run function
+    parameters:
+        on_generation (function): optional function called with every island's generation summary (a dict of island,
+            generation, ticks, best and seconds) as soon as it is ready
+    results:
+        starts one worker process per island and waits for all of them to finish
+    returns:
+        (list) for every island, a dict of the flat weights, total distance and shape of the best network of its last
+        generation
+    '''
+    def run(self, on_generation=None):
+        temp_dir = None
+        cache_dir = self.cache_dir
+        if cache_dir is None:
+            temp_dir = tempfile.TemporaryDirectory()
+            cache_dir = temp_dir.name
+
+        # island i sends its migrants to island i + 1, so inboxes[i + 1] is island i's outbox
+        inboxes = [multiprocessing.Queue() for _ in range(self.num_islands)]
+        reports = multiprocessing.Queue()
+        workers = list()
+        for island in range(self.num_islands):
+            worker = multiprocessing.Process(target=run_island, args=(island, self.migration_interval, self.num_migrants, cache_dir, self.settings,
+                                                                      inboxes[island], inboxes[(island + 1) % self.num_islands], reports))
+            worker.start()
+            workers.append(worker)
+
+        bests = [None] * self.num_islands
+        try:
+            while any(best is None for best in bests):
+                try:
+                    kind, island, values = reports.get(timeout=1)
+                except queue.Empty:
+                    if any(worker.exitcode not in (None, 0) for worker in workers):
+                        raise RuntimeError("an island worker process failed")
+                    continue
+
+                if kind == 'generation':
+                    if on_generation is not None:
+                        on_generation(values)
+                else:
+                    bests[island] = values
+        finally:
+            for worker in workers:
+                if worker.exitcode is None and any(best is None for best in bests):
+                    worker.terminate()
+                worker.join()
+            if temp_dir is not None:
+                temp_dir.cleanup()
+
+        return bests
+
+'''
+run_island function
+parameters:
+    island (int): number of the island
+    migration_interval (int): generations between migrations
+    num_migrants (int): number of top networks sent to the next island at each migration
+    cache_dir (str): directory the islands share their levels through
+    settings (dict): settings to train the island with, as for trainer.train
+    inbox (Queue): queue the previous island's migrants arrive in
+    outbox (Queue): queue of the next island's migrants
+    reports (Queue): queue every generation summary and the final result are put in
+results:
+    trains the island's population, exchanging migrants with its neighbours (runs inside a worker process)
+returns:
+    none
+'''
+def run_island(island, migration_interval, num_migrants, cache_dir, settings, inbox, outbox, reports):
+    settings = dict(settings)
+    seed = settings.pop('seed', 82)
+
+    # the best cars leave as flat weights, and the ones coming in take the places of the worst cars
+    def migrate(generation, ranked_cars, fitness):
+        if generation % migration_interval != 0:
+            return ranked_cars, fitness
+
+        outbox.put((np.stack([car.nn.weights for car in ranked_cars[:num_migrants]]), np.array(fitness[:num_migrants])))
+        migrant_weights, migrant_fitness = inbox.get()
+
+        # an archive may still hold the generation's list and cars, so the migrants come in as new cars in a new list
+        # (copies of the cars they replace, so no random numbers are drawn for their colors)
+        nn = ranked_cars[0].nn
+        nn_shape = (nn.num_in_nodes, nn.num_out_nodes, nn.num_hidden_nodes, nn.num_hidden_layers)
+        ranked_cars = list(ranked_cars)
+        fitness = list(fitness)
+        for i, (weights, migrant_dis) in enumerate(zip(migrant_weights, migrant_fitness)):
+            migrant = copy.copy(ranked_cars[-1 - i])
+            migrant.take_nn(MatrixNet(*nn_shape, weights=weights))
+            ranked_cars[-1 - i] = migrant
+            fitness[-1 - i] = float(migrant_dis)
+        return rank_cars(ranked_cars, fitness)
+
+    def report(result):
+        reports.put(('generation', island, {'island': island, 'generation': result.generation, 'ticks': result.ticks,
+                                            'best': result.best_dis, 'seconds': result.seconds}))
+
+    level_provider = LevelProvider(cache_dir, background=None)
+    results = train(seed=seed + island, level_seed=seed, level_provider=level_provider, on_generation=report, migrate=migrate, **settings)
+    level_provider.close()
+
+    nn = results[-1].best_car.nn
+    reports.put(('done', island, {'weights': np.array(nn.weights), 'best': results[-1].best_dis,
+                                  'nn_shape': (nn.num_in_nodes, nn.num_out_nodes, nn.num_hidden_nodes, nn.num_hidden_layers)}))
+
+'''
+print_report function
+parameters:
+    report (dict): summary of one generation of one island
+results:
+    prints a one line summary of the generation
+returns:
+    none
+'''
+def print_report(report):
+    print("ISLAND " + str(report['island']) + " GEN " + str(report['generation']) + ": best " + str(round(report['best'], 2)) + ", " +
+          str(report['ticks']) + " ticks, " + str(round(report['ticks'] / max(report['seconds'], 1e-9))) + " ticks/sec")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="trains several populations at once, one per process, with migrations between them")
+    parser.add_argument('--islands', type=int, default=None, help="number of populations (defaults to the number of CPU cores)")
+    parser.add_argument('--migration-interval', type=int, default=10, help="generations between migrations")
+    parser.add_argument('--migrants', type=int, default=2, help="number of top networks sent to the next island at each migration")
+    parser.add_argument('--population', type=int, default=50, help="number of cars in every generation of every island")
+    parser.add_argument('--generations', type=int, default=100, help="number of generations to train for")
+    parser.add_argument('--level', type=int, nargs=4, default=(100, 20000, 200, 210), metavar=('WIDTH', 'LENGTH', 'MIN_SEG', 'MAX_SEG'),
+                        help="settings of the first level")
+    parser.add_argument('--new-level', type=int, nargs=4, default=(100, 20000, 200, 300), metavar=('WIDTH', 'LENGTH', 'MIN_SEG', 'MAX_SEG'),
+                        help="settings of the levels that replace it")
+    parser.add_argument('--level-interval', type=int, default=100, help="generations between new levels")
+    parser.add_argument('--percent-taken', type=float, default=0.5, help="part of every generation kept for the next")
+    parser.add_argument('--max-ticks', type=int, default=100 * 60, help="the most ticks a generation can last")
+    parser.add_argument('--seed', type=int, default=82, help="random seed of the first island (island i gets seed + i)")
+    parser.add_argument('--level-cache', default=None, help="directory to cache the shared levels in")
+    args = parser.parse_args()
+
+    model = IslandModel(args.islands, args.migration_interval, args.migrants, args.level_cache, population_size=args.population,
+                        generations=args.generations, level_settings=tuple(args.level), new_level_settings=tuple(args.new_level),
+                        level_interval=args.level_interval, percent_taken=args.percent_taken, max_cycle_time=args.max_ticks, seed=args.seed)
+    start_time = time.perf_counter()
+    bests = model.run(print_report)
+    print("BEST: " + str(max(best['best'] for best in bests)) + " in " + str(round(time.perf_counter() - start_time, 2)) + " seconds")
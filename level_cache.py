@@ -0,0 +1,153 @@
+from level_generator import GENERATOR_VERSION, Level, generate_level
+import concurrent.futures, os, tempfile
+import numpy as np
+
+'''
+Level Provider Object
+variables:
+    cache_dir (str): directory the generated levels are stored in
+    executor (Executor): background worker generating the prefetched levels (None if prefetching is off)
+    pending (dict): maps the key of every level being generated in the background to its future
+    stats (dict): maps the key of every level the provider generated to its generation counters (see Level.generation_stats)
+purpose:
+    hands out levels by seed and settings, loading them from an on-disk cache when they were generated before, and
+    generating upcoming levels in the background so switching levels does not stall training
+Notes:
+    A level's segments only depend on its seed and settings (it is generated by generate_level with its own
+    random.Random(seed), or a seed derived from it if that generation gives up), so a cached level is always the same one
+    a fresh generation would give. The cache file names include GENERATOR_VERSION, so levels cached by an older generator
+    are never handed out once its output changed. Each level is stored as the .npy segment table
+    of Level.segment_table, written to a temporary file first and renamed into place, and loaded memory-mapped.
+'''
+class LevelProvider:
+
+    '''
+    Constructor
+    parameters:
+        cache_dir (str): directory to cache the levels in (created if missing), a folder in the temp directory by default
+        background (str): 'process' to prefetch levels in a background process, 'thread' in a background thread (for
+            scripts without a __main__ guard, which a spawned process would run again), None to not prefetch at all
+    results:
+        creates the provider and its background worker
+    returns:
+        a level provider object
+    '''
+    def __init__(self, cache_dir=None, background='process'):
+        if cache_dir is None:
+            cache_dir = os.path.join(tempfile.gettempdir(), "level_cache")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+
+        self.executor = None
+        if background == 'process':
+            self.executor = concurrent.futures.ProcessPoolExecutor(1)
+        elif background == 'thread':
+            self.executor = concurrent.futures.ThreadPoolExecutor(1)
+        self.pending = dict()
+        self.stats = dict()
+
+    '''
+    get_level function
+    parameters:
+        seed (int): seed of the level
+        settings (4 tuple): path width, path length, min and max segment length
+    results:
+        waits for the level if it is being prefetched, else loads it from the cache, else generates and caches it
+    returns:
+        (Level) the level
+    '''
+    def get_level(self, seed, settings):
+        key = (seed,) + tuple(settings)
+
+        if key in self.pending:
+            self.stats[key] = self.pending.pop(key).result()
+
+        cache_file = self.cache_file(key)
+        if os.path.exists(cache_file):
+            return Level(*settings, segments=np.load(cache_file, mmap_mode='r'))
+
+        level = generate_level(settings, seed)
+        save_level_table(cache_file, level.segment_table())
+        self.stats[key] = level.generation_stats()
+        return level
+
+    '''
+    prefetch function
+    parameters:
+        seed (int): seed of the level
+        settings (4 tuple): path width, path length, min and max segment length
+    results:
+        starts generating the level in the background, unless it is cached or already on its way
+    returns:
+        none
+    '''
+    def prefetch(self, seed, settings):
+        key = (seed,) + tuple(settings)
+        cache_file = self.cache_file(key)
+        if self.executor is None or key in self.pending or os.path.exists(cache_file):
+            return
+        self.pending[key] = self.executor.submit(generate_level_file, cache_file, seed, tuple(settings))
+
+    '''
+    cache_file function
+    parameters:
+        key (5 tuple): seed, path width, path length, min and max segment length
+    results:
+        builds the name of the level's cache file, for the current GENERATOR_VERSION
+    returns:
+        (str) path of the cache file
+    '''
+    def cache_file(self, key):
+        return os.path.join(self.cache_dir, "level_v" + str(GENERATOR_VERSION) + "_" + "_".join(str(value) for value in key) + ".npy")
+
+    '''
+    close function
+    parameters:
+        none
+    results:
+        stops the background worker (any level it is still generating gets finished first)
+    returns:
+        none
+    '''
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+        self.pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+'''
+save_level_table function
+parameters:
+    cache_file (str): path to store the segment table at
+    table (ndarray): segment table of a level (see Level.segment_table)
+results:
+    writes the table to a temporary file next to cache_file and renames it into place, so a half written file is never read
+returns:
+    none
+'''
+def save_level_table(cache_file, table):
+    temp_file = cache_file + "." + str(os.getpid()) + ".tmp"
+    with open(temp_file, 'wb') as file:
+        np.save(file, table)
+    os.replace(temp_file, cache_file)
+
+'''
+generate_level_file function
+parameters:
+    cache_file (str): path to store the level's segment table at
+    seed (int): seed of the level
+    settings (4 tuple): path width, path length, min and max segment length
+results:
+    generates the level and caches its segment table (runs inside the background worker)
+returns:
+    (dict) the level's generation counters (see Level.generation_stats)
+'''
+def generate_level_file(cache_file, seed, settings):
+    level = generate_level(settings, seed)
+    save_level_table(cache_file, level.segment_table())
+    return level.generation_stats()
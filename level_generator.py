@@ -1,16 +1,60 @@
-import random, pygame
+import random, itertools, collections, time
+import numpy as np
+
+# the directions a segment can take after a segment going each way, in the order the random number picks them
+# (left segments cannot be followed by down, and down segments cannot be followed by left)
+NEXT_DIRECTIONS = {
+    (-1, 0): ((-1, 0), (0, -1)),
+    (1, 0): ((1, 0), (0, -1), (0, 1)),
+    (0, -1): ((0, -1), (-1, 0), (1, 0)),
+    (0, 1): ((0, 1), (1, 0)),
+}
+
+# version of the generator's output, part of the name of every cached level (see level_cache.py), so it has to be bumped
+# whenever a change makes the same seed and settings give different segments (2: the dead-end backtracking and retries)
+GENERATOR_VERSION = 2
+
+# number of ranges the segment lengths are split into when marking the ways out of a segment that led into a dead end
+NUM_LENGTH_BUCKETS = 4
+
+# step between the seeds generate_level tries for a level whose generation gave up (a large prime, so the seeds of
+# different levels never meet)
+RETRY_SEED_STEP = 1000003
 
 '''
 Level Object
 variables:
     parameters
     path (list): a list of segments that together form the whole track
+    grid (SegmentGrid): spatial index of the segments of the path, used to find overlapping segments quickly
+    cum_distance (list): total length of the track up to the end of every segment
+    arrays (SegmentArrays): the same segments stored as parallel arrays
+    path_distance (int): total length of the segments generated so far
+    streaming (bool): whether the level only generates and keeps the segments near the cars (see StreamingLevel)
+    explored (dict): for the index of a segment, the (direction, length bucket) pairs already found to lead into a dead
+        end from it
+    fixed_index (int): index of the last segment backtracking may not remove
+    num_tries, num_rejected, num_backtracks (ints): segments tried, tried segments that overlapped the track, and
+        segments removed to get out of a dead end, since the generation started
+    num_retries (int): generations that gave up before this one (see generate_level)
+    generation_seconds (float): time spent generating the path (failed generations of generate_level included)
 purpose:
     initialize a horiz/vert race track that can be raced on by cars (whether driven by players or AI's)
+Notes:
+    A new segment is tried with a random length and direction until one does not overlap the track. When one is rejected
+    and every direction and length bucket left would overlap even at its shortest, the track has boxed itself in: the last
+    segment is removed and its direction and length bucket marked as explored, and the one before it gets the next tries
+    instead (backtracking as many segments as needed). As long as the track never boxes itself in, the random numbers
+    drawn and so the path are the same as without backtracking. A path of length L takes at most
+    max_tries_per_segment * (L // min_seg_length + 1) tries, after which the generation gives up with a RuntimeError.
+    The backtracking is not a complete search: a dead end rules out every length of its bucket, and the first segment
+    is never removed, so a track can still give up. generate_level starts such a level over with another seed.
 '''
 
 class Level:
 
+    streaming = False
+
     '''
     Constructor
     parameters:
@@ -18,105 +62,778 @@ class Level:
         path_length (int): the length of track to be created
         min_seg_length (int): the minimum length of the track a segment can be
         max_seg_length (int): the maximum length of the track a segment can be (straight-a-ways can and do often consist of more than one segment)
+        segments (ndarray): optional segment table (see segment_table) of an already generated path to use instead of a new one
+        rng (Random): optional random number generator to generate the path with (the random module by default)
+        max_tries_per_segment (int): tries allowed for every min_seg_length of track, bounding the generation time
     results:
         creates a new race track from the beginning to the end sequentially given VALID constraints (min must be strictly smaller than max)
     return:
         a level object containing the path
     '''
-    def __init__(self, path_width, path_length, min_seg_length, max_seg_length):
+    def __init__(self, path_width, path_length, min_seg_length, max_seg_length, segments=None, rng=None, max_tries_per_segment=100):
 
         # initialize parameters
         self.path_width = path_width
         self.path_length = path_length
         self.min_seg_length = min_seg_length
         self.max_seg_length = max_seg_length
+        self.rng = rng if rng is not None else random
+        self.max_tries_per_segment = max_tries_per_segment
 
-        # create path list
+        # create path list, and the grid indexing it (cells are big enough for a segment to cover at most 2 x 2 of them)
         self.path = list()
+        self.grid = SegmentGrid(path_width + max_seg_length)
+        self.path_distance = 0
+        self.reset_generation()
+
+        # generates the path, unless an already generated one was given
+        if segments is None:
+            self.generate_path()
+        else:
+            for x, y, size, distance, dir_x, dir_y in np.asarray(segments).tolist():
+                self.add_segment(Segment(x, y, size, distance, dir_x, dir_y))
+
+        # adds up the segment lengths once, so the distance traveled up to any segment is a single lookup
+        self.cum_distance = list(itertools.accumulate(seg.distance for seg in self.path))
+
+        # stores the finished path as arrays for the vectorized car code
+        self.arrays = SegmentArrays(self.path)
+
+    '''
+    reset_generation function
+    parameters:
+        none
+    results:
+        clears the backtracking state and the generation counters
+    returns:
+        none
+    '''
+    def reset_generation(self):
+        self.explored = dict()
+        self.fixed_index = 0
+        self.num_tries = 0
+        self.num_rejected = 0
+        self.num_backtracks = 0
+        self.num_retries = 0
+        self.generation_seconds = 0
+
+    '''
+    generate_path function
+    parameters:
+        none
+    results:
+        creates the segments of the track until the path length is reached, each one building off of the last
+    returns:
+        none
+    '''
+    def generate_path(self):
 
         # create the first segment and artifically set its length to min_seg_length, append it to the path
-        cur_path_dis = min_seg_length
-        first_seg = Segment(0, 0, path_width, cur_path_dis, 1, 0)
-        self.path.append(first_seg)
-        
+        self.add_segment(Segment(0, 0, self.path_width, self.min_seg_length, 1, 0))
+
         # create segments for the track until the total length is completed
-        while cur_path_dis < path_length:
-
-            # get the latest segment created to build off of
-            old_seg = self.path[-1]
-
-            # calculates the point to create the new segment
-            new_x = old_seg.x + old_seg.distance * old_seg.dir_x
-            new_y = old_seg.y + old_seg.distance * old_seg.dir_y
-
-            # creates a random length for the new segment, unless it is within 500 from the finish (makes sure track is exactly the total length)
-            if self.path_length - cur_path_dis < 500:
-                new_length = self.path_length - cur_path_dis
-            else:
-                new_length = random.randint(self.min_seg_length, self.max_seg_length)
-
-            # determines the direction of the new segment based on the old segment
-            if old_seg.dir_x < 0:           # old direction left
-
-                # chooses between left and up (left segments cannot be followed by down)
-                r_num = random.randint(0, 1)
-                if r_num == 0:              
-                    new_dir_x = -1
-                    new_dir_y = 0
-                else:
-                    new_dir_x = 0
-                    new_dir_y = -1
-            elif old_seg.dir_x > 0:         # old direction right
-
-                # chooses between right, up, and down (right segments can be followed by both up and down)
-                r_num = random.randint(0, 2)
-                if r_num == 0:
-                    new_dir_x = 1
-                    new_dir_y = 0
-                elif r_num == 1:
-                    new_dir_x = 0
-                    new_dir_y = -1
-                else:
-                    new_dir_x = 0
-                    new_dir_y = 1
-            elif old_seg.dir_y < 0:         # old direction up
-
-                # chooses between up, left, and right (up segments can be followed by both right and left)
-                r_num = random.randint(0, 2)
-                if r_num == 0:
-                    new_dir_x = 0
-                    new_dir_y = -1
-                elif r_num == 1:
-                    new_dir_x = -1
-                    new_dir_y = 0
-                else:
-                    new_dir_x = 1
-                    new_dir_y = 0
-            else:                            # old direction down
-
-                # chooses between down and right (down segment cannot be followed by left)
-                r_num = random.randint(0, 1)
-                if r_num == 0:              
-                    new_dir_x = 0
-                    new_dir_y = 1
-                else:
-                    new_dir_x = 1
-                    new_dir_y = 0
-
-            # creates the new segment for potential use
-            new_seg = Segment(new_x, new_y, self.path_width, new_length, new_dir_x, new_dir_y)
-
-            # determines if the new segment would overlap with the current track
-            is_bad_segment = False
-            for seg in self.path[:-1]:
-                if seg.is_overlapping_segment(new_seg):
-                    is_bad_segment = True
-                    break
-            
-            # appends the segment if it is a valid segment
-            if not is_bad_segment:
-                self.path.append(new_seg)
-                cur_path_dis += new_length
+        self.generate_to(self.path_length)
+
+    '''
+    generate_to function
+    parameters:
+        distance (float): length of track needed
+    results:
+        tries new segments until the track is at least that long (or complete), timing it
+    returns:
+        none
+    '''
+    def generate_to(self, distance):
+        distance = min(distance, self.path_length)
+        max_tries = self.max_tries_per_segment * (int(distance // self.min_seg_length) + 1)
+
+        start_time = time.perf_counter()
+        try:
+            while self.path_distance < distance:
+                if self.num_tries >= max_tries:
+                    raise RuntimeError("gave up generating the track after " + str(self.num_tries) + " tries (" +
+                                       str(self.num_backtracks) + " backtracks)")
+                self.try_segment()
+        finally:
+            self.generation_seconds += time.perf_counter() - start_time
+
+    '''
+    try_segment function
+    parameters:
+        none
+    results:
+        creates a random segment building off of the last one, and appends it to the path if it does not overlap the track,
+        backtracking if the track has boxed itself in
+    returns:
+        none
+    '''
+    def try_segment(self):
+        self.num_tries += 1
+
+        # get the latest segment created to build off of
+        old_seg = self.path[-1]
+
+        # creates a random length for the new segment, unless it is within 500 from the finish (makes sure track is exactly the total length)
+        new_length = self.next_length()
+        if new_length is None:
+            new_length = self.rng.randint(self.min_seg_length, self.max_seg_length)
+
+        # chooses one of the directions that can follow the old one (left cannot be followed by down, nor down by left)
+        directions = NEXT_DIRECTIONS[(old_seg.dir_x, old_seg.dir_y)]
+        new_dir_x, new_dir_y = directions[self.rng.randint(0, len(directions) - 1)]
+
+        # creates the new segment for potential use
+        new_seg = self.next_segment(new_length, new_dir_x, new_dir_y)
+
+        # appends the segment if it does not overlap with the current track (other than the segment it builds off of)
+        # and was not found to lead into a dead end before
+        explored = self.explored.get(len(self.path) - 1, ())
+        if (new_dir_x, new_dir_y, self.length_bucket(new_length)) not in explored and not self.overlaps_path(new_seg):
+            self.add_segment(new_seg)
+            return
+
+        self.num_rejected += 1
+        if self.is_dead_end():
+            self.backtrack()
+
+    '''
+    next_length function
+    parameters:
+        none
+    results:
+        checks if the next segment is within 500 of the finish
+    returns:
+        (int) the length left to the finish if it is, else None (the length is random)
+    '''
+    def next_length(self):
+        if self.path_length - self.path_distance < 500:
+            return self.path_length - self.path_distance
+        return None
+
+    '''
+    length_bucket function
+    parameters:
+        length (int): length of a segment
+    results:
+        splits min_seg_length to max_seg_length into NUM_LENGTH_BUCKETS ranges (shorter and longer lengths near the
+        finish go into the first and last one)
+    returns:
+        (int) the range the length falls in
+    '''
+    def length_bucket(self, length):
+        span = self.max_seg_length - self.min_seg_length + 1
+        return min(max(int((length - self.min_seg_length) * NUM_LENGTH_BUCKETS // span), 0), NUM_LENGTH_BUCKETS - 1)
+
+    '''
+    next_segment function
+    parameters:
+        length (int): length of the new segment
+        dir_x, dir_y (ints): direction of the new segment
+    results:
+        creates a segment starting where the last segment of the path ends
+    returns:
+        (Segment) the new segment
+    '''
+    def next_segment(self, length, dir_x, dir_y):
+        old_seg = self.path[-1]
+        new_x = old_seg.x + old_seg.distance * old_seg.dir_x
+        new_y = old_seg.y + old_seg.distance * old_seg.dir_y
+        return Segment(new_x, new_y, self.path_width, length, dir_x, dir_y)
+
+    '''
+    is_dead_end function
+    parameters:
+        none
+    results:
+        tries every direction and length bucket not yet explored from the last segment at the shortest length of the
+        bucket (a longer segment covers a shorter one, so if that overlaps, every length of the bucket does)
+    returns:
+        (bool) whether no segment can follow the last one
+    '''
+    def is_dead_end(self):
+        lengths = [self.next_length()]
+        if lengths[0] is None:
+            span = self.max_seg_length - self.min_seg_length + 1
+            lengths = [self.min_seg_length - (-bucket * span // NUM_LENGTH_BUCKETS) for bucket in range(NUM_LENGTH_BUCKETS)]
+
+        old_seg = self.path[-1]
+        explored = self.explored.get(len(self.path) - 1, ())
+        for dir_x, dir_y in NEXT_DIRECTIONS[(old_seg.dir_x, old_seg.dir_y)]:
+            for length in lengths:
+                if (dir_x, dir_y, self.length_bucket(length)) not in explored and not self.overlaps_path(self.next_segment(length, dir_x, dir_y)):
+                    return False
+        return True
+
+    '''
+    backtrack function
+    parameters:
+        none
+    results:
+        removes the last segment and marks its direction and length bucket as explored from the segment before it
+    returns:
+        none
+    '''
+    def backtrack(self):
+        if len(self.path) - 1 <= self.fixed_index:
+            raise RuntimeError("the track boxed itself in at segment " + str(len(self.path) - 1) + " and cannot backtrack past it")
+
+        seg = self.pop_segment()
+        self.explored.setdefault(len(self.path) - 1, set()).add((seg.dir_x, seg.dir_y, self.length_bucket(seg.distance)))
+        self.num_backtracks += 1
+
+    '''
+    overlaps_path function
+    parameters:
+        new_seg (Segment): segment that would be appended to the path
+    results:
+        checks the new segment against every segment of the path near it, other than the last one (which it builds off of)
+    returns:
+        True or False
+    '''
+    def overlaps_path(self, new_seg):
+        for seg_index in self.grid.query(new_seg):
+            if seg_index != len(self.path) - 1 and self.path[seg_index].is_overlapping_segment(new_seg):
+                return True
+        return False
+
+    '''
+    add_segment function
+    parameters:
+        seg (Segment): segment to add to the end of the path
+    results:
+        appends the segment to the path and to the grid, and adds its length to the path distance
+    returns:
+        none
+    '''
+    def add_segment(self, seg):
+        self.path.append(seg)
+        self.grid.add(seg, len(self.path) - 1)
+        self.path_distance += seg.distance
+
+    '''
+    pop_segment function
+    parameters:
+        none
+    results:
+        removes the last segment from the path and the grid, and forgets the directions explored from it
+    returns:
+        (Segment) the removed segment
+    '''
+    def pop_segment(self):
+        seg = self.path.pop()
+        self.grid.remove(seg, len(self.path))
+        self.path_distance -= seg.distance
+        self.explored.pop(len(self.path), None)
+        return seg
+
+    '''
+    segment_table function
+    parameters:
+        none
+    results:
+        stores the parameters of every segment (x, y, size, distance, dir_x, dir_y) in one contiguous array
+    returns:
+        (ndarray) (number of segments x 6) segment table, which can be given back to the constructor
+    '''
+    def segment_table(self):
+        return np.array([(seg.x, seg.y, seg.size, seg.distance, seg.dir_x, seg.dir_y) for seg in self.path], dtype=float)
+
+    '''
+    generation_stats function
+    parameters:
+        none
+    results:
+        collects the generation counters
+    returns:
+        (dict) number of segments, tries, rejected tries, backtracks, retries and seconds spent generating
+    '''
+    def generation_stats(self):
+        return {'segments': len(self.path), 'tries': self.num_tries, 'rejected': self.num_rejected,
+                'backtracks': self.num_backtracks, 'retries': self.num_retries, 'seconds': self.generation_seconds}
+
+'''
+generate_level function
+parameters:
+    settings (4 tuple): path width, path length, min and max segment length
+    seed (int): seed of the level, None to generate it with the random module
+    max_retries (int): the most times to start over after a generation gives up
+results:
+    generates the level, starting over (with the seed seed + k * RETRY_SEED_STEP on the k-th retry, or with the next random
+    numbers of the random module) whenever the generation gives up, and counts the retries in the level's generation stats
+returns:
+    (Level) the level
+'''
+def generate_level(settings, seed=None, max_retries=10):
+    start_time = time.perf_counter()
+    for retry in range(max_retries + 1):
+        rng = random.Random(seed + retry * RETRY_SEED_STEP) if seed is not None else None
+        try:
+            level = Level(*settings, rng=rng)
+        except RuntimeError:
+            continue
+
+        level.num_retries = retry
+        level.generation_seconds = time.perf_counter() - start_time
+        return level
+
+    raise RuntimeError("gave up generating a level with settings " + str(tuple(settings)) + " after " + str(max_retries) + " retries")
+
+'''
+Streaming Level Object
+variables:
+    parameters
+    seed (int): seed of the level's random number generator, so the same track can be generated again
+    lookahead (float): length of track kept generated past the start of the leading car's segment
+    trail (float): length of track kept before the start of the slowest live car's segment
+    path (TrackWindow): the segments generated so far, only the ones from path.offset on are still kept
+    cum_distance (TrackWindow): total length of the track up to the end of every kept segment
+    boxes (list): the bounding box (SegmentBox) of every segment generated so far, kept for the overlap checks
+purpose:
+    a level generated on demand as the cars drive it, for tracks too long (or with no end at all) to generate up front
+Notes:
+    The segments are generated by the same code as a Level's, so a streaming level and a Level with the same random
+    generator lay out the same track. Segment indices stay the indices within the whole track, only the segments more
+    than trail behind the slowest live car are dropped (see follow_cars). Their bounding boxes stay in the grid and in
+    boxes, so new segments are still checked against the whole track. A Simulation calls restart before a generation
+    starts and follow_cars before every tick, so every generation drives the same track from its start. Backtracking out
+    of a dead end never removes the segment ahead of the leading car or any before it (see Level.fixed_index), so a
+    generation giving up once the cars are driving raises its RuntimeError (restart retries with other seeds).
+    Only the kept segments can be drawn or saved, so a streaming level cannot be saved as a segment table (checkpoints,
+    level caches, recordings, the viewer and parallel workers all need one) or compiled into a CompiledTrack. A ray is
+    cut short where the kept segments end, which only happens for rays longer than trail behind the slowest car or
+    lookahead ahead of the leading car.
+'''
+class StreamingLevel(Level):
+
+    streaming = True
+
+    '''
+    Constructor
+    parameters:
+        path_width (int): the width of the track from one side to the other
+        path_length (int): the length of the track, None for a track with no end
+        min_seg_length (int): the minimum length of the track a segment can be
+        max_seg_length (int): the maximum length of the track a segment can be
+        seed (int): seed of the random number generator the segments are generated with
+        lookahead (float): length of track to keep generated ahead of the leading car
+        trail (float): length of track to keep behind the slowest live car
+        max_tries_per_segment (int): tries allowed for every min_seg_length of track, bounding the generation time
+    results:
+        generates the start of the track
+    return:
+        a streaming level object
+    '''
+    def __init__(self, path_width, path_length, min_seg_length, max_seg_length, seed=0, lookahead=3000, trail=3000, max_tries_per_segment=100):
+        self.path_width = path_width
+        self.path_length = path_length if path_length is not None else float('inf')
+        self.min_seg_length = min_seg_length
+        self.max_seg_length = max_seg_length
+        self.seed = seed
+        self.lookahead = lookahead
+        self.trail = trail
+        self.max_tries_per_segment = max_tries_per_segment
+
+        self.restart()
+
+    '''
+    restart function
+    parameters:
+        max_retries (int): the most times to start over
+    results:
+        drops the whole track and generates its start again from the seed (starting over with the seeds generate_level
+        would use if the start gives up)
+    returns:
+        none
+    '''
+    def restart(self, max_retries=10):
+        for retry in range(max_retries + 1):
+            self.rng = random.Random(self.seed + retry * RETRY_SEED_STEP)
+            self.path = TrackWindow()
+            self.cum_distance = TrackWindow()
+            self.boxes = list()
+            self.grid = SegmentGrid(self.path_width + self.max_seg_length)
+            self.path_distance = 0
+            self.reset_generation()
+
+            self.add_segment(Segment(0, 0, self.path_width, self.min_seg_length, 1, 0))
+            try:
+                self.extend_to(self.lookahead)
+            except RuntimeError:
+                continue
+            self.num_retries = retry
+            return
+
+        raise RuntimeError("gave up generating the start of a streaming level after " + str(max_retries) + " retries")
+
+    '''
+    extend_to function
+    parameters:
+        distance (float): length of track needed
+    results:
+        generates segments until the track is at least that long (or complete)
+    returns:
+        (bool) whether the path changed
+    '''
+    def extend_to(self, distance):
+        num_tries = self.num_tries
+        self.generate_to(distance)
+
+        if self.num_tries == num_tries:
+            return False
+        self.update_arrays()
+        return True
+
+    '''
+    evict_before function
+    parameters:
+        index (int): index of the first segment to keep
+    results:
+        drops the segments before it (their bounding boxes stay in the grid)
+    returns:
+        none
+    '''
+    def evict_before(self, index):
+        self.path.evict_before(index)
+        self.cum_distance.evict_before(index)
+        self.update_arrays()
+
+    '''
+    update_arrays function
+    parameters:
+        none
+    results:
+        stores the kept segments as arrays for the vectorized car code
+    returns:
+        none
+    '''
+    def update_arrays(self):
+        offset = self.path.offset
+        self.arrays = SegmentArrays(list(self.path), offset, self.cum_distance[offset] - self.path[offset].distance)
+
+    '''
+    follow_cars function
+    parameters:
+        physics (CarPhysics): physics engine of the cars driving the level
+    results:
+        generates the track lookahead past the leading live car, drops the segments more than trail behind the slowest
+        one (the total distances of the crashed cars are kept first), and moves the cars' segment bounds to the kept ones
+    returns:
+        none
+    '''
+    def follow_cars(self, physics):
+        if not physics.is_alive.any():
+            return
+        live_index = physics.current_segment_index[physics.is_alive]
+
+        # backtracking may not take away the segment ahead of a car, it could already be on it
+        self.fixed_index = live_index.max() + 1
+        changed = self.extend_to(self.cum_distance[live_index.max()] + self.lookahead)
+
+        # keeps the segment before the slowest car (it can drive back onto it) and trail of track before that
+        slowest = live_index.min()
+        keep_from = self.cum_distance[slowest] - self.path[slowest].distance - self.trail
+        first_index = self.path.offset
+        while first_index < slowest - 1 and self.cum_distance[first_index] < keep_from:
+            first_index += 1
+        if first_index > self.path.offset:
+            physics.freeze_distance(np.flatnonzero(~physics.is_alive))
+            self.evict_before(first_index)
+            changed = True
+
+        if changed:
+            physics.first_segment_index[:] = self.path.offset
+            physics.last_segment_index[:] = len(self.arrays) - 1
+
+    '''
+    add_segment function
+    parameters:
+        seg (Segment): segment to add to the end of the path
+    results:
+        appends the segment to the path, the grid and the boxes, and its total distance to cum_distance
+    returns:
+        none
+    '''
+    def add_segment(self, seg):
+        Level.add_segment(self, seg)
+        self.boxes.append(SegmentBox(seg.x1, seg.y1, seg.x2, seg.y2))
+        self.cum_distance.append(self.path_distance)
+
+    '''
+    pop_segment function
+    parameters:
+        none
+    results:
+        removes the last segment from the path, the grid, the boxes and cum_distance
+    returns:
+        (Segment) the removed segment
+    '''
+    def pop_segment(self):
+        self.boxes.pop()
+        self.cum_distance.pop()
+        return Level.pop_segment(self)
+
+    '''
+    overlaps_path function
+    parameters:
+        new_seg (Segment): segment that would be appended to the path
+    results:
+        checks the new segment against the bounding box of every segment generated near it, dropped ones included
+    returns:
+        True or False
+    '''
+    def overlaps_path(self, new_seg):
+        for seg_index in self.grid.query(new_seg):
+            if seg_index != len(self.path) - 1 and new_seg.is_overlapping_segment(self.boxes[seg_index]):
+                return True
+        return False
+
+    '''
+    segment_table function
+    parameters:
+        none
+    results:
+        none, the segments dropped behind the cars are gone
+    returns:
+        none, always raises a ValueError
+    '''
+    def segment_table(self):
+        raise ValueError("a streaming level does not keep its whole path, so it has no segment table")
+
+# bounding box of a segment, all the overlap check needs once the segment itself is dropped
+SegmentBox = collections.namedtuple('SegmentBox', ('x1', 'y1', 'x2', 'y2'))
+
+'''
+Track Window Object
+variables:
+    offset (int): index of the first item kept
+    items (list): the items kept, from offset on
+purpose:
+    a list of the items of a track (segments, distances) that drops its first items but keeps the index of every other
+Notes:
+    The length is the number of items ever appended, so len(window) - 1 is still the index of the last one. Reading an
+    item that was dropped raises an IndexError, and iterating only goes over the kept items.
+'''
+class TrackWindow:
+
+    '''
+    Constructor
+    parameters:
+        none
+    results:
+        creates an empty window
+    returns:
+        a track window object
+    '''
+    def __init__(self):
+        self.offset = 0
+        self.items = list()
+
+    '''
+    append function
+    parameters:
+        item: item to add after the last one
+    results:
+        appends the item
+    returns:
+        none
+    '''
+    def append(self, item):
+        self.items.append(item)
+
+    '''
+    pop function
+    parameters:
+        none
+    results:
+        removes the last item (which must still be kept)
+    returns:
+        the removed item
+    '''
+    def pop(self):
+        return self.items.pop()
+
+    '''
+    evict_before function
+    parameters:
+        index (int): index of the first item to keep
+    results:
+        drops every item before it
+    returns:
+        none
+    '''
+    def evict_before(self, index):
+        del self.items[:index - self.offset]
+        self.offset = max(self.offset, index)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < self.offset:
+            raise IndexError("item " + str(index) + " of the track was dropped")
+        return self.items[index - self.offset]
+
+    def __len__(self):
+        return self.offset + len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+'''
+Segment Grid Object
+variables:
+    cell_size (float): width and height of a grid cell
+    cells (dict): maps the (column, row) of a cell to the list of indices of the segments whose bounding box touches it
+purpose:
+    uniform grid over the bounding boxes of a path's segments, so only the segments near a point or a box need to be checked
+Notes:
+    Cells include their edges, so two segments whose bounding boxes only touch always share a cell. The exact
+    overlap test stays Segment.is_overlapping_segment, the grid only narrows down which segments to run it on.
+'''
+class SegmentGrid:
+
+    '''
+    Constructor
+    parameters:
+        cell_size (float): width and height of a grid cell
+    results:
+        creates an empty grid
+    returns:
+        a segment grid object
+    '''
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = dict()
+
+    '''
+    add function
+    parameters:
+        seg (Segment): segment to add
+        seg_index (int): index of the segment within its path
+    results:
+        adds the segment to every cell its bounding box touches
+    returns:
+        none
+    '''
+    def add(self, seg, seg_index):
+        self.add_box(seg.x1, seg.y1, seg.x2, seg.y2, seg_index)
+
+    '''
+    add_box function
+    parameters:
+        x1, y1, x2, y2 (floats): box to add (top left, bottom right)
+        index (int): index stored for the box
+    results:
+        adds the index to every cell the box touches
+    returns:
+        none
+    '''
+    def add_box(self, x1, y1, x2, y2, index):
+        for cell in self.cells_touching(x1, y1, x2, y2):
+            self.cells.setdefault(cell, list()).append(index)
+
+    '''
+    remove function
+    parameters:
+        seg (Segment): segment to remove
+        seg_index (int): index the segment was added with
+    results:
+        removes the segment from every cell its bounding box touches
+    returns:
+        none
+    '''
+    def remove(self, seg, seg_index):
+        for cell in self.cells_touching(seg.x1, seg.y1, seg.x2, seg.y2):
+            self.cells[cell].remove(seg_index)
+
+    '''
+    query function
+    parameters:
+        seg (Segment): segment to find the neighbours of
+    results:
+        collects the segments sharing a cell with the given segment's bounding box
+    returns:
+        (set) indices of the segments that might overlap with the given segment
+    '''
+    def query(self, seg):
+        return self.query_box(seg.x1, seg.y1, seg.x2, seg.y2)
+
+    '''
+    query_box function
+    parameters:
+        x1, y1, x2, y2 (floats): box to find the segments of (top left, bottom right)
+    results:
+        collects the segments sharing a cell with the given box
+    returns:
+        (set) indices of the segments that might overlap with the box
+    '''
+    def query_box(self, x1, y1, x2, y2):
+        found = set()
+        for cell in self.cells_touching(x1, y1, x2, y2):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+    '''
+    cells_touching function
+    parameters:
+        x1, y1, x2, y2 (floats): box to find the cells of (top left, bottom right)
+    results:
+        lists the cells the box touches, edges included
+    returns:
+        (list) (column, row) of every touched cell
+    '''
+    def cells_touching(self, x1, y1, x2, y2):
+        col1 = int(x1 // self.cell_size)
+        row1 = int(y1 // self.cell_size)
+        col2 = int(x2 // self.cell_size)
+        row2 = int(y2 // self.cell_size)
+        return [(col, row) for col in range(col1, col2 + 1) for row in range(row1, row2 + 1)]
+
+'''
+Segment Arrays Object
+variables:
+    x1, y1, x2, y2 (ndarrays): the bounding box of every segment of a path
+    m_x, m_y (ndarrays): the middle of the bounding box of every segment
+    width, height (ndarrays): width and height of every segment bounding box
+    distance (ndarray): length of every segment line
+    cum_distance (ndarray): total length of the path up to the end of every segment
+    dest_x, dest_y (ndarrays): the middle of the furthest edge of every segment, which is what track progress is measured to
+    offset (int): index within the level of the first segment stored (only not 0 for a StreamingLevel)
+purpose:
+    stores the segments of a path as parallel arrays, so a whole population of cars can look up their segments at once
+Notes:
+    The arrays are indexed from offset, so segment i of the level is element i - offset. The length of the arrays object is
+    the number of segments of the level up to the last one stored, so len(arrays) - 1 is always the last segment index.
+'''
+class SegmentArrays:
+
+    '''
+    Constructor
+    parameters:
+        path (list): the segments of a level, in track order
+        offset (int): index within the level of the first of the segments
+        start_distance (float): total length of the track before the first of the segments
+    results:
+        copies the variables of every segment into arrays
+    returns:
+        a segment arrays object
+    '''
+    def __init__(self, path, offset=0, start_distance=0):
+        self.offset = offset
+        self.x1 = np.array([seg.x1 for seg in path], dtype=float)
+        self.y1 = np.array([seg.y1 for seg in path], dtype=float)
+        self.x2 = np.array([seg.x2 for seg in path], dtype=float)
+        self.y2 = np.array([seg.y2 for seg in path], dtype=float)
+        self.m_x = np.array([seg.m_x for seg in path], dtype=float)
+        self.m_y = np.array([seg.m_y for seg in path], dtype=float)
+        self.width = np.array([seg.width for seg in path], dtype=float)
+        self.height = np.array([seg.height for seg in path], dtype=float)
+        self.distance = np.array([seg.distance for seg in path], dtype=float)
+        self.cum_distance = np.cumsum(self.distance) + start_distance
+        self.dest_x = np.array([seg.x + (seg.size / 2 + seg.distance) * seg.dir_x for seg in path], dtype=float)
+        self.dest_y = np.array([seg.y + (seg.size / 2 + seg.distance) * seg.dir_y for seg in path], dtype=float)
+
+    def __len__(self):
+        return self.offset + len(self.x1)
 
 '''
 Segment Object
@@ -229,15 +946,10 @@ class Segment:
         zoom (int): zoom factor
         res ([int, int]): dimensions of surface
     results:
-        draws the segment onto the pygame window
+        draws the segment with renderer.draw_seg (imported only here, so generating levels never loads pygame)
     returns:
         none
     '''
     def draw_seg(self, draw_surface, cx, cy, zoom, res):
-
-        px = (self.x1 - cx) * zoom + (res[0] / 2)
-        py = (self.y1 - cy) * zoom + (res[1] / 2)
-        pw = (self.x2 - self.x1) * zoom
-        ph = (self.y2 - self.y1) * zoom
-
-        pygame.draw.rect(draw_surface, (0, 0, 0), pygame.Rect(px, py, pw, ph))
\ No newline at end of file
+        from renderer import draw_seg
+        draw_seg(draw_surface, self, cx, cy, zoom, res)
\ No newline at end of file
@@ -1,148 +1,222 @@
-from level_generator import Level, Segment
-from NeuralNetwork.neural_net import NeuralNet
-from car import Car
-import pygame, random
-
-def turn_order(e):
-    return -e.total_dis
-
-random.seed(82)
-
-new_level = Level(100, 20000, 200, 210)
-
-generation = 1
-gens = list()
-cars = list()
-for i in range(50):
-    car = Car(0, 0, new_level)
-    car.setup_nn(5, 3, 6, 10)
-
-    cars.append(car)
-
-gens.append(cars)
+from level_generator import Segment, generate_level
+from sensors import RaySensor
+from simulation import Simulation
+from trainer import create_population, rank_cars, breed_generation
+from renderer import TrackRenderer, draw_cars
+from archive import GenerationArchive
+from checkpoint import save_checkpoint, load_checkpoint
+from NeuralNetwork.genome_pool import GenomePool
+from level_cache import LevelProvider
+from scheduler import GenerationScheduler
+from telemetry import Telemetry
+from viewer import Viewer
+from recorder import run_replay
+import pygame, random, time, os, sys
+
+# set to a recorded generation (see trainer.py --record) to play it back instead of training, no cars are simulated
+replay_path = None
+if replay_path is not None:
+    run_replay(replay_path, [1200, 700], 0.5)
+    sys.exit()
+
+sensor = RaySensor()
+
+# levels come from an on-disk cache, and the next one is generated in the background before it is needed
+level_provider = LevelProvider(background='thread')
+level_interval = 100
+new_level_settings = (100, 20000, 200, 300)
+
+# the population is saved every checkpoint_interval generations, and with resume = True a restarted run carries on from
+# the last save (off by default, so a checkpoint left over from another run is never picked up by accident)
+checkpoint_path = "checkpoint.bin"
+checkpoint_interval = 10
+resume = False
+
+if resume and os.path.exists(checkpoint_path):
+    checkpoint = load_checkpoint(checkpoint_path)
+    new_level = checkpoint.level
+    generation = checkpoint.generation
+    cars = checkpoint.restore_cars()
+    checkpoint.restore_random()
+    print("RESUMED: " + str(generation))
+else:
+    # the first level is generated with the random module (not cached), so the population after it is the same one as
+    # before the level cache (a level cached for seed 82 has the same segments, but drawing them moves the random state)
+    random.seed(82)
+    new_level = generate_level((100, 20000, 200, 210))
+    generation = 1
+    cars = create_population(50, new_level, sensor)
+level_provider.prefetch(82 + generation // level_interval + 1, new_level_settings)
+
+# only the last few generations are kept as cars, older ones are archived as flat weights (see archive.get_champion)
+archive = GenerationArchive(window=10)
+
+# every generation is bred into the same preallocated networks, deep enough to keep the archived window's networks intact
+nn = cars[0].nn
+pool = GenomePool((nn.num_in_nodes, nn.num_out_nodes, nn.num_hidden_nodes, nn.num_hidden_layers), len(cars), archive.window + 2)
+
+# set enabled=True to log the time of every phase of the ticks and frames, and a summary of every generation (off, it
+# writes nothing and the simulation skips its timed step)
+telemetry = Telemetry("telemetry.jsonl", enabled=False)
+mutation = None
+
+simulation = Simulation(cars, new_level, sensor, telemetry)
 
 max_cycle_time = 100 * 60
 cycle_time = 0
+percent_taken = 0.5
+
+# stops stalled cars, and ends the generation once the cars still driving can no longer change which cars get taken
+scheduler = GenerationScheduler(percent_taken, max_cycle_time)
 
 cx = 0
 cy = 0
 zoom = 0.5
 res = [1200, 700]
 
+# viewer speed: ticks simulated per drawn frame (+/- to change), uncapped (U) simulates flat out and only draws target_fps frames a second
+ticks_per_frame = 1
+max_ticks_per_frame = 4096
+uncapped = False
+target_fps = 30
+
+# draws the training in a separate viewer process fed by per-tick snapshots instead of in this one, so the simulation
+# runs flat out and never waits on drawing (closing the viewer window ends the training)
+async_viewer = False
+
 """
 Pygame Initialization
 """
 
-pygame.init()
+viewer = None
+if async_viewer:
+    viewer = Viewer(len(cars), res, target_fps, zoom)
+    uncapped = True
+else:
+    pygame.init()
 
-pygame.key.set_repeat(1)
+    pygame.key.set_repeat(1)
 
-clock = pygame.time.Clock()
+    clock = pygame.time.Clock()
 
-game_display = pygame.display.set_mode(res)
-draw_surface = pygame.Surface(res)
+    game_display = pygame.display.set_mode(res)
+    draw_surface = pygame.Surface(res)
+    track_renderer = TrackRenderer(new_level)
+
+    prev_keys = pygame.key.get_pressed()
 
 running = True
 while running:
 
-    cycle_time += 1
-    if cycle_time >= max_cycle_time:
-        generation += 1
-
-        gens[-1].sort(key=turn_order)
-
-        percent_taken = 0.5
-
-        print("NEWGEN: " + str(generation))
-        print(gens[-1][0].total_dis)
-
-        if generation % 100 == 0:
-            new_level = Level(100, 20000, 200, 300)
-
-        new_cars = list()
-        cars = gens[-1]
-        for i in range(0, len(cars)):
-            new_car = Car(0, 0, new_level)
-
-            if i < len(cars) * percent_taken:
-                new_car.take_nn(cars[i].nn.create_copy())
-                new_car.color = cars[i].color
-                
-            else:
-                take_index = i % int(len(cars) * percent_taken)
-                new_car.take_nn(cars[take_index].nn.create_mutation(take_index))
-                new_car.color = cars[take_index % int(percent_taken * len(cars))].color
-                co0 = min(max(100, new_car.color[0] + random.randint(-20, 20)), 255)
-                co1 = min(max(100, new_car.color[1] + random.randint(-20, 20)), 255)
-                co2 = min(max(100, new_car.color[2] + random.randint(-20, 20)), 255)
-                new_car.color = (co0, co1, co2)
-            new_cars.append(new_car)
-
-        gens.append(new_cars)
-
-        cycle_time = 0
-
     input_left = 0
     input_right = 0
     input_up = 0
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-    keys = pygame.key.get_pressed()
-    if keys[pygame.K_UP]:
-        input_up = 1
-    if keys[pygame.K_LEFT]:
-        input_left = 1
-    if keys[pygame.K_RIGHT]:
-        input_right = 1
-
-    best_car = None
-    is_live_car = False
-    for car in gens[-1]:
-        live_car = car.calculate_nn_decisions()
-        car.update()
-
-        if not is_live_car and live_car:
-            is_live_car = True
-
-        if not live_car:
-            continue
-        
-        if best_car == None:
-            best_car = car
+    if viewer is not None:
+        running = viewer.is_open()
+    else:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        keys = pygame.key.get_pressed()
+        if keys[pygame.K_UP]:
+            input_up = 1
+        if keys[pygame.K_LEFT]:
+            input_left = 1
+        if keys[pygame.K_RIGHT]:
+            input_right = 1
+
+        # viewer speed keys only act when first pressed, not for as long as they are held
+        if (keys[pygame.K_EQUALS] and not prev_keys[pygame.K_EQUALS]) or (keys[pygame.K_KP_PLUS] and not prev_keys[pygame.K_KP_PLUS]):
+            ticks_per_frame = min(ticks_per_frame * 2, max_ticks_per_frame)
+        if (keys[pygame.K_MINUS] and not prev_keys[pygame.K_MINUS]) or (keys[pygame.K_KP_MINUS] and not prev_keys[pygame.K_KP_MINUS]):
+            ticks_per_frame = max(ticks_per_frame // 2, 1)
+        if keys[pygame.K_u] and not prev_keys[pygame.K_u]:
+            uncapped = not uncapped
+        prev_keys = keys
+
+    # simulates ticks_per_frame ticks, or when uncapped as many ticks as fit in one target_fps frame, before drawing
+    frame_start = time.perf_counter()
+    frame_ticks = 0
+    frame_done = False
+    while not frame_done:
+
+        cycle_time += 1
+        if cycle_time >= max_cycle_time:
+            generation += 1
+
+            cars, fitness = rank_cars(cars, simulation.fitness())
+            archive.add(generation - 1, cars, fitness)
+
+            print("NEWGEN: " + str(generation))
+            print(fitness[0])
+            print("TICKS SAVED: " + str(scheduler.get_ticks_saved(simulation.ticks)))
+            telemetry.end_generation(generation - 1, simulation.ticks, fitness, mutation,
+                                     ticks_saved=scheduler.get_ticks_saved(simulation.ticks))
+
+            if generation % level_interval == 0:
+                new_level = level_provider.get_level(82 + generation // level_interval, new_level_settings)
+                level_provider.prefetch(82 + generation // level_interval + 1, new_level_settings)
+
+            cars = breed_generation(cars, new_level, percent_taken, pool)
+            mutation = pool.mutation_stats()
+            simulation = Simulation(cars, new_level, sensor, telemetry)
+
+            if generation % checkpoint_interval == 0:
+                save_checkpoint(checkpoint_path, generation, cars, new_level)
+
+            cycle_time = 0
+
+        # senses, runs the neural networks and moves every live car in one batch, then lets the scheduler stop cars
+        if not simulation.step() or not scheduler.update(simulation.physics, simulation.ticks):
+            cycle_time = max_cycle_time - 1
+
+        # the snapshot is a copy of a few arrays into shared memory, the viewer process does all the drawing
+        if viewer is not None:
+            viewer.publish(simulation, generation, cars[0].x, cars[0].y)
+
+        frame_ticks += 1
+        if uncapped:
+            frame_done = time.perf_counter() - frame_start >= 1 / target_fps
         else:
-            stats_best = turn_order(best_car)
-            stats_car = turn_order(car)
-
-            if stats_car < stats_best:
-                best_car = car
-
-    if not is_live_car:
-        cycle_time = max_cycle_time - 1
+            frame_done = frame_ticks >= ticks_per_frame
 
-    best_car = gens[-1][0]
+    best_car = cars[0]
     cx = best_car.x
     cy = best_car.y
 
+    if viewer is not None:
+        continue
+
     """
     UPDATE ABOVE
     RENDER BELOW
     """
 
-    draw_surface.fill((50, 50, 50))
+    render_start = time.perf_counter()
 
-    for seg in new_level.path:
-        seg.draw_seg(draw_surface, cx, cy, zoom, res)
+    # the track is drawn from cached tiles (rasterized again only for a new level), and only the cars on screen are drawn
+    if track_renderer.level is not new_level:
+        track_renderer = TrackRenderer(new_level)
+    track_renderer.draw(draw_surface, cx, cy, zoom, res)
 
-    for car in gens[-1]:
-        car.draw_car(draw_surface, cx, cy, zoom, res)
+    draw_cars(draw_surface, cars, simulation.physics, cx, cy, zoom, res)
 
     game_display.blit(draw_surface, (0, 0))
 
     pygame.display.update()
+    telemetry.add_time('rendering', time.perf_counter() - render_start)
+
+    speed = "uncapped (" + str(frame_ticks) + " ticks/frame)" if uncapped else str(ticks_per_frame) + " ticks/frame"
+    pygame.display.set_caption("generation " + str(generation) + " - " + speed)
 
-    clock.tick(144)
+    if not uncapped:
+        clock.tick(144)
 
+archive.close()
+telemetry.close()
+level_provider.close()
+if viewer is not None:
+    viewer.close()
 pygame.quit()
\ No newline at end of file
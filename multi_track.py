@@ -0,0 +1,142 @@
+from level_generator import SegmentArrays, generate_level
+from physics import CarPhysics, PHYSICS_VARIABLES
+from NeuralNetwork.population_net import PopulationNet
+import numpy as np
+
+'''
+Track Set Object
+variables:
+    levels (list): the levels of the set
+    path (list): the segments of every level, one level after the other
+    arrays (SegmentArrays): the same segments as parallel arrays, with cum_distance starting over at every level
+    first_index, last_index (ndarrays): index of the first and last segment of every level within path
+purpose:
+    lays several levels out as one segment table, so cars on different tracks can share one CarPhysics and RaySensor
+Notes:
+    A car on level k only ever looks at segments first_index[k] to last_index[k] (see CarPhysics.first_segment_index),
+    so the levels never interact even though they all start at the same point.
+'''
+class TrackSet:
+
+    '''
+    Constructor
+    parameters:
+        levels (list): level objects to lay out
+    results:
+        concatenates the segments of the levels
+    returns:
+        a track set object
+    '''
+    def __init__(self, levels):
+        self.levels = list(levels)
+        self.path = [seg for level in self.levels for seg in level.path]
+        self.arrays = SegmentArrays(self.path)
+
+        # the total distance along each track only counts that track's segments
+        self.arrays.cum_distance = np.concatenate([level.arrays.cum_distance for level in self.levels])
+
+        num_segments = np.array([len(level.path) for level in self.levels])
+        self.last_index = np.cumsum(num_segments) - 1
+        self.first_index = self.last_index - num_segments + 1
+
+'''
+Multi Track Evaluator Object
+variables:
+    extra_levels (list): the levels every generation is scored on besides the trainer's current level
+    aggregate (str): 'mean' or 'min', how the total distances of a car on every track are combined into its fitness
+    track_set (TrackSet): the track set of the last evaluated generation
+purpose:
+    scores every car of a generation on several tracks in one batched simulation, as a drop-in for
+    trainer.evaluate_generation, so the networks are selected for driving any track instead of one
+Notes:
+    Every (car, track) pair gets its own slot of one CarPhysics, laid out car by car, and every car's weights are
+    repeated once per track in one PopulationNet. Sensing, inference and physics then run once per tick for all the
+    pairs, so scoring on K tracks costs far less than K separate generations. Each pair's total distance is exactly the
+    one a single track simulation of that car on that track gives.
+'''
+class MultiTrackEvaluator:
+
+    '''
+    Constructor
+    parameters:
+        extra_levels (list): levels to score on besides the trainer's current level
+        aggregate (str): 'mean' or 'min'
+    results:
+        creates a new evaluator
+    returns:
+        a multi track evaluator object
+    '''
+    def __init__(self, extra_levels, aggregate='mean'):
+        if aggregate not in ('mean', 'min'):
+            raise ValueError("aggregate must be 'mean' or 'min'")
+        self.extra_levels = list(extra_levels)
+        self.aggregate = aggregate
+        self.track_set = None
+
+    '''
+    evaluate function
+    parameters:
+        cars (list): cars of the generation (each with a MatrixNet of the same shape)
+        level (Level): level object the trainer is on, the first track of the set
+        sensor (RaySensor): sensor giving the cars their neural network inputs (the segment walking one)
+        max_ticks (int): the most ticks the generation can last
+    results:
+        simulates every car on every track at once, then binds every car to its slot on the first track, so its state
+        (position, total_dis and so on) is the one it ended with on the trainer's level, like evaluate_generation leaves it
+    returns:
+        (2 tuple) fitness of every car (ndarray, the mean or min of its total distances, in the order of cars) and
+        number of ticks the generation lasted
+    '''
+    def evaluate(self, cars, level, sensor, max_ticks):
+        if sensor.compiled:
+            raise ValueError("a MultiTrackEvaluator needs a RaySensor walking the segments (compiled=False)")
+        if self.track_set is None or self.track_set.levels[0] is not level:
+            self.track_set = TrackSet([level] + self.extra_levels)
+        track_set = self.track_set
+        num_tracks = len(track_set.levels)
+
+        # every car starts in the state it is in on every one of its tracks
+        physics = CarPhysics(len(cars) * num_tracks, track_set)
+        for name in PHYSICS_VARIABLES:
+            getattr(physics, name)[:] = np.repeat([getattr(car, name) for car in cars], num_tracks)
+        track = np.tile(np.arange(num_tracks), len(cars))
+        physics.first_segment_index[:] = track_set.first_index[track]
+        physics.last_segment_index[:] = track_set.last_index[track]
+        physics.current_segment_index += physics.first_segment_index
+
+        weights = np.repeat(np.stack([car.nn.weights for car in cars]), num_tracks, axis=0)
+        population = PopulationNet(cars[0].nn.layer_sizes, weights)
+
+        # the same tick as Simulation.step, for every pair
+        ticks = 0
+        while ticks < max_ticks and physics.is_alive.any():
+            alive = physics.is_alive.copy()
+            nn_inputs = sensor.read_inputs(physics, alive)
+            nn_outputs = population.run_population(nn_inputs, alive)
+            physics.apply_nn_output(nn_outputs, alive)
+            physics.step()
+            ticks += 1
+
+        # the first track's segments come first in the track set, so a car's segment index there is valid on its own level
+        for i, car in enumerate(cars):
+            car.physics = physics
+            car.index = i * num_tracks
+
+        distances = physics.calc_total_distance().reshape(len(cars), num_tracks)
+        fitness = distances.mean(axis=1) if self.aggregate == 'mean' else distances.min(axis=1)
+        return fitness, ticks
+
+'''
+create_levels function
+parameters:
+    num_levels (int): number of levels to create
+    settings (4 tuple): path width, path length, min and max segment length
+    seed (int): seed of the first level (level i gets seed + i)
+results:
+    generates every level with its own seeded random number generator (see generate_level), so the global random state
+    is not touched
+returns:
+    (list) the levels
+'''
+def create_levels(num_levels, settings, seed):
+    return [generate_level(settings, seed + i) for i in range(num_levels)]
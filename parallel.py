@@ -0,0 +1,152 @@
+from level_generator import Level
+from car import Car
+from sensors import RaySensor
+from trainer import evaluate_generation
+from NeuralNetwork.matrix_net import MatrixNet
+from recorder import TrajectoryRecorder
+import multiprocessing, os, tempfile
+import numpy as np
+
+'''
+Parallel Evaluator Object
+variables:
+    processes (int): number of worker processes
+    pool (Pool): the worker processes
+    level_dir (TemporaryDirectory): directory holding the memory-mapped segment table of the current level
+    level (Level): the level currently shared with the workers
+    level_file (str): path of the current level's segment table
+    num_levels (int): number of levels shared so far
+purpose:
+    evaluates a generation by splitting its cars across a pool of processes, as a drop-in for trainer.evaluate_generation
+Notes:
+    Cars never interact, so every worker simulates its own slice of the generation with the same code as the serial path
+    and the total distances come out bit-identical. A level's segments are written once to a .npy file that the workers
+    memory-map and keep, so only the neural network weights are sent every generation.
+'''
+class ParallelEvaluator:
+
+    '''
+    Constructor
+    parameters:
+        processes (int): number of worker processes (defaults to the number of CPU cores)
+    results:
+        starts the worker processes
+    returns:
+        a parallel evaluator object
+    '''
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count()
+        self.pool = multiprocessing.Pool(self.processes)
+        self.level_dir = tempfile.TemporaryDirectory()
+        self.level = None
+        self.level_file = None
+        self.num_levels = 0
+
+    '''
+    evaluate function
+    parameters:
+        cars (list): cars of the generation (each with a MatrixNet of the same shape)
+        level (Level): level object the cars drive on
+        sensor (RaySensor): sensor giving the cars their neural network inputs
+        max_ticks (int): the most ticks the generation can last
+        recorder (TrajectoryRecorder): optional recorder to store the state of every car after every tick in (every
+            worker records its slice and sends it back with its results)
+    results:
+        simulates every slice of the generation in a worker process
+    returns:
+        (2 tuple) total distance of every car (ndarray, in the order of cars) and number of ticks the generation lasted
+    '''
+    def evaluate(self, cars, level, sensor, max_ticks, recorder=None):
+        if level is not self.level:
+            self.share_level(level)
+
+        nn = cars[0].nn
+        nn_shape = (nn.num_in_nodes, nn.num_out_nodes, nn.num_hidden_nodes, nn.num_hidden_layers)
+        level_settings = (level.path_width, level.path_length, level.min_seg_length, level.max_seg_length)
+        sensor_settings = (tuple(sensor.angles), sensor.scale, sensor.compiled)
+
+        # splits the weights of the generation into one contiguous slice per worker
+        weights = np.stack([car.nn.weights for car in cars])
+        tasks = list()
+        for chunk in np.array_split(weights, min(self.processes, len(cars))):
+            tasks.append((self.level_file, level_settings, sensor_settings, nn_shape, chunk, max_ticks, recorder is not None))
+
+        results = self.pool.map(evaluate_chunk, tasks)
+
+        fitness = np.concatenate([chunk_fitness for chunk_fitness, _, _ in results])
+        ticks = max(chunk_ticks for _, chunk_ticks, _ in results)
+        if recorder is not None:
+            recorder.load_chunks([chunk_record for _, _, chunk_record in results])
+        return fitness, ticks
+
+    '''
+    share_level function
+    parameters:
+        level (Level): the level to share with the workers
+    results:
+        writes the level's segment table to a new file for the workers to memory-map, and removes the previous level's file
+    returns:
+        none
+    '''
+    def share_level(self, level):
+        if self.level_file is not None:
+            os.remove(self.level_file)
+
+        self.num_levels += 1
+        self.level = level
+        self.level_file = os.path.join(self.level_dir.name, "level_" + str(self.num_levels) + ".npy")
+        np.save(self.level_file, level.segment_table())
+
+    '''
+    close function
+    parameters:
+        none
+    results:
+        stops the worker processes and removes the shared level files
+    returns:
+        none
+    '''
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.level_dir.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# the level each worker process currently simulates on, keyed by the path of its segment table
+worker_levels = dict()
+
+'''
+evaluate_chunk function
+parameters:
+    task (tuple): level file, level settings, sensor settings, neural network shape, weights of the cars, max ticks and
+        whether to record the cars
+results:
+    loads the level if the worker does not have it yet, then simulates the given cars (runs inside a worker process)
+returns:
+    (3 tuple) total distance of every car, number of ticks simulated and the recording of the cars (frames, death ticks
+    and number of ticks of a TrajectoryRecorder, None when not recording)
+'''
+def evaluate_chunk(task):
+    level_file, level_settings, sensor_settings, nn_shape, weights, max_ticks, record = task
+
+    if level_file not in worker_levels:
+        worker_levels.clear()
+        worker_levels[level_file] = Level(*level_settings, segments=np.load(level_file, mmap_mode='r'))
+    level = worker_levels[level_file]
+
+    cars = list()
+    for car_weights in weights:
+        car = Car(0, 0, level)
+        car.take_nn(MatrixNet(*nn_shape, weights=car_weights))
+        cars.append(car)
+
+    recorder = TrajectoryRecorder(len(cars), max_ticks) if record else None
+    fitness, ticks = evaluate_generation(cars, level, RaySensor(*sensor_settings), max_ticks, recorder=recorder)
+    if recorder is None:
+        return fitness, ticks, None
+    return fitness, ticks, (recorder.frames(), recorder.death_tick, recorder.num_ticks)
@@ -0,0 +1,269 @@
+import numpy as np
+
+'''
+Car Physics Object
+variables:
+    num_cars (int): number of cars simulated by the engine
+    level (Level): the level object the cars run on
+    max_vel, acc_force, turn_multiplier (floats): static car movement properties (same values as a Car)
+    x, y, vel, rotation, acc, left, right, turn (ndarrays): dynamic car movement properties, one value per car
+    is_alive (ndarray): whether each car is still intact or has driven off the track
+    current_segment_index (ndarray): the index of the segment of the level that each car is currently on
+    progress_x, progress_y (ndarrays): the last position where each car was checked to be on the track
+    first_segment_index, last_segment_index (ndarrays): the first and last segment of each car's track (the whole level by
+        default, one track of a TrackSet when several tracks share the engine)
+    final_distance (ndarray): total distance of every car whose distance was frozen (NaN for the others, see freeze_distance)
+purpose:
+    stores the state of a whole population of cars as parallel arrays and moves all of them at once
+Notes:
+    The math follows Car.update/Car.track_progress, just done for every car with numpy. A Car bound to the engine
+    (see bind_cars) reads and writes its state straight from these arrays, so it stays usable for drawing and player input.
+'''
+class CarPhysics:
+
+    '''
+    Constructor
+    parameters:
+        num_cars (int): number of cars to simulate
+        level (Level): level object that the cars drive on
+    results:
+        creates the state arrays of the cars, all reset to the start of the track
+    returns:
+        a car physics object
+    '''
+    def __init__(self, num_cars, level):
+        self.num_cars = num_cars
+        self.level = level
+
+        self.max_vel = 5
+        self.acc_force = 0.2
+        self.turn_multiplier = 2.75
+
+        self.x = np.zeros(num_cars)
+        self.y = np.zeros(num_cars)
+        self.vel = np.zeros(num_cars)
+        self.rotation = np.zeros(num_cars)
+        self.acc = np.zeros(num_cars)
+        self.left = np.zeros(num_cars)
+        self.right = np.zeros(num_cars)
+        self.turn = np.zeros(num_cars)
+
+        self.is_alive = np.ones(num_cars, dtype=bool)
+        self.current_segment_index = np.zeros(num_cars, dtype=int)
+        self.progress_x = np.zeros(num_cars)
+        self.progress_y = np.zeros(num_cars)
+
+        self.first_segment_index = np.zeros(num_cars, dtype=int)
+        self.last_segment_index = np.full(num_cars, len(level.arrays) - 1)
+        self.final_distance = np.full(num_cars, np.nan)
+
+    '''
+    bind_cars function
+    parameters:
+        cars (list): one car per slot of the engine
+    results:
+        copies the state of every car into the engine, and makes the cars views of their slot
+    returns:
+        none
+    '''
+    def bind_cars(self, cars):
+        assert len(cars) == self.num_cars
+
+        for i, car in enumerate(cars):
+            for name in PHYSICS_VARIABLES:
+                getattr(self, name)[i] = getattr(car, name)
+            car.physics = self
+            car.index = i
+
+    '''
+    apply_nn_output function
+    parameters:
+        nn_output (ndarray): (number of cars x 3) neural network outputs (left turn, right turn, whether or not to turn)
+        mask (ndarray): optional boolean array of the cars that should take their output
+    results:
+        turns the neural network outputs into the cars' movement inputs, like Car.apply_nn_output
+    returns:
+        none
+    '''
+    def apply_nn_output(self, nn_output, mask=None):
+
+        # if the neural network decided to not turn the car, then don't turn the car
+        no_turn = nn_output[:, 2] < 0
+        left = np.where(no_turn, 0, nn_output[:, 0])
+        right = np.where(no_turn, 0, nn_output[:, 1])
+
+        self.set_inputs(np.ones(self.num_cars), left, right, mask)
+
+    '''
+    set_inputs function
+    parameters:
+        acc (ndarray): acceleration input of every car
+        left, right (ndarrays): left/right inputs of every car
+        mask (ndarray): optional boolean array of the cars that should take the inputs
+    results:
+        takes the given inputs and calculates how much each car should turn and whether to accelerate/decelerate
+    returns:
+        none
+    '''
+    def set_inputs(self, acc, left, right, mask=None):
+        if mask is None:
+            mask = np.ones(self.num_cars, dtype=bool)
+
+        self.acc[mask] = np.where(acc[mask] > 0, 1, -1)
+        self.left[mask] = left[mask]
+        self.right[mask] = right[mask]
+        self.turn[mask] = np.clip(right[mask] - left[mask], -1, 1)
+
+    '''
+    step function
+    parameters:
+        none
+    results:
+        performs one 60th of a second for every car that has not crashed, including moving, checking track progress, and checking live status
+    returns:
+        none
+    '''
+    def step(self):
+
+        # don't do anything to the cars that have crashed
+        live = np.flatnonzero(self.is_alive)
+
+        self.move(live)
+
+        # track the progress/status of the cars
+        self.track_progress(live)
+
+    '''
+    move function
+    parameters:
+        live (ndarray): indices of the cars to move
+    results:
+        rotates the cars, changes their velocity and moves them, like the first half of Car.update
+    returns:
+        none
+    '''
+    def move(self, live):
+
+        # handles MOVEMENT, including rotating the cars, changing their velocity, and changing their position
+        self.rotation[live] += self.turn[live] * self.turn_multiplier
+        self.vel[live] = np.maximum(np.minimum(self.max_vel, self.vel[live] + self.acc_force * self.acc[live]), 0)
+
+        radians = np.radians(self.rotation[live])
+        self.x[live] += np.cos(radians) * self.vel[live]
+        self.y[live] += np.sin(radians) * self.vel[live]
+
+    '''
+    track_progress function
+    parameters:
+        live (ndarray): indices of the cars to check
+    results:
+        updates the progress of the cars and checks whether they have crashed or not
+    returns:
+        none
+    '''
+    def track_progress(self, live):
+        x = self.x[live]
+        y = self.y[live]
+        index = self.current_segment_index[live]
+        first_index = self.first_segment_index[live]
+        last_index = self.last_segment_index[live]
+
+        # cars that left their segment are still on the track if they are on the previous or the next segment
+        on_current = self.is_on_segment(x, y, index)
+        on_prev = ~on_current & (index > first_index) & self.is_on_segment(x, y, np.maximum(index - 1, first_index))
+        on_next = ~on_current & ~on_prev & (index < last_index) & self.is_on_segment(x, y, np.minimum(index + 1, last_index))
+
+        index = index - on_prev + on_next
+        self.current_segment_index[live] = index
+
+        # kills the cars that veered off track this iteration
+        self.is_alive[live] = on_current | on_prev | on_next
+
+        # remember where the live cars last were on the track, the total distance is only calculated when it is needed
+        still_alive = live[self.is_alive[live]]
+        self.progress_x[still_alive] = self.x[still_alive]
+        self.progress_y[still_alive] = self.y[still_alive]
+
+    '''
+    calc_total_distance function
+    parameters:
+        cars (ndarray): optional indices of the cars to calculate the distance of (all cars by default)
+    results:
+        calculates the total distance the cars traveled, up to the last point each was seen on the track
+    returns:
+        (ndarray) total distance of each car
+    '''
+    def calc_total_distance(self, cars=None):
+        if cars is None:
+            cars = np.arange(self.num_cars)
+
+        # the cars whose distance was frozen keep it, their segments may be gone
+        distance = self.final_distance[cars]
+        todo = np.isnan(distance)
+        cars = cars[todo]
+
+        segs = self.level.arrays
+        last_index = self.last_segment_index[cars]
+        x = self.progress_x[cars]
+        y = self.progress_y[cars]
+
+        # cars can be on two segments at once, this uses the further segment
+        index = self.current_segment_index[cars]
+        next_index = np.minimum(index + 1, last_index)
+        index = np.where((index < last_index) & self.is_on_segment(x, y, next_index), next_index, index)
+
+        # the length of the track up to the end of the current segment, minus the distance left to the end of that segment
+        index = index - segs.offset
+        distance[todo] = segs.cum_distance[index] - np.hypot(x - segs.dest_x[index], y - segs.dest_y[index])
+        return distance
+
+    '''
+    freeze_distance function
+    parameters:
+        cars (ndarray): indices of the crashed cars to freeze the distance of
+    results:
+        stores the total distance of the cars, so it no longer needs their segments (see StreamingLevel.follow_cars)
+    returns:
+        none
+    '''
+    def freeze_distance(self, cars):
+        cars = cars[np.isnan(self.final_distance[cars])]
+        self.final_distance[cars] = self.calc_total_distance(cars)
+
+    '''
+    is_on_segment function
+    parameters:
+        x, y (ndarrays): points to check
+        index (ndarray): index of the segment to check each point against
+    results:
+        checks if each point is on its segment
+    returns:
+        (ndarray) boolean array, whether each point is on its segment
+    '''
+    def is_on_segment(self, x, y, index):
+        segs = self.level.arrays
+        index = index - segs.offset
+        return (x >= segs.x1[index]) & (x <= segs.x2[index]) & (y >= segs.y1[index]) & (y <= segs.y2[index])
+
+# names of the car variables stored by the physics engine
+PHYSICS_VARIABLES = ('x', 'y', 'vel', 'rotation', 'acc', 'left', 'right', 'turn', 'is_alive', 'current_segment_index',
+                     'progress_x', 'progress_y')
+
+'''
+physics_property function
+parameters:
+    name (str): name of the engine array the property reads from
+results:
+    creates a property that reads and writes a car's slot of the given engine array
+returns:
+    (property) the car property
+'''
+def physics_property(name):
+
+    def get_value(car):
+        return getattr(car.physics, name)[car.index].item()
+
+    def set_value(car, value):
+        getattr(car.physics, name)[car.index] = value
+
+    return property(get_value, set_value)
@@ -0,0 +1,332 @@
+from level_generator import Level
+import argparse, json, os, struct, zlib
+import numpy as np
+
+# first bytes of every recording file, followed by the 4 byte length of the JSON header
+MAGIC = b'CARTRAJ1'
+
+# positions are stored in 1/64 world units and rotations in 1/100 degrees
+POSITION_SCALE = 64
+ROTATION_SCALE = 100
+
+'''
+Trajectory Recorder Object
+variables:
+    num_cars (int): number of cars recorded
+    capacity (int): the most ticks kept (older ticks are overwritten)
+    x, y, rotation (ndarrays): (capacity x cars) ring buffers of every car's state, tick t is in row (t - 1) % capacity
+    death_tick (ndarray): first tick every car was seen off the track (-1 while it is still driving)
+    num_ticks (int): number of ticks recorded so far
+purpose:
+    records the position, rotation and live status of every car after every tick of a generation, so the generation
+    can be played back later without simulating it again (see run_replay)
+Notes:
+    A car never comes back once it stopped driving, so the live status of every car is stored as the single tick it
+    stopped at instead of a flag per tick.
+'''
+class TrajectoryRecorder:
+
+    '''
+    Constructor
+    parameters:
+        num_cars (int): number of cars to record
+        capacity (int): the most ticks to keep (a generation's max ticks keeps the whole generation)
+    results:
+        allocates the ring buffers
+    returns:
+        a trajectory recorder object
+    '''
+    def __init__(self, num_cars, capacity=100 * 60):
+        self.num_cars = num_cars
+        self.capacity = capacity
+        self.x = np.zeros((capacity, num_cars), dtype=np.float32)
+        self.y = np.zeros((capacity, num_cars), dtype=np.float32)
+        self.rotation = np.zeros((capacity, num_cars), dtype=np.float32)
+        self.death_tick = np.full(num_cars, -1)
+        self.num_ticks = 0
+
+    '''
+    record function
+    parameters:
+        physics (CarPhysics): the physics engine after a tick
+    results:
+        stores the state of every car after the tick
+    returns:
+        none
+    '''
+    def record(self, physics):
+        self.num_ticks += 1
+        row = (self.num_ticks - 1) % self.capacity
+        self.x[row] = physics.x
+        self.y[row] = physics.y
+        self.rotation[row] = physics.rotation
+        self.death_tick[(self.death_tick < 0) & ~physics.is_alive] = self.num_ticks
+
+    '''
+    frames function
+    parameters:
+        none
+    results:
+        puts the kept ticks in order
+    returns:
+        (4 tuple) number of the first kept tick, and the (ticks x cars) x, y and rotation of every kept tick
+    '''
+    def frames(self):
+        num_frames = min(self.num_ticks, self.capacity)
+        rows = np.arange(self.num_ticks - num_frames, self.num_ticks) % self.capacity
+        return self.num_ticks - num_frames + 1, self.x[rows], self.y[rows], self.rotation[rows]
+
+    '''
+    load_chunks function
+    parameters:
+        chunks (list): (frames, death_tick, num_ticks) of every recorder that recorded a slice of the cars, in car order
+            (see ParallelEvaluator.evaluate)
+    results:
+        fills the recorder with the slices, a slice that finished early keeps its cars where they stopped
+    returns:
+        none
+    '''
+    def load_chunks(self, chunks):
+        self.num_ticks = max(num_ticks for _, _, num_ticks in chunks)
+        num_frames = min(self.num_ticks, self.capacity)
+        ticks = np.arange(self.num_ticks - num_frames + 1, self.num_ticks + 1)
+        rows = (ticks - 1) % self.capacity
+
+        first_car = 0
+        for (first_tick, x, y, rotation), death_tick, _ in chunks:
+            cars = slice(first_car, first_car + len(death_tick))
+            frame = np.clip(ticks - first_tick, 0, len(x) - 1)
+            self.x[rows, cars] = x[frame]
+            self.y[rows, cars] = y[frame]
+            self.rotation[rows, cars] = rotation[frame]
+            self.death_tick[cars] = death_tick
+            first_car += len(death_tick)
+
+    '''
+    save function
+    parameters:
+        path (str): file to write the recording to
+        level (Level): level object the cars drove on
+        colors (list): color of every car
+        generation (int): optional number of the recorded generation
+        fitness (list): optional total distance of every car
+    results:
+        delta encodes the kept ticks and writes them with the level to a temporary file next to path, then renames it
+        over path
+    returns:
+        none
+    Notes:
+        The file holds MAGIC, the header length, a JSON header and then zlib compressed little endian arrays: the colors,
+        the death ticks, the first tick of x, y and rotation as integers in POSITION_SCALE and ROTATION_SCALE units, the
+        change of those integers every following tick (int16 unless a change does not fit) and the level's segment
+        table. Changes of the rounded values add back up to exactly the rounded values, so no error builds up.
+    '''
+    def save(self, path, level, colors, generation=None, fitness=None):
+        first_tick, x, y, rotation = self.frames()
+        values = np.stack([np.round(x.astype(float) * POSITION_SCALE), np.round(y.astype(float) * POSITION_SCALE),
+                           np.round(rotation.astype(float) * ROTATION_SCALE)], axis=1).astype(np.int64)
+        changes = np.diff(values, axis=0)
+        change_dtype = '<i2' if len(changes) == 0 or np.abs(changes).max() < 2 ** 15 else '<i4'
+
+        arrays = {
+            'colors': np.array(colors, dtype='u1').reshape(-1, 3),
+            'death_tick': self.death_tick.astype('<i4'),
+            'first_frame': values[:1].astype('<i4'),
+            'changes': changes.astype(change_dtype),
+            'segments': np.ascontiguousarray(level.segment_table(), dtype='<f8'),
+        }
+
+        blocks = list()
+        array_info = dict()
+        for name, array in arrays.items():
+            block = zlib.compress(array.tobytes())
+            array_info[name] = {'size': len(block), 'dtype': array.dtype.str, 'shape': array.shape}
+            blocks.append(block)
+
+        header = json.dumps({
+            'generation': generation,
+            'first_tick': int(first_tick),
+            'num_ticks': int(self.num_ticks),
+            'level_settings': [level.path_width, level.path_length, level.min_seg_length, level.max_seg_length],
+            'fitness': None if fitness is None else [float(dis) for dis in fitness],
+            'arrays': array_info,
+        }).encode()
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(MAGIC + struct.pack('<I', len(header)) + header)
+            for block in blocks:
+                file.write(block)
+        os.replace(temp_path, path)
+
+'''
+Recording Object
+variables:
+    generation (int): number of the recorded generation (None if not given)
+    level (Level): the level the cars drove on, rebuilt from the stored segments
+    colors (ndarray): (cars x 3) color of every car
+    fitness (list): total distance of every car (None if not given)
+    first_tick (int): number of the first recorded tick
+    x, y, rotation (ndarrays): (ticks x cars) state of every car after every recorded tick
+    death_tick (ndarray): first tick every car was seen off the track (-1 if it never was)
+    num_frames (int): number of recorded ticks
+purpose:
+    holds a loaded recording, ready to be played back
+'''
+class Recording:
+
+    def __init__(self, generation, level, colors, fitness, first_tick, x, y, rotation, death_tick):
+        self.generation = generation
+        self.level = level
+        self.colors = colors
+        self.fitness = fitness
+        self.first_tick = first_tick
+        self.x = x
+        self.y = y
+        self.rotation = rotation
+        self.death_tick = death_tick
+        self.num_frames = len(x)
+
+    '''
+    is_alive function
+    parameters:
+        frame (int): index of the recorded tick
+    returns:
+        (ndarray) whether every car was still driving after the tick
+    '''
+    def is_alive(self, frame):
+        return (self.death_tick < 0) | (self.first_tick + frame < self.death_tick)
+
+'''
+load_recording function
+parameters:
+    path (str): file the recording was written to
+results:
+    reads the file and adds the changes back up into the state of every car after every tick
+returns:
+    (Recording) the loaded recording
+'''
+def load_recording(path):
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a recording file")
+        header_length = struct.unpack('<I', file.read(4))[0]
+        header = json.loads(file.read(header_length))
+
+        arrays = dict()
+        for name, info in header['arrays'].items():
+            data = zlib.decompress(file.read(info['size']))
+            arrays[name] = np.frombuffer(data, dtype=np.dtype(info['dtype'])).reshape(info['shape'])
+
+    values = np.concatenate([arrays['first_frame'].astype(np.int64), arrays['changes'].astype(np.int64)]).cumsum(axis=0)
+    x = values[:, 0] / POSITION_SCALE
+    y = values[:, 1] / POSITION_SCALE
+    rotation = values[:, 2] / ROTATION_SCALE
+
+    level = Level(*header['level_settings'], segments=arrays['segments'])
+    return Recording(header['generation'], level, arrays['colors'], header['fitness'], header['first_tick'], x, y, rotation,
+                     arrays['death_tick'].astype(int))
+
+'''
+run_replay function
+parameters:
+    path (str): file of the recording to play back
+    res ([int, int]): size of the window
+    zoom (float): zoom factor
+    fps (int): frames per second to draw at
+results:
+    opens a window playing the recording back, without any sensing or neural networks, until it is closed
+returns:
+    none
+Notes:
+    Space pauses, + and - double or halve the speed (down to 1/8 of a tick per frame), left and right seek a second back
+    or forward (10 with shift), home and end jump to the start and the end, tab switches the followed car and clicking
+    the bar at the bottom seeks to that point.
+'''
+def run_replay(path, res=(1200, 700), zoom=0.5, fps=60):
+    import pygame
+    from renderer import TrackRenderer, draw_points
+
+    recording = load_recording(path)
+    if recording.num_frames == 0:
+        raise ValueError(path + " has no recorded ticks")
+
+    # follows the car that went the furthest, if the recording knows which one that is
+    follow = int(np.argmax(recording.fitness)) if recording.fitness is not None else 0
+
+    pygame.init()
+    clock = pygame.time.Clock()
+    game_display = pygame.display.set_mode(res)
+    draw_surface = pygame.Surface(res)
+    track_renderer = TrackRenderer(recording.level)
+    bar_height = 12
+
+    position = 0.0
+    speed = 1.0
+    paused = False
+    last_frame = recording.num_frames - 1
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                seek = 60 * (10 if event.mod & pygame.KMOD_SHIFT else 1)
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key in (pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    speed = min(speed * 2, 4096)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    speed = max(speed / 2, 1 / 8)
+                elif event.key == pygame.K_LEFT:
+                    position -= seek
+                elif event.key == pygame.K_RIGHT:
+                    position += seek
+                elif event.key == pygame.K_HOME:
+                    position = 0
+                elif event.key == pygame.K_END:
+                    position = last_frame
+                elif event.key == pygame.K_TAB:
+                    follow = (follow + 1) % len(recording.colors)
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.pos[1] >= res[1] - bar_height:
+                position = event.pos[0] / res[0] * last_frame
+
+        if not paused:
+            position += speed
+        position = min(max(position, 0), last_frame)
+        frame = int(position)
+
+        x = recording.x[frame]
+        y = recording.y[frame]
+        cx = x[follow]
+        cy = y[follow]
+        track_renderer.draw(draw_surface, cx, cy, zoom, res)
+
+        # cars that stopped driving are drawn darker
+        alive = recording.is_alive(frame)
+        colors = np.where(alive[:, None], recording.colors, recording.colors // 2)
+        draw_points(draw_surface, x, y, colors, cx, cy, zoom, res)
+
+        # the followed car's heading, then the seek bar
+        radians = np.radians(recording.rotation[frame][follow])
+        center = (res[0] / 2, res[1] / 2)
+        pygame.draw.line(draw_surface, (255, 255, 255), center, (center[0] + np.cos(radians) * 16 * zoom, center[1] + np.sin(radians) * 16 * zoom))
+        pygame.draw.rect(draw_surface, (80, 80, 80), pygame.Rect(0, res[1] - bar_height, res[0], bar_height))
+        pygame.draw.rect(draw_surface, (200, 200, 200), pygame.Rect(0, res[1] - bar_height, round(res[0] * frame / max(last_frame, 1)), bar_height))
+
+        game_display.blit(draw_surface, (0, 0))
+        pygame.display.update()
+        pygame.display.set_caption("replay" + ("" if recording.generation is None else " of generation " + str(recording.generation)) +
+                                   " - tick " + str(recording.first_tick + frame) + " / " + str(recording.first_tick + last_frame) +
+                                   " - " + str(speed) + " ticks/frame" + (" (paused)" if paused else ""))
+        clock.tick(fps)
+
+    pygame.quit()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="plays a recorded generation back (see trainer.py --record)")
+    parser.add_argument('path', help="recording file")
+    parser.add_argument('--zoom', type=float, default=0.5, help="zoom factor")
+    args = parser.parse_args()
+    run_replay(args.path, zoom=args.zoom)
@@ -0,0 +1,210 @@
+import pygame
+import numpy as np
+
+'''
+Track Renderer Object
+variables:
+    level (Level): the level being drawn
+    tile_size (int): width and height of a tile in pixels
+    max_tiles (int): the most tiles kept in the cache (the oldest ones are dropped first)
+    zoom (float): zoom factor the cached tiles were drawn at
+    tiles (dict): maps the (column, row) of a tile to its surface, or None if no segment touches it
+    background (3 tuple): color of everything off the track
+purpose:
+    draws a level's track from square tiles that are rasterized once per zoom level, blitting only the ones in view
+Notes:
+    Tiles are laid out in screen pixels at the current zoom, with tile (0, 0) starting at the world origin. The segments
+    touching a tile are looked up through the level's SegmentGrid, so drawing a frame does not depend on the track length.
+'''
+class TrackRenderer:
+
+    '''
+    Constructor
+    parameters:
+        level (Level): level object to draw
+        tile_size (int): width and height of a tile in pixels
+        max_tiles (int): the most tiles kept in the cache
+    results:
+        creates a renderer with an empty tile cache (a streaming level cannot be drawn, as its tiles would outlive the
+        segments it drops and miss the ones it generates later)
+    returns:
+        a track renderer object
+    '''
+    def __init__(self, level, tile_size=256, max_tiles=512):
+        if level.streaming:
+            raise ValueError("a streaming level cannot be drawn, it only keeps the segments near the cars")
+        self.level = level
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.zoom = None
+        self.tiles = dict()
+        self.background = (50, 50, 50)
+
+    '''
+    draw function
+    parameters:
+        draw_surface (Surface): pygame surface object to draw on
+        cx, cy (floats): the point on the WORLD space that the screen is centering (middle of screen)
+        zoom (float): zoom factor
+        res ([int, int]): dimensions of surface
+    results:
+        fills the surface with the background and blits the visible tiles of the track onto it
+    returns:
+        none
+    '''
+    def draw(self, draw_surface, cx, cy, zoom, res):
+
+        # the tiles only hold for the zoom they were drawn at
+        if zoom != self.zoom:
+            self.tiles.clear()
+            self.zoom = zoom
+
+        draw_surface.fill(self.background)
+
+        # screen pixel (0, 0) sits at this point of the zoomed world
+        origin_x = cx * zoom - res[0] / 2
+        origin_y = cy * zoom - res[1] / 2
+
+        col1 = int(origin_x // self.tile_size)
+        row1 = int(origin_y // self.tile_size)
+        col2 = int((origin_x + res[0]) // self.tile_size)
+        row2 = int((origin_y + res[1]) // self.tile_size)
+
+        for col in range(col1, col2 + 1):
+            for row in range(row1, row2 + 1):
+                tile = self.get_tile(col, row)
+                if tile is not None:
+                    draw_surface.blit(tile, (round(col * self.tile_size - origin_x), round(row * self.tile_size - origin_y)))
+
+    '''
+    get_tile function
+    parameters:
+        col, row (ints): position of the tile
+    results:
+        rasterizes the tile if it is not cached yet
+    returns:
+        (Surface) the tile, or None if no segment touches it
+    '''
+    def get_tile(self, col, row):
+        if (col, row) not in self.tiles:
+            if len(self.tiles) >= self.max_tiles:
+                del self.tiles[next(iter(self.tiles))]
+            self.tiles[(col, row)] = self.build_tile(col, row)
+        return self.tiles[(col, row)]
+
+    '''
+    build_tile function
+    parameters:
+        col, row (ints): position of the tile
+    results:
+        draws every segment touching the tile onto a new surface
+    returns:
+        (Surface) the tile, or None if no segment touches it
+    '''
+    def build_tile(self, col, row):
+        left = col * self.tile_size
+        top = row * self.tile_size
+        seg_indices = self.level.grid.query_box(left / self.zoom, top / self.zoom,
+                                                (left + self.tile_size) / self.zoom, (top + self.tile_size) / self.zoom)
+        if len(seg_indices) == 0:
+            return None
+
+        tile = pygame.Surface((self.tile_size, self.tile_size))
+        tile.fill(self.background)
+        for seg_index in seg_indices:
+            seg = self.level.path[seg_index]
+            px = round(seg.x1 * self.zoom - left)
+            py = round(seg.y1 * self.zoom - top)
+            pw = round(seg.x2 * self.zoom - left) - px
+            ph = round(seg.y2 * self.zoom - top) - py
+            pygame.draw.rect(tile, (0, 0, 0), pygame.Rect(px, py, pw, ph))
+        return tile
+
+'''
+draw_cars function
+parameters:
+    draw_surface (Surface): pygame surface object to draw on
+    cars (list): cars to draw, all bound to the given physics engine
+    physics (CarPhysics): the physics engine holding the cars' positions
+    cx, cy (floats): the point on the WORLD space that the screen is centering (middle of screen)
+    zoom (float): zoom factor
+    res ([int, int]): dimensions of surface
+results:
+    draws only the cars whose circle is within the screen
+returns:
+    none
+'''
+def draw_cars(draw_surface, cars, physics, cx, cy, zoom, res):
+    margin = 8 * zoom
+    px = (physics.x - cx) * zoom + (res[0] / 2)
+    py = (physics.y - cy) * zoom + (res[1] / 2)
+    visible = (px > -margin) & (px < res[0] + margin) & (py > -margin) & (py < res[1] + margin)
+
+    for i in np.flatnonzero(visible):
+        draw_car(draw_surface, cars[i], cx, cy, zoom, res)
+
+'''
+draw_car function
+parameters:
+    draw_surface (Surface): pygame surface object to draw on
+    car (Car): the car to draw
+    cx, cy (floats): the point on the WORLD space that the screen is centering (middle of screen)
+    zoom (float): zoom factor
+    res ([int, int]): dimensions of surface
+results:
+    draws the car as a circle of its color
+returns:
+    none
+'''
+def draw_car(draw_surface, car, cx, cy, zoom, res):
+
+    px = (car.x - cx) * zoom + (res[0] / 2)
+    py = (car.y - cy) * zoom + (res[1] / 2)
+    pz = 8 * zoom
+
+    pygame.draw.circle(draw_surface, car.color, (px, py), pz)
+
+'''
+draw_seg function
+parameters:
+    draw_surface (Surface): pygame surface object to draw on
+    seg (Segment): the segment to draw
+    cx, cy (floats): the point on the WORLD space that the screen is centering (middle of screen)
+    zoom (float): zoom factor
+    res ([int, int]): dimensions of surface
+results:
+    draws the segment as a black box
+returns:
+    none
+'''
+def draw_seg(draw_surface, seg, cx, cy, zoom, res):
+
+    px = (seg.x1 - cx) * zoom + (res[0] / 2)
+    py = (seg.y1 - cy) * zoom + (res[1] / 2)
+    pw = (seg.x2 - seg.x1) * zoom
+    ph = (seg.y2 - seg.y1) * zoom
+
+    pygame.draw.rect(draw_surface, (0, 0, 0), pygame.Rect(px, py, pw, ph))
+
+'''
+draw_points function
+parameters:
+    draw_surface (Surface): pygame surface object to draw on
+    x, y (ndarrays): WORLD position of every car
+    colors (ndarray): (cars x 3) color of every car
+    cx, cy (floats): the point on the WORLD space that the screen is centering (middle of screen)
+    zoom (float): zoom factor
+    res ([int, int]): dimensions of surface
+results:
+    draws the cars from their positions alone (as Car.draw_car does), only those whose circle is within the screen
+returns:
+    none
+'''
+def draw_points(draw_surface, x, y, colors, cx, cy, zoom, res):
+    margin = 8 * zoom
+    px = (x - cx) * zoom + (res[0] / 2)
+    py = (y - cy) * zoom + (res[1] / 2)
+    visible = (px > -margin) & (px < res[0] + margin) & (py > -margin) & (py < res[1] + margin)
+
+    for i in np.flatnonzero(visible):
+        pygame.draw.circle(draw_surface, colors[i].tolist(), (float(px[i]), float(py[i])), 8 * zoom)
@@ -0,0 +1,164 @@
+import math
+import numpy as np
+
+'''
+Generation Scheduler Object
+variables:
+    percent_taken (float): part of every generation that gets copied into the next one (the cars selection cares about)
+    max_ticks (int): the most ticks a generation can last
+    window (int): number of ticks a car has to make min_progress within to not count as stalled
+    check_interval (int): number of ticks between two checks of the cars' progress
+    min_progress (float): total distance a car has to gain within window ticks
+    physics (CarPhysics): physics engine of the generation being scheduled
+    history (ndarray): (window / check_interval + 1 x cars) ring buffer of the cars' total distances at the last checks
+    num_checks (int): number of checks done this generation
+    retired (ndarray): cars that were stopped for stalling (rather than crashing)
+    ended_early (bool): whether the scheduler ended the generation while cars were still driving
+purpose:
+    stops cars that no longer make progress (stopped or circling in place), and ends the generation as soon as none of the
+    cars still driving can make it into the top percent_taken any more
+Notes:
+    A stalled car never crashes, so without the scheduler it would keep the generation going until max_ticks, which is
+    what get_ticks_saved counts from. A car cannot gain more than max_vel total distance per tick, plus up to twice the path
+    width every time it switches segments (at most once for every min_seg_length it drives, plus the segments it is
+    already between), and never more than the track length, so that is the bound the early end uses (see get_reach).
+'''
+class GenerationScheduler:
+
+    '''
+    Constructor
+    parameters:
+        percent_taken (float): part of every generation that gets copied into the next one
+        max_ticks (int): the most ticks a generation can last
+        window (int): number of ticks a car has to make min_progress within
+        check_interval (int): number of ticks between two progress checks (window should be a multiple of it)
+        min_progress (float): total distance a car has to gain within window ticks to keep driving
+    results:
+        creates a scheduler, ready for the first generation
+    returns:
+        a generation scheduler object
+    '''
+    def __init__(self, percent_taken=0.5, max_ticks=100 * 60, window=300, check_interval=50, min_progress=25):
+        self.percent_taken = percent_taken
+        self.max_ticks = max_ticks
+        self.window = window
+        self.check_interval = check_interval
+        self.min_progress = min_progress
+        self.physics = None
+        self.history = None
+        self.num_checks = 0
+        self.retired = None
+        self.ended_early = False
+
+    '''
+    start function
+    parameters:
+        physics (CarPhysics): physics engine of the new generation
+    results:
+        clears the progress history for a new generation (update calls it itself for every new physics engine)
+    returns:
+        none
+    '''
+    def start(self, physics):
+        num_cars = physics.num_cars
+        self.physics = physics
+        self.history = np.zeros((self.window // self.check_interval + 1, num_cars))
+        self.num_checks = 0
+        self.retired = np.zeros(num_cars, dtype=bool)
+        self.ended_early = False
+
+    '''
+    update function
+    parameters:
+        physics (CarPhysics): physics engine of the generation
+        ticks (int): number of ticks simulated so far
+    results:
+        every check_interval ticks, stops the cars that stalled over the last window and checks whether any car still
+        driving can change the top percent_taken
+    returns:
+        (bool) whether the generation should go on
+    '''
+    def update(self, physics, ticks):
+        if physics is not self.physics:
+            self.start(physics)
+
+        if ticks % self.check_interval != 0 or not physics.is_alive.any():
+            return physics.is_alive.any()
+
+        fitness = physics.calc_total_distance()
+
+        # the ring buffer holds the total distances of the last window / check_interval + 1 checks
+        slot = self.num_checks % len(self.history)
+        self.history[slot] = fitness
+        self.num_checks += 1
+
+        # a car is stalled once its total distance grew by less than min_progress since the check window ticks ago
+        if self.num_checks >= len(self.history):
+            oldest = self.history[self.num_checks % len(self.history)]
+            stalled = physics.is_alive & (fitness - oldest < self.min_progress)
+            physics.is_alive[stalled] = False
+            self.retired |= stalled
+
+        # stops the cars still driving once none of them can make it into the top percent_taken
+        if physics.is_alive.any() and not self.can_change_selection(physics, fitness, ticks):
+            physics.is_alive[:] = False
+            self.ended_early = True
+
+        return physics.is_alive.any()
+
+    '''
+    get_ticks_saved function
+    parameters:
+        ticks (int): number of ticks the generation lasted
+    results:
+        works out how long the generation would have lasted without the scheduler
+    returns:
+        (int) ticks saved (max_ticks - ticks if the scheduler stopped any car that had not crashed, else 0)
+    '''
+    def get_ticks_saved(self, ticks):
+        if self.ended_early or (self.physics is not None and self.retired.any()):
+            return max(self.max_ticks - ticks, 0)
+        return 0
+
+    '''
+    get_reach function
+    parameters:
+        physics (CarPhysics): physics engine of the generation
+        ticks (int): number of ticks simulated so far
+    results:
+        bounds how much total distance a car can still gain in the ticks left, counting the switch allowance once for every
+        segment it could cross
+    returns:
+        (float) the most total distance any car can still gain
+    '''
+    def get_reach(self, physics, ticks):
+        level = physics.level
+        driven = physics.max_vel * max(self.max_ticks - ticks, 0)
+        num_switches = driven // level.min_seg_length + 2
+        return driven + num_switches * 2 * level.path_width
+
+    '''
+    can_change_selection function
+    parameters:
+        physics (CarPhysics): physics engine of the generation
+        fitness (ndarray): total distance of every car
+        ticks (int): number of ticks simulated so far
+    results:
+        compares the best total distance any car still driving could still reach with the top percent_taken of the
+        crashed cars
+    returns:
+        (bool) whether a car still driving could still make it into the top percent_taken
+    '''
+    def can_change_selection(self, physics, fitness, ticks):
+        num_taken = math.ceil(physics.num_cars * self.percent_taken)
+        dead_fitness = fitness[~physics.is_alive]
+        if len(dead_fitness) < num_taken:
+            return True
+
+        # the crashed cars' total distances are final, so the top num_taken of them is settled unless a driving car beats them
+        kth_best = np.partition(dead_fitness, len(dead_fitness) - num_taken)[len(dead_fitness) - num_taken]
+
+        level = physics.level
+        track_length = level.path_length if level.streaming else level.cum_distance[-1]
+        best_reachable = min(fitness[physics.is_alive].max() + self.get_reach(physics, ticks), track_length)
+        return best_reachable >= kth_best
@@ -0,0 +1,203 @@
+from track_geometry import CompiledTrack
+import numpy as np
+
+'''
+Ray Sensor Object
+variables:
+    angles (ndarray): angle of every ray relative to the car's rotation (degrees), in neural network input order
+    num_rays (int): number of rays (and so of neural network inputs)
+    scale (float): distance the ray lengths are divided by before being fed to a neural network
+    compiled (bool): whether the rays are cast against a CompiledTrack instead of walking the segments
+    track (CompiledTrack): the compiled track of the last level sensed on (only when compiled)
+purpose:
+    gives every car of a population its neural network inputs (the distances to the edge of the track along each ray) in one call
+'''
+class RaySensor:
+
+    '''
+    Constructor
+    parameters:
+        angles (list): angle of every ray relative to the car's rotation, defaults to the 5 rays of Car.calculate_nn_inputs
+        scale (float): distance the ray lengths are divided by
+        compiled (bool): cast the rays against the level's compiled track (compiled once per level) instead of walking
+            the segments like Car.distance_from_boundary (the distances agree except for rays grazing a corner)
+    results:
+        creates a new ray sensor
+    returns:
+        a ray sensor object
+    '''
+    def __init__(self, angles=(0, -45, -90, 45, 90), scale=500, compiled=False):
+        self.angles = np.array(angles, dtype=float)
+        self.num_rays = len(self.angles)
+        self.scale = scale
+        self.compiled = compiled
+        self.track = None
+
+    '''
+    read_inputs function
+    parameters:
+        physics (CarPhysics): the physics engine holding the cars' state
+        mask (ndarray): optional boolean array of the cars to read the sensors of (the others get 0 inputs)
+    results:
+        casts every ray of every selected car
+    returns:
+        (ndarray) (number of cars x number of rays) neural network inputs
+    '''
+    def read_inputs(self, physics, mask=None):
+        inputs = np.zeros((physics.num_cars, self.num_rays))
+        cars = np.arange(physics.num_cars) if mask is None else np.flatnonzero(mask)
+
+        if self.compiled:
+            if physics.level.streaming:
+                raise ValueError("a streaming level cannot be compiled, it only keeps the segments near the cars")
+            if self.track is None or self.track.level is not physics.level:
+                self.track = CompiledTrack(physics.level)
+            distances = self.track.cast_rays(physics.x[cars], physics.y[cars], physics.rotation[cars],
+                                             physics.current_segment_index[cars], self.angles)
+        else:
+            distances = cast_rays(physics.level.arrays, physics.x[cars], physics.y[cars], physics.rotation[cars],
+                                  physics.current_segment_index[cars], self.angles,
+                                  physics.first_segment_index[cars], physics.last_segment_index[cars])
+        inputs[cars] = distances / self.scale
+        return inputs
+
+'''
+spread_angles function
+parameters:
+    num_rays (int): number of rays
+    field_of_view (float): angle between the left-most and the right-most ray (degrees)
+results:
+    spreads the rays evenly over the field of view, straight ahead first and then outwards, left before right
+returns:
+    (list) ray angles for a RaySensor
+'''
+def spread_angles(num_rays, field_of_view=180):
+    num_left = (num_rays - 1) // 2
+    num_right = num_rays - 1 - num_left
+    step = field_of_view / 2 / max(num_left, num_right, 1)
+
+    angles = [0]
+    angles += [-i * step for i in range(1, num_left + 1)]
+    angles += [i * step for i in range(1, num_right + 1)]
+    return angles
+
+'''
+cast_rays function
+parameters:
+    segs (SegmentArrays): the segments of the level the cars drive on
+    x, y, rotation (ndarrays): position and rotation of every car
+    segment_index (ndarray): index of the segment every car is currently on
+    angles (ndarray): angle of every ray relative to the car's rotation (degrees)
+    first_index, last_index (ndarrays): optional first and last segment of every car's track (all segments by default)
+results:
+    casts every ray of every car at the same time, following the same steps as Car.distance_from_boundary
+returns:
+    (ndarray) (number of cars x number of rays) distance from each car to the edge of the track along each ray
+Notes:
+    Every (car, ray) pair is one element of flat arrays, so the per step cost does not grow with the number of rays.
+    The loops only run once per segment the longest ray walks through.
+'''
+def cast_rays(segs, x, y, rotation, segment_index, angles, first_index=None, last_index=None):
+    num_cars = len(x)
+    num_rays = len(angles)
+    if first_index is None:
+        first_index = np.full(num_cars, segs.offset)
+    if last_index is None:
+        last_index = np.full(num_cars, len(segs) - 1)
+
+    # the segments are looked up within the arrays, which start at segs.offset
+    segment_index = segment_index - segs.offset
+    first_index = first_index - segs.offset
+    last_index = last_index - segs.offset
+
+    # flattens the (car, ray) pairs and computes the trig of every ray only once
+    ray_x = np.repeat(x, num_rays)
+    ray_y = np.repeat(y, num_rays)
+    ray_index = np.repeat(segment_index, num_rays)
+    ray_bounds = (np.repeat(first_index, num_rays), np.repeat(last_index, num_rays))
+    theta = np.radians((rotation[:, None] + angles[None, :]).ravel())
+    rays = (ray_x, ray_y, np.cos(theta), np.sin(theta), np.tan(theta), 1 / np.tan(theta + 0.0001))
+
+    # finds where every ray leaves its car's segment, then follows the rays forward and backward along the track
+    all_rays = np.arange(num_cars * num_rays)
+    use_x, use_y = ray_exit_points(segs, rays, all_rays, ray_index)
+    next_x, next_y = follow_rays(segs, rays, use_x, use_y, ray_index, ray_bounds, 1)
+    prev_x, prev_y = follow_rays(segs, rays, use_x, use_y, ray_index, ray_bounds, -1)
+
+    distance = np.maximum(np.hypot(prev_x - ray_x, prev_y - ray_y), np.hypot(next_x - ray_x, next_y - ray_y))
+    return distance.reshape(num_cars, num_rays)
+
+'''
+follow_rays function
+parameters:
+    segs (SegmentArrays): the segments of the level
+    rays (tuple): start x, start y, cos, sin, tan and 1 / tan of every ray
+    point_x, point_y (ndarrays): point where every ray leaves its car's segment
+    segment_index (ndarray): index of every ray's car segment (within segs)
+    bounds (tuple): first and last segment of every ray's track (within segs)
+    step (int): 1 to follow the track forward, -1 to follow it backward
+results:
+    keeps moving the exit point of every ray to the next segment along the track while the ray enters it
+returns:
+    (2 tuple of ndarrays) the last point where each ray leaves the track
+'''
+def follow_rays(segs, rays, point_x, point_y, segment_index, bounds, step):
+    point_x = point_x.copy()
+    point_y = point_y.copy()
+    index = segment_index + step
+
+    # only the rays that entered their next segment keep walking
+    walking = np.arange(len(point_x))
+    while len(walking) > 0:
+        walking = walking[(index[walking] >= bounds[0][walking]) & (index[walking] <= bounds[1][walking])]
+        walking = walking[is_point_on_segments(segs, point_x[walking], point_y[walking], index[walking])]
+
+        point_x[walking], point_y[walking] = ray_exit_points(segs, rays, walking, index[walking])
+        index[walking] += step
+
+    return point_x, point_y
+
+'''
+ray_exit_points function
+parameters:
+    segs (SegmentArrays): the segments of the level
+    rays (tuple): start x, start y, cos, sin, tan and 1 / tan of every ray
+    which (ndarray): indices of the rays to compute
+    segment_index (ndarray): index of the segment each of those rays goes through (within segs)
+results:
+    intersects the rays with the horizontal and the vertical side of the segment they are heading towards
+returns:
+    (2 tuple of ndarrays) the point where each ray leaves its segment (the car's position if neither side is hit)
+'''
+def ray_exit_points(segs, rays, which, segment_index):
+    x, y, cos, sin, tan, inv_tan = (values[which] for values in rays)
+
+    x_to_side = np.copysign(segs.width[segment_index] / 2, cos) - (x - segs.m_x[segment_index])
+    y_to_side = np.copysign(segs.height[segment_index] / 2, sin) - (y - segs.m_y[segment_index])
+    horiz_x = x + inv_tan * y_to_side
+    horiz_y = y + y_to_side
+    vert_x = x + x_to_side
+    vert_y = y + tan * x_to_side
+
+    on_horiz = is_point_on_segments(segs, horiz_x, horiz_y, segment_index)
+    on_vert = ~on_horiz & is_point_on_segments(segs, vert_x, vert_y, segment_index)
+
+    exit_x = np.where(on_horiz, horiz_x, np.where(on_vert, vert_x, x))
+    exit_y = np.where(on_horiz, horiz_y, np.where(on_vert, vert_y, y))
+    return exit_x, exit_y
+
+'''
+is_point_on_segments function
+parameters:
+    segs (SegmentArrays): the segments of the level
+    x, y (ndarrays): points to check
+    segment_index (ndarray): index of the segment to check each point against (within segs)
+results:
+    checks if each point is on its segment (with the same small error margin as Car.is_point_on_segment)
+returns:
+    (ndarray) boolean array, whether each point is on its segment
+'''
+def is_point_on_segments(segs, x, y, segment_index):
+    error = 0.001
+    return ((x >= segs.x1[segment_index] - error) & (x <= segs.x2[segment_index] + error) &
+            (y >= segs.y1[segment_index] - error) & (y <= segs.y2[segment_index] + error))
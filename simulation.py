@@ -0,0 +1,138 @@
+from NeuralNetwork.population_net import stack_nets
+from physics import CarPhysics
+import time
+import numpy as np
+
+'''
+Simulation Object
+variables:
+    cars (list): the cars of the generation being simulated
+    level (Level): the level object the cars run on
+    sensor (RaySensor): the sensor giving the cars their neural network inputs
+    physics (CarPhysics): the physics engine holding the state of every car
+    population (PopulationNet): the neural networks of every car, stacked for batched runs
+    ticks (int): number of ticks simulated so far
+    telemetry (Telemetry): telemetry the time of every phase of a tick goes to (None when not recording)
+purpose:
+    runs one generation of neural network driven cars, one tick for the whole population at a time, without drawing anything
+'''
+class Simulation:
+
+    '''
+    Constructor
+    parameters:
+        cars (list): cars to simulate (each with a neural network of the same shape)
+        level (Level): level object that the cars drive on
+        sensor (RaySensor): sensor giving the cars their neural network inputs
+        telemetry (Telemetry): optional telemetry to record the time of every phase of a tick with
+    results:
+        binds the cars to a new physics engine and stacks their neural networks (a streaming level starts over first)
+    returns:
+        a simulation object
+    '''
+    def __init__(self, cars, level, sensor, telemetry=None):
+        self.cars = cars
+        self.level = level
+        self.sensor = sensor
+
+        if level.streaming:
+            level.restart()
+
+        self.physics = CarPhysics(len(cars), level)
+        self.physics.bind_cars(cars)
+        self.population = stack_nets([car.nn for car in cars])
+
+        self.ticks = 0
+
+        # a disabled telemetry is dropped here, so the untimed step stays free of any timing calls
+        self.telemetry = telemetry if telemetry is not None and telemetry.enabled else None
+
+    '''
+    step function
+    parameters:
+        none
+    results:
+        senses, runs the neural networks and moves every live car once (a streaming level follows the cars first)
+    returns:
+        (bool) whether any car was still driving at the start of the tick
+    '''
+    def step(self):
+        if self.level.streaming:
+            self.level.follow_cars(self.physics)
+        if self.telemetry is not None:
+            return self.timed_step()
+
+        alive = self.physics.is_alive.copy()
+
+        nn_inputs = self.sensor.read_inputs(self.physics, alive)
+        nn_outputs = self.population.run_population(nn_inputs, alive)
+        self.physics.apply_nn_output(nn_outputs, alive)
+        self.physics.step()
+
+        self.ticks += 1
+        return alive.any()
+
+    '''
+    timed_step function
+    parameters:
+        none
+    results:
+        does the same as step, recording the time of sensing, inference, physics and progress tracking to the telemetry
+    returns:
+        (bool) whether any car was still driving at the start of the tick
+    '''
+    def timed_step(self):
+        alive = self.physics.is_alive.copy()
+        live = np.flatnonzero(alive)
+        self.telemetry.record_live(self.ticks, len(live))
+
+        start_time = time.perf_counter()
+        nn_inputs = self.sensor.read_inputs(self.physics, alive)
+        sensed_time = time.perf_counter()
+        nn_outputs = self.population.run_population(nn_inputs, alive)
+        inferred_time = time.perf_counter()
+        self.physics.apply_nn_output(nn_outputs, alive)
+        self.physics.move(live)
+        moved_time = time.perf_counter()
+        self.physics.track_progress(live)
+        tracked_time = time.perf_counter()
+
+        self.telemetry.add_time('sensing', sensed_time - start_time, len(live))
+        self.telemetry.add_time('inference', inferred_time - sensed_time, len(live))
+        self.telemetry.add_time('physics', moved_time - inferred_time, len(live))
+        self.telemetry.add_time('progress', tracked_time - moved_time, len(live))
+
+        self.ticks += 1
+        return len(live) > 0
+
+    '''
+    run function
+    parameters:
+        max_ticks (int): the most ticks the generation can last
+        scheduler (GenerationScheduler): optional scheduler stopping stalled cars and ending the generation early
+        recorder (TrajectoryRecorder): optional recorder to store the state of every car after every tick in
+    results:
+        steps the simulation until every car has crashed (or was stopped by the scheduler) or max_ticks is reached
+    returns:
+        (int) number of ticks simulated
+    '''
+    def run(self, max_ticks, scheduler=None, recorder=None):
+        while self.ticks < max_ticks and self.physics.is_alive.any():
+            self.step()
+            if scheduler is not None:
+                scheduler.update(self.physics, self.ticks)
+            if recorder is not None:
+                recorder.record(self.physics)
+        return self.ticks
+
+    '''
+    fitness function
+    parameters:
+        none
+    results:
+        calculates the total distance of every car
+    returns:
+        (ndarray) total distance of each car, in the order of cars
+    '''
+    def fitness(self):
+        return self.physics.calc_total_distance()
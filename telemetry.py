@@ -0,0 +1,147 @@
+import json, time
+import numpy as np
+
+# the phases a tick (and a drawn frame) is split into
+PHASES = ('sensing', 'inference', 'physics', 'progress', 'rendering')
+
+'''
+Telemetry Object
+variables:
+    enabled (bool): whether anything gets recorded at all
+    path (str): JSONL file the records are appended to
+    file (file): the open log file (None when disabled)
+    phase_seconds (dict): wall time spent in every phase during the current generation
+    phase_calls (dict): number of times every phase ran during the current generation
+    phase_cars (dict): number of cars every phase handled during the current generation, summed over its calls
+    live_curve (list): [tick, number of live cars] every time the number of live cars changed this generation
+    generation_start (float): perf_counter time the current generation started at
+purpose:
+    collects where the time of every tick goes and a summary of every generation, and writes one JSON line per
+    generation to a log file
+Notes:
+    When disabled every method returns right away, and Simulation skips its timed step entirely, so the only cost left
+    is one attribute check per call.
+'''
+class Telemetry:
+
+    '''
+    Constructor
+    parameters:
+        path (str): JSONL file to append the records to
+        enabled (bool): whether to record anything (off by default, so nothing is written unless asked for)
+    results:
+        opens the log file (when enabled) and starts the first generation
+    returns:
+        a telemetry object
+    '''
+    def __init__(self, path="telemetry.jsonl", enabled=False):
+        self.enabled = enabled
+        self.path = path
+        self.file = open(path, 'a') if enabled else None
+        self.start_generation()
+
+    '''
+    start_generation function
+    parameters:
+        none
+    results:
+        clears the phase timers and live car curve for a new generation
+    returns:
+        none
+    '''
+    def start_generation(self):
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.phase_cars = dict.fromkeys(PHASES, 0)
+        self.live_curve = list()
+        self.generation_start = time.perf_counter()
+
+    '''
+    add_time function
+    parameters:
+        phase (str): name of the phase (see PHASES)
+        seconds (float): wall time the phase took
+        num_cars (int): number of cars the phase handled
+    results:
+        adds one call of the phase to the current generation
+    returns:
+        none
+    '''
+    def add_time(self, phase, seconds, num_cars=1):
+        if not self.enabled:
+            return
+        self.phase_seconds[phase] += seconds
+        self.phase_calls[phase] += 1
+        self.phase_cars[phase] += num_cars
+
+    '''
+    record_live function
+    parameters:
+        tick (int): number of the tick
+        num_live (int): number of cars still driving at the start of the tick
+    results:
+        adds a point to the live car curve if the number changed since the last tick
+    returns:
+        none
+    '''
+    def record_live(self, tick, num_live):
+        if not self.enabled:
+            return
+        if len(self.live_curve) == 0 or self.live_curve[-1][1] != num_live:
+            self.live_curve.append([tick, num_live])
+
+    '''
+    end_generation function
+    parameters:
+        generation (int): number of the finished generation
+        ticks (int): number of ticks the generation lasted
+        fitness (list): total distance of every car of the generation
+        mutation (dict): optional stats of the breeding that created the generation (see GenomePool.mutation_stats)
+        extra (dict): any other values to store with the generation
+    results:
+        writes the generation's record to the log and starts the next generation
+    returns:
+        none
+    '''
+    def end_generation(self, generation, ticks, fitness, mutation=None, **extra):
+        if not self.enabled:
+            return
+
+        fitness = np.asarray(fitness, dtype=float)
+        phases = dict()
+        for phase in PHASES:
+            if self.phase_calls[phase] > 0:
+                phases[phase] = {'seconds': self.phase_seconds[phase], 'calls': self.phase_calls[phase], 'cars': self.phase_cars[phase]}
+
+        record = {
+            'type': 'generation',
+            'generation': generation,
+            'ticks': ticks,
+            'seconds': time.perf_counter() - self.generation_start,
+            'best': float(fitness.max()),
+            'median': float(np.median(fitness)),
+            'mean': float(fitness.mean()),
+            'live_curve': self.live_curve,
+            'phases': phases,
+        }
+        if mutation is not None:
+            record['mutation'] = mutation
+        record.update(extra)
+
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.start_generation()
+
+    '''
+    close function
+    parameters:
+        none
+    results:
+        closes the log file
+    returns:
+        none
+    '''
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,268 @@
+from level_generator import SegmentGrid
+import numpy as np
+
+'''
+Compiled Track Object
+variables:
+    level (Level): the level the track was compiled from
+    window (int): number of boxes before and after a ray's own box whose edges are checked first
+    x1, y1, x2, y2 (ndarrays): the boxes of the track after merging straight runs of segments (top left, bottom right)
+    box_of_segment (ndarray): index of the box every segment of the level was merged into
+    vertical_edges (EdgeSet): the boundary edges at a fixed x
+    horizontal_edges (EdgeSet): the boundary edges at a fixed y
+purpose:
+    a level's track compiled once into the boundary of the union of its boxes, so the distance from a car to the edge of
+    the track along a ray is a single nearest-edge query instead of a walk through the segments
+Notes:
+    Consecutive segments going the same way are merged into one box. Every side of every box is cut down to the parts
+    that are not covered by another box (found through a SegmentGrid), so what is left is exactly the boundary of the
+    track. The edges are stored box by box along the track and split by the way they face (a ray only leaves the track
+    through an edge facing the way it goes), so a ray first only checks the matching edges of the boxes within window of
+    its own box. Reaching anything further means passing through the boxes just outside that window (the "portals"), so only the
+    rays that enter them are cast again with a wider window, up to the whole track.
+'''
+class CompiledTrack:
+
+    '''
+    Constructor
+    parameters:
+        level (Level): level object to compile
+        window (int): number of boxes on each side of a ray's own box to check first
+    results:
+        merges the segments into boxes and computes the boundary edges of their union
+    returns:
+        a compiled track object
+    '''
+    def __init__(self, level, window=2):
+        self.level = level
+        self.window = window
+
+        # merges every run of segments going the same way into one box
+        boxes = list()
+        self.box_of_segment = np.empty(len(level.path), dtype=int)
+        for i, seg in enumerate(level.path):
+            prev_seg = level.path[i - 1] if i > 0 else None
+            if prev_seg is not None and (seg.dir_x, seg.dir_y, seg.size) == (prev_seg.dir_x, prev_seg.dir_y, prev_seg.size):
+                box = boxes[-1]
+                boxes[-1] = (min(box[0], seg.x1), min(box[1], seg.y1), max(box[2], seg.x2), max(box[3], seg.y2))
+            else:
+                boxes.append((seg.x1, seg.y1, seg.x2, seg.y2))
+            self.box_of_segment[i] = len(boxes) - 1
+
+        self.x1, self.y1, self.x2, self.y2 = (np.array(values, dtype=float) for values in zip(*boxes))
+
+        grid = SegmentGrid(level.path_width + level.max_seg_length)
+        for i, box in enumerate(boxes):
+            grid.add_box(*box, i)
+
+        self.build_edges(boxes, grid)
+
+    '''
+    build_edges function
+    parameters:
+        boxes (list): (x1, y1, x2, y2) of every box
+        grid (SegmentGrid): grid holding every box
+    results:
+        cuts every side of every box down to the parts no other box covers, and stores them box by box
+    returns:
+        none
+    '''
+    def build_edges(self, boxes, grid):
+        edges = {(vertical, side): [list() for _ in boxes] for vertical in (True, False) for side in (-1, 1)}
+        for i, (x1, y1, x2, y2) in enumerate(boxes):
+            others = [boxes[j] for j in grid.query_box(x1, y1, x2, y2) if j != i]
+
+            # a side is covered wherever another box reaches past it on the outside (touching boxes join up too)
+            sides = (
+                (True, x1, y1, y2, -1, [(b[1], b[3]) for b in others if b[0] < x1 <= b[2]]),
+                (True, x2, y1, y2, 1, [(b[1], b[3]) for b in others if b[0] <= x2 < b[2]]),
+                (False, y1, x1, x2, -1, [(b[0], b[2]) for b in others if b[1] < y1 <= b[3]]),
+                (False, y2, x1, x2, 1, [(b[0], b[2]) for b in others if b[1] <= y2 < b[3]]),
+            )
+            for vertical, pos, start, end, side, covered in sides:
+                for piece_start, piece_end in subtract_intervals(start, end, covered):
+                    edges[(vertical, side)][i].append((pos, piece_start, piece_end))
+
+        self.vertical_edges = EdgeSet(edges[(True, -1)], edges[(True, 1)])
+        self.horizontal_edges = EdgeSet(edges[(False, -1)], edges[(False, 1)])
+
+    '''
+    cast_rays function
+    parameters:
+        x, y, rotation (ndarrays): position and rotation of every car
+        segment_index (ndarray): index of the segment every car is currently on
+        angles (ndarray): angle of every ray relative to the car's rotation (degrees)
+    results:
+        finds where every ray of every car first leaves the track
+    returns:
+        (ndarray) (number of cars x number of rays) distance from each car to the edge of the track along each ray
+    '''
+    def cast_rays(self, x, y, rotation, segment_index, angles):
+        num_cars = len(x)
+        num_rays = len(angles)
+
+        theta = np.radians((rotation[:, None] + angles[None, :]).ravel())
+        ray_x = np.repeat(x, num_rays)
+        ray_y = np.repeat(y, num_rays)
+        box = np.repeat(self.box_of_segment[segment_index], num_rays)
+
+        distance = np.full(num_cars * num_rays, np.inf)
+        todo = np.arange(num_cars * num_rays)
+        window = self.window
+        while len(todo) > 0:
+            found, left_window = self.cast_window(ray_x[todo], ray_y[todo], np.cos(theta[todo]), np.sin(theta[todo]), box[todo], window)
+            distance[todo] = found
+            todo = todo[left_window]
+            window *= 4
+
+        return distance.reshape(num_cars, num_rays)
+
+    '''
+    cast_window function
+    parameters:
+        x, y (ndarrays): start of every ray
+        cos, sin (ndarrays): direction of every ray
+        box (ndarray): index of the box every ray starts in
+        window (int): number of boxes before and after each ray's box to check the edges of
+    results:
+        finds the nearest edge of the boxes within the window that each ray leaves the track through
+    returns:
+        (2 tuple of ndarrays) distance along every ray to that edge (inf if none), and whether each ray enters a box
+        outside the window before it, in which case the distance cannot be trusted
+    '''
+    def cast_window(self, x, y, cos, sin, box, window):
+        num_boxes = len(self.x1)
+        first_box = np.maximum(box - window, 0)
+        last_box = np.minimum(box + window, num_boxes - 1)
+
+        # a vertical edge is crossed along x and spans y, a horizontal edge the other way around
+        distance = np.minimum(self.vertical_edges.nearest_hit(x, y, cos, sin, first_box, last_box),
+                              self.horizontal_edges.nearest_hit(y, x, sin, cos, first_box, last_box))
+
+        # the portal check: entering the box just past either end of the window means the ray may go on beyond it
+        left_window = ~np.isfinite(distance)
+        for outside_box, exists in ((first_box - 1, first_box > 0), (last_box + 1, last_box < num_boxes - 1)):
+            check = np.flatnonzero(exists & ~left_window)
+            if len(check) > 0:
+                left_window[check] = self.ray_enters_boxes(x[check], y[check], cos[check], sin[check], outside_box[check], distance[check])
+
+        return distance, left_window
+
+    '''
+    ray_enters_boxes function
+    parameters:
+        x, y (ndarrays): start of every ray
+        cos, sin (ndarrays): direction of every ray
+        box (ndarray): index of the box to check each ray against
+        max_distance (ndarray): length of each ray
+    results:
+        intersects every ray (up to its length) with the inside of its box
+    returns:
+        (ndarray) boolean array, whether each ray passes through its box
+    '''
+    def ray_enters_boxes(self, x, y, cos, sin, box, max_distance):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tx1 = (self.x1[box] - x) / cos
+            tx2 = (self.x2[box] - x) / cos
+            ty1 = (self.y1[box] - y) / sin
+            ty2 = (self.y2[box] - y) / sin
+
+        # a ray parallel to an axis is inside the box's slab on that axis for all of it, or for none of it
+        inside_x = (x > self.x1[box]) & (x < self.x2[box])
+        inside_y = (y > self.y1[box]) & (y < self.y2[box])
+        enter_x = np.where(cos == 0, np.where(inside_x, -np.inf, np.inf), np.minimum(tx1, tx2))
+        exit_x = np.where(cos == 0, np.where(inside_x, np.inf, -np.inf), np.maximum(tx1, tx2))
+        enter_y = np.where(sin == 0, np.where(inside_y, -np.inf, np.inf), np.minimum(ty1, ty2))
+        exit_y = np.where(sin == 0, np.where(inside_y, np.inf, -np.inf), np.maximum(ty1, ty2))
+
+        enter = np.maximum(np.maximum(enter_x, enter_y), 0)
+        leave = np.minimum(np.minimum(exit_x, exit_y), max_distance)
+        return enter < leave
+
+'''
+Edge Set Object
+variables:
+    pos (ndarray): the fixed coordinate of every edge (x for vertical edges, y for horizontal ones)
+    start, end (ndarrays): the range of the other coordinate every edge spans
+    box_edges (ndarray): (2 x boxes + 1) the edges of box b facing - are box_edges[0][b] to box_edges[0][b + 1], the
+        ones facing + are box_edges[1][b] to box_edges[1][b + 1]
+purpose:
+    stores the boundary edges of one orientation box by box, split by the way a ray crosses them to leave the track
+'''
+class EdgeSet:
+
+    '''
+    Constructor
+    parameters:
+        minus_edges, plus_edges (lists): for every box, the (pos, start, end) of its edges facing - and facing +
+    results:
+        lays the edges out in flat arrays, the ones facing - first
+    returns:
+        an edge set object
+    '''
+    def __init__(self, minus_edges, plus_edges):
+        edges = list()
+        self.box_edges = np.zeros((2, len(minus_edges) + 1), dtype=int)
+        for facing, box_lists in enumerate((minus_edges, plus_edges)):
+            self.box_edges[facing][0] = len(edges)
+            for i, box_list in enumerate(box_lists):
+                edges += box_list
+                self.box_edges[facing][i + 1] = len(edges)
+
+        self.pos, self.start, self.end = (np.array([edge[k] for edge in edges], dtype=float) for k in range(3))
+
+    '''
+    nearest_hit function
+    parameters:
+        normal_start, tangent_start (ndarrays): start of every ray across and along the edges
+        normal_dir, tangent_dir (ndarrays): direction of every ray across and along the edges
+        first_box, last_box (ndarrays): range of boxes whose edges each ray is checked against
+    results:
+        intersects every ray with the edges of its boxes that face the way it goes
+    returns:
+        (ndarray) distance along every ray to the first of those edges it crosses (inf if none)
+    '''
+    def nearest_hit(self, normal_start, tangent_start, normal_dir, tangent_dir, first_box, last_box):
+        facing = (normal_dir > 0).astype(int)
+        first_edge = self.box_edges[facing, first_box]
+        num_edges = self.box_edges[facing, last_box + 1] - first_edge
+        if len(num_edges) == 0 or num_edges.max() == 0:
+            return np.full(len(normal_start), np.inf)
+
+        # lines up the edges of every ray's boxes as rows of one padded index matrix
+        edges = first_edge[:, None] + np.arange(num_edges.max())[None, :]
+        in_range = edges < (first_edge + num_edges)[:, None]
+        edges = np.minimum(edges, len(self.pos) - 1)
+
+        # a ray going along the edges (normal_dir 0) never crosses one
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (self.pos[edges] - normal_start[:, None]) / normal_dir[:, None]
+            along = tangent_start[:, None] + t * tangent_dir[:, None]
+        error = 0.000001
+        hits = in_range & (t >= 0) & (along >= self.start[edges] - error) & (along <= self.end[edges] + error)
+        hits &= (normal_dir != 0)[:, None]
+
+        return np.where(hits, t, np.inf).min(axis=1)
+
+'''
+subtract_intervals function
+parameters:
+    start, end (floats): interval to cut down
+    covered (list): (start, end) of every interval to remove from it
+results:
+    removes the covered parts of the interval
+returns:
+    (list) (start, end) of every part left, in order
+'''
+def subtract_intervals(start, end, covered):
+    pieces = list()
+    position = start
+    for cover_start, cover_end in sorted(covered):
+        if cover_start > position:
+            pieces.append((position, min(cover_start, end)))
+        position = max(position, cover_end)
+        if position >= end:
+            break
+    if position < end:
+        pieces.append((position, end))
+    return [(piece_start, piece_end) for piece_start, piece_end in pieces if piece_end > piece_start]
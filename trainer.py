@@ -0,0 +1,361 @@
+from level_generator import StreamingLevel, generate_level
+from car import Car
+from sensors import RaySensor
+from simulation import Simulation
+from checkpoint import save_checkpoint, load_checkpoint
+from NeuralNetwork.genome_pool import GenomePool
+from recorder import TrajectoryRecorder
+import argparse, functools, os, random, time
+import numpy as np
+
+'''
+Generation Result Object
+variables:
+    generation (int): number of the generation (starting from 1)
+    ticks (int): number of ticks the generation was simulated for
+    fitness (list): total distance of every car, best first
+    best_car (Car): the car that traveled the furthest
+    seconds (float): wall time the generation took to simulate
+    ticks_saved (int): ticks the generation scheduler cut off the generation (0 without one)
+purpose:
+    stores the outcome of one generation of training
+'''
+class GenerationResult:
+
+    def __init__(self, generation, ticks, fitness, best_car, seconds, ticks_saved=0):
+        self.generation = generation
+        self.ticks = ticks
+        self.fitness = fitness
+        self.best_car = best_car
+        self.seconds = seconds
+        self.ticks_saved = ticks_saved
+
+    @property
+    def best_dis(self):
+        return self.fitness[0]
+
+'''
+rank_cars function
+parameters:
+    cars (list): cars of a finished generation
+    fitness (list): total distance of every car
+results:
+    sorts the cars from the furthest to the shortest distance traveled (ties keep their order)
+returns:
+    (2 tuple of lists) the sorted cars and their sorted total distances
+'''
+def rank_cars(cars, fitness):
+    order = sorted(range(len(cars)), key=lambda i: -fitness[i])
+    return [cars[i] for i in order], [float(fitness[i]) for i in order]
+
+'''
+breed_generation function
+parameters:
+    ranked_cars (list): cars of the finished generation, best first
+    level (Level): level object the next generation drives on
+    percent_taken (float): part of the generation that gets copied into the next one, the rest are mutations of them
+    pool (GenomePool): optional pool to breed the networks into, instead of creating new ones one by one
+results:
+    creates the next generation: copies of the best cars, then mutations of them that get mutated harder the lower their source ranked
+returns:
+    (list) the cars of the new generation
+Notes:
+    With a pool, the mutations are drawn by numpy (seeded from the random module) in one batch, so the networks differ
+    from the ones the per network path gives for the same seed.
+'''
+def breed_generation(ranked_cars, level, percent_taken, pool=None):
+
+    # picks the source and mutation factor of every new network (None for a copy)
+    source_nets = list()
+    mutation_factors = list()
+    for i in range(0, len(ranked_cars)):
+        if i < len(ranked_cars) * percent_taken:
+            source_nets.append(ranked_cars[i].nn)
+            mutation_factors.append(None)
+        else:
+            take_index = i % int(len(ranked_cars) * percent_taken)
+            source_nets.append(ranked_cars[take_index].nn)
+            mutation_factors.append(take_index)
+
+    if pool is not None:
+        new_nets = pool.breed(source_nets, mutation_factors, np.random.default_rng(random.getrandbits(64)))
+
+    new_cars = list()
+    for i in range(0, len(ranked_cars)):
+        new_car = Car(0, 0, level)
+
+        if pool is not None:
+            new_car.take_nn(new_nets[i])
+        elif mutation_factors[i] is None:
+            new_car.take_nn(source_nets[i].create_copy())
+        else:
+            new_car.take_nn(source_nets[i].create_mutation(mutation_factors[i]))
+
+        if mutation_factors[i] is None:
+            new_car.color = ranked_cars[i].color
+
+        else:
+            take_index = mutation_factors[i]
+            new_car.color = ranked_cars[take_index].color
+            co0 = min(max(100, new_car.color[0] + random.randint(-20, 20)), 255)
+            co1 = min(max(100, new_car.color[1] + random.randint(-20, 20)), 255)
+            co2 = min(max(100, new_car.color[2] + random.randint(-20, 20)), 255)
+            new_car.color = (co0, co1, co2)
+        new_cars.append(new_car)
+
+    return new_cars
+
+'''
+evaluate_generation function
+parameters:
+    cars (list): cars of the generation
+    level (Level): level object the cars drive on
+    sensor (RaySensor): sensor giving the cars their neural network inputs
+    max_ticks (int): the most ticks the generation can last
+    scheduler (GenerationScheduler): optional scheduler stopping stalled cars and ending the generation early
+    telemetry (Telemetry): optional telemetry to record the time of every phase of the ticks with
+    recorder (TrajectoryRecorder): optional recorder to store the state of every car after every tick in
+results:
+    simulates the whole generation in this process
+returns:
+    (2 tuple) total distance of every car (ndarray, in the order of cars) and number of ticks the generation lasted
+'''
+def evaluate_generation(cars, level, sensor, max_ticks, scheduler=None, telemetry=None, recorder=None):
+    simulation = Simulation(cars, level, sensor, telemetry)
+    ticks = simulation.run(max_ticks, scheduler, recorder)
+    return simulation.fitness(), ticks
+
+'''
+create_population function
+parameters:
+    population_size (int): number of cars
+    level (Level): level object the cars drive on
+    sensor (RaySensor): sensor the cars' neural networks take their inputs from
+    num_hidden_nodes (int): number of nodes in each hidden layer
+    num_hidden_layers (int): number of hidden layers
+results:
+    creates the first generation of cars, each with a new random neural network
+returns:
+    (list) the cars
+'''
+def create_population(population_size, level, sensor, num_hidden_nodes=6, num_hidden_layers=10):
+    cars = list()
+    for _ in range(population_size):
+        car = Car(0, 0, level)
+        car.setup_nn(sensor.num_rays, 3, num_hidden_nodes, num_hidden_layers)
+        cars.append(car)
+    return cars
+
+'''
+train function
+parameters:
+    population_size (int): number of cars in every generation
+    generations (int): number of generations to train for
+    level_settings (4 tuple): path width, path length, min and max segment length of the first level
+    new_level_settings (4 tuple): the same settings for the levels that replace it
+    level_interval (int): a new level is created for every generation number divisible by this
+    percent_taken (float): part of every generation that gets copied into the next one
+    max_cycle_time (int): the most ticks a generation can last
+    seed (int): seed of the random number generator
+    sensor (RaySensor): sensor to use, defaults to the 5 ray sensor
+    on_generation (function): optional function called with every GenerationResult as soon as it is ready
+    evaluate (function): function simulating a generation, evaluate_generation by default (see ParallelEvaluator.evaluate)
+    archive (GenerationArchive): optional archive every ranked generation is added to
+    checkpoint_path (str): optional file the population is saved to every checkpoint_interval generations
+    checkpoint_interval (int): generations between checkpoints
+    resume (bool): carry on from the checkpoint at checkpoint_path, if there is one, instead of starting over from seed
+    use_pool (bool): breed into a GenomePool instead of creating new networks every generation
+    level_provider (LevelProvider): optional provider to get the levels from (level n gets the seed level_seed + n, and the
+        next level is prefetched while the current one is trained on), instead of generating them with the random module
+    scheduler (GenerationScheduler): optional scheduler stopping stalled cars and ending generations early (only
+        with the serial evaluate_generation, as it needs every car of the generation)
+    telemetry (Telemetry): optional telemetry to log every generation to (the phase times are only recorded with the
+        serial evaluate_generation)
+    migrate (function): optional function called with the generation number, ranked cars and their total distances
+        before every breeding, returning the (re-ranked) cars and distances to breed from instead (see islands.py)
+    level_seed (int): seed the level_provider's levels are numbered from, seed by default (so populations with different
+        seeds can share the same levels)
+    record_dir (str): optional directory every record_interval-th generation is recorded to (generation_<n>.traj, see
+        recorder.py), with evaluate_generation or ParallelEvaluator.evaluate
+    record_interval (int): generations between recordings
+    streaming (bool): generate the levels as StreamingLevels (seeded from the random module), which only generate and keep
+        the track near the cars (not with a level_provider, checkpoint_path, record_dir or a parallel evaluate)
+results:
+    runs the same generation and selection loop as main.py as fast as possible, without a display
+returns:
+    (list) a GenerationResult for every generation
+'''
+def train(population_size=50, generations=100, level_settings=(100, 20000, 200, 210), new_level_settings=(100, 20000, 200, 300),
+          level_interval=100, percent_taken=0.5, max_cycle_time=100 * 60, seed=82, sensor=None, on_generation=None, evaluate=None,
+          archive=None, checkpoint_path=None, checkpoint_interval=10, resume=False,
+          use_pool=True, level_provider=None, scheduler=None, telemetry=None, migrate=None, level_seed=None,
+          record_dir=None, record_interval=10, streaming=False):
+    if streaming and (level_provider is not None or checkpoint_path is not None or record_dir is not None):
+        raise ValueError("a streaming level cannot be cached, checkpointed or recorded")
+    if level_seed is None:
+        level_seed = seed
+    if sensor is None:
+        sensor = RaySensor()
+    if evaluate is None:
+        evaluate = functools.partial(evaluate_generation, scheduler=scheduler, telemetry=telemetry)
+    elif scheduler is not None:
+        raise ValueError("a scheduler only works with the serial evaluate_generation")
+
+    # a resumed run continues with the saved cars, level and random state, so it goes on exactly as it would have
+    if resume and checkpoint_path is not None and os.path.exists(checkpoint_path):
+        checkpoint = load_checkpoint(checkpoint_path)
+        level = checkpoint.level
+        cars = checkpoint.restore_cars()
+        checkpoint.restore_random()
+        first_generation = checkpoint.generation
+    else:
+        random.seed(seed)
+        if level_provider is not None:
+            level = level_provider.get_level(level_seed, level_settings)
+        elif streaming:
+            level = StreamingLevel(*level_settings, seed=random.getrandbits(32))
+        else:
+            level = generate_level(level_settings)
+        cars = create_population(population_size, level, sensor)
+        first_generation = 1
+
+    # the pool keeps the networks of every generation the archive still holds as cars valid
+    pool = None
+    if use_pool:
+        nn = cars[0].nn
+        depth = (archive.window if archive is not None else 0) + 2
+        pool = GenomePool((nn.num_in_nodes, nn.num_out_nodes, nn.num_hidden_nodes, nn.num_hidden_layers), len(cars), depth)
+
+    if level_provider is not None:
+        level_provider.prefetch(level_seed + first_generation // level_interval + 1, new_level_settings)
+
+    mutation = None
+    results = list()
+    for generation in range(first_generation, generations + 1):
+
+        # simulates the generation, then ranks its cars
+        if telemetry is not None:
+            telemetry.start_generation()
+        start_time = time.perf_counter()
+        if record_dir is not None and generation % record_interval == 0:
+            recorder = TrajectoryRecorder(len(cars), max_cycle_time)
+            fitness, ticks = evaluate(cars, level, sensor, max_cycle_time, recorder=recorder)
+            recorder.save(os.path.join(record_dir, "generation_" + str(generation) + ".traj"), level, [car.color for car in cars],
+                          generation, fitness)
+        else:
+            fitness, ticks = evaluate(cars, level, sensor, max_cycle_time)
+        ranked_cars, fitness = rank_cars(cars, fitness)
+
+        # the best car's network outlives the pool slot it was bred into, so it gets its own copy (drawing no random numbers)
+        if pool is not None:
+            ranked_cars[0].take_nn(ranked_cars[0].nn.create_from_weights(ranked_cars[0].nn.weights.copy()))
+
+        ticks_saved = scheduler.get_ticks_saved(ticks) if scheduler is not None else 0
+        result = GenerationResult(generation, ticks, fitness, ranked_cars[0], time.perf_counter() - start_time, ticks_saved)
+        results.append(result)
+        if telemetry is not None:
+            telemetry.end_generation(generation, ticks, fitness, mutation, ticks_saved=ticks_saved)
+        if archive is not None:
+            archive.add(generation, ranked_cars, fitness)
+        if on_generation is not None:
+            on_generation(result)
+
+        # creates the next generation (on a new level every level_interval generations)
+        if generation < generations:
+            if migrate is not None:
+                ranked_cars, fitness = migrate(generation, ranked_cars, fitness)
+            if (generation + 1) % level_interval == 0:
+                if level_provider is not None:
+                    level_number = (generation + 1) // level_interval
+                    level = level_provider.get_level(level_seed + level_number, new_level_settings)
+                    level_provider.prefetch(level_seed + level_number + 1, new_level_settings)
+                elif streaming:
+                    level = StreamingLevel(*new_level_settings, seed=random.getrandbits(32))
+                else:
+                    level = generate_level(new_level_settings)
+            cars = breed_generation(ranked_cars, level, percent_taken, pool)
+            if pool is not None:
+                mutation = pool.mutation_stats()
+
+            if checkpoint_path is not None and generation % checkpoint_interval == 0:
+                save_checkpoint(checkpoint_path, generation + 1, cars, level)
+
+    return results
+
+'''
+print_result function
+parameters:
+    result (GenerationResult): the generation to print
+results:
+    prints a one line summary of the generation
+returns:
+    none
+'''
+def print_result(result):
+    print("GEN " + str(result.generation) + ": best " + str(round(result.best_dis, 2)) + ", " + str(result.ticks) +
+          " ticks, " + str(round(result.ticks / max(result.seconds, 1e-9))) + " ticks/sec" +
+          (", " + str(result.ticks_saved) + " ticks saved" if result.ticks_saved else ""))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="trains the cars without opening a window")
+    parser.add_argument('--population', type=int, default=50, help="number of cars in every generation")
+    parser.add_argument('--generations', type=int, default=100, help="number of generations to train for")
+    parser.add_argument('--level', type=int, nargs=4, default=(100, 20000, 200, 210), metavar=('WIDTH', 'LENGTH', 'MIN_SEG', 'MAX_SEG'),
+                        help="settings of the first level")
+    parser.add_argument('--new-level', type=int, nargs=4, default=(100, 20000, 200, 300), metavar=('WIDTH', 'LENGTH', 'MIN_SEG', 'MAX_SEG'),
+                        help="settings of the levels that replace it")
+    parser.add_argument('--level-interval', type=int, default=100, help="generations between new levels")
+    parser.add_argument('--percent-taken', type=float, default=0.5, help="part of every generation kept for the next")
+    parser.add_argument('--max-ticks', type=int, default=100 * 60, help="the most ticks a generation can last")
+    parser.add_argument('--seed', type=int, default=82, help="random seed")
+    parser.add_argument('--processes', type=int, default=1, help="number of worker processes to simulate each generation with")
+    parser.add_argument('--checkpoint', default=None, help="file to save the population to")
+    parser.add_argument('--checkpoint-interval', type=int, default=10, help="generations between checkpoints")
+    parser.add_argument('--resume', action='store_true', help="carry on from the checkpoint file if it exists")
+    parser.add_argument('--level-cache', default=None, help="directory to cache levels in (levels are then seeded per level and prefetched)")
+    parser.add_argument('--cull-stalled', action='store_true', help="stop stalled cars and end generations once the top cars are settled")
+    parser.add_argument('--telemetry', default=None, help="JSONL file to log per generation stats and phase timings to")
+    parser.add_argument('--record', default=None, help="directory to record generations to, for python recorder.py to play back")
+    parser.add_argument('--record-interval', type=int, default=10, help="generations between recordings")
+    parser.add_argument('--tracks', type=int, default=1, help="number of tracks every generation is scored on at once")
+    parser.add_argument('--streaming', action='store_true', help="generate the levels as the cars drive them, only keeping the track near the cars")
+    parser.add_argument('--track-aggregate', choices=('mean', 'min'), default='mean', help="how the distances on every track make the fitness")
+    args = parser.parse_args()
+    if args.cull_stalled and args.processes > 1:
+        parser.error("--cull-stalled needs --processes 1")
+    if args.tracks > 1 and (args.processes > 1 or args.cull_stalled or args.record is not None):
+        parser.error("--tracks needs --processes 1 and no --cull-stalled or --record")
+    if args.streaming and (args.processes > 1 or args.tracks > 1 or args.level_cache is not None or args.checkpoint is not None or args.record is not None):
+        parser.error("--streaming needs --processes 1, --tracks 1 and no --level-cache, --checkpoint or --record")
+
+    level_provider = None
+    if args.level_cache is not None:
+        from level_cache import LevelProvider
+        level_provider = LevelProvider(args.level_cache)
+
+    settings = dict(checkpoint_path=args.checkpoint, checkpoint_interval=args.checkpoint_interval, resume=args.resume,
+                    level_provider=level_provider, record_dir=args.record, record_interval=args.record_interval, streaming=args.streaming)
+    if args.record is not None:
+        os.makedirs(args.record, exist_ok=True)
+    if args.telemetry is not None:
+        from telemetry import Telemetry
+        settings['telemetry'] = Telemetry(args.telemetry, enabled=True)
+    if args.cull_stalled:
+        from scheduler import GenerationScheduler
+        settings['scheduler'] = GenerationScheduler(args.percent_taken, args.max_ticks)
+    if args.tracks > 1:
+        from multi_track import MultiTrackEvaluator, create_levels
+        evaluator = MultiTrackEvaluator(create_levels(args.tracks - 1, args.new_level, args.seed + 1000), args.track_aggregate)
+        train(args.population, args.generations, args.level, args.new_level, args.level_interval, args.percent_taken,
+              args.max_ticks, args.seed, on_generation=print_result, evaluate=evaluator.evaluate, **settings)
+    elif args.processes > 1:
+        from parallel import ParallelEvaluator
+        with ParallelEvaluator(args.processes) as evaluator:
+            train(args.population, args.generations, args.level, args.new_level, args.level_interval, args.percent_taken,
+                  args.max_ticks, args.seed, on_generation=print_result, evaluate=evaluator.evaluate, **settings)
+    else:
+        train(args.population, args.generations, args.level, args.new_level, args.level_interval, args.percent_taken,
+              args.max_ticks, args.seed, on_generation=print_result, **settings)
+
+    if level_provider is not None:
+        level_provider.close()
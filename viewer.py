@@ -0,0 +1,373 @@
+from level_generator import Level
+from level_cache import save_level_table
+from multiprocessing import shared_memory, resource_tracker
+import argparse, os, subprocess, sys, tempfile
+import numpy as np
+
+'''
+snapshot_dtype function
+parameters:
+    capacity (int): the most cars a snapshot can hold
+results:
+    builds the layout of one snapshot slot, aligned so every slot of a ring starts on an 8 byte boundary
+returns:
+    (dtype) numpy structured dtype of a snapshot
+'''
+def snapshot_dtype(capacity):
+    return np.dtype([
+        ('seq', '<i8'),
+        ('tick', '<i8'),
+        ('generation', '<i8'),
+        ('level', '<i8'),
+        ('level_settings', '<f8', (4,)),
+        ('count', '<i8'),
+        ('cx', '<f8'),
+        ('cy', '<f8'),
+        ('x', '<f4', (capacity,)),
+        ('y', '<f4', (capacity,)),
+        ('color', 'u1', (capacity, 3)),
+        ('alive', 'u1', (capacity,)),
+    ], align=True)
+
+'''
+Snapshot Ring Object
+variables:
+    capacity (int): the most cars a snapshot can hold
+    num_slots (int): number of snapshots the ring holds
+    shm (SharedMemory): the shared memory block holding the ring
+    owner (bool): whether this object created the block (and so removes it when closed)
+    latest (ndarray): (1) number of snapshots written so far, the newest one being in slot latest % num_slots
+    slots (ndarray): the snapshot slots, a structured array over the shared memory (see snapshot_dtype)
+    last_read (int): number of the last snapshot read, so the same one is not returned twice
+purpose:
+    passes per-tick snapshots of the cars from the training process to a viewer process through shared memory, without
+    any locks, so writing a snapshot never waits on the viewer
+Notes:
+    Every slot is a seqlock: the writer makes the slot's seq odd, writes the snapshot, then makes it even again, and only
+    then points latest at it. The reader copies the newest slot and keeps the copy only if seq was the same even number
+    before and after, so a snapshot overwritten mid-read is dropped instead of drawn torn. Older snapshots are never
+    read: a slow viewer simply skips to the newest one.
+'''
+class SnapshotRing:
+
+    '''
+    Constructor
+    parameters:
+        capacity (int): the most cars a snapshot can hold
+        num_slots (int): number of snapshots the ring holds
+        name (str): name of an existing ring to attach to, None to create a new one
+    results:
+        creates or attaches to the shared memory block of the ring
+    returns:
+        a snapshot ring object
+    '''
+    def __init__(self, capacity, num_slots=4, name=None):
+        self.capacity = capacity
+        self.num_slots = num_slots
+        self.owner = name is None
+
+        dtype = snapshot_dtype(capacity)
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=8 + num_slots * dtype.itemsize)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # the creating process removes the block, so the attaching process must not have it removed again at exit
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+
+        self.latest = np.ndarray((1,), dtype='<i8', buffer=self.shm.buf)
+        self.slots = np.ndarray((num_slots,), dtype=dtype, buffer=self.shm.buf, offset=8)
+        if self.owner:
+            self.latest[0] = 0
+            self.slots['seq'] = 0
+        self.last_read = 0
+
+    '''
+    name property
+    returns:
+        (str) name of the shared memory block, to attach to the ring from another process
+    '''
+    @property
+    def name(self):
+        return self.shm.name
+
+    '''
+    write function
+    parameters:
+        tick (int): number of the tick the snapshot is of
+        generation (int): number of the generation being simulated
+        level_id (int): id of the level the cars drive on
+        level_settings (4 tuple): path width, path length, min and max segment length of that level
+        cx, cy (floats): camera position
+        x, y (ndarrays): position of every car
+        colors (ndarray): (cars x 3) color of every car
+        alive (ndarray): whether every car is still driving
+    results:
+        writes the snapshot into the slot after the newest one and makes it the newest
+    returns:
+        none
+    '''
+    def write(self, tick, generation, level_id, level_settings, cx, cy, x, y, colors, alive):
+        count = min(len(x), self.capacity)
+        seq = int(self.latest[0]) + 1
+        slot = self.slots[seq % self.num_slots:seq % self.num_slots + 1]
+
+        # an odd seq marks the slot as being written
+        slot['seq'] += 1
+        slot['tick'] = tick
+        slot['generation'] = generation
+        slot['level'] = level_id
+        slot['level_settings'] = level_settings
+        slot['count'] = count
+        slot['cx'] = cx
+        slot['cy'] = cy
+        slot['x'][0, :count] = x[:count]
+        slot['y'][0, :count] = y[:count]
+        slot['color'][0, :count] = colors[:count]
+        slot['alive'][0, :count] = alive[:count]
+        slot['seq'] += 1
+
+        self.latest[0] = seq
+
+    '''
+    read function
+    parameters:
+        none
+    results:
+        copies the newest snapshot out of the ring, if it is newer than the last one read
+    returns:
+        (dict) tick, generation, level, level_settings, cx, cy and the x, y, color and alive arrays of the snapshot's
+        cars, or None if there is no new snapshot or it was overwritten while being copied
+    '''
+    def read(self):
+        seq = int(self.latest[0])
+        if seq == self.last_read:
+            return None
+
+        index = seq % self.num_slots
+        start_seq = int(self.slots['seq'][index])
+        snapshot = self.slots[index].copy()
+        end_seq = int(self.slots['seq'][index])
+        if start_seq % 2 == 1 or start_seq != end_seq:
+            return None
+
+        self.last_read = seq
+        count = int(snapshot['count'])
+        return {
+            'tick': int(snapshot['tick']),
+            'generation': int(snapshot['generation']),
+            'level': int(snapshot['level']),
+            'level_settings': tuple(value.item() for value in snapshot['level_settings']),
+            'cx': float(snapshot['cx']),
+            'cy': float(snapshot['cy']),
+            'x': snapshot['x'][:count],
+            'y': snapshot['y'][:count],
+            'color': snapshot['color'][:count],
+            'alive': snapshot['alive'][:count].astype(bool),
+        }
+
+    '''
+    close function
+    parameters:
+        none
+    results:
+        detaches from the shared memory block, and removes it if this object created it
+    returns:
+        none
+    '''
+    def close(self):
+        self.latest = None
+        self.slots = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+'''
+Viewer Object
+variables:
+    ring (SnapshotRing): the ring the snapshots are written to
+    level_dir (TemporaryDirectory): directory holding the segment table of every level shown so far
+    level (Level): the level of the last published snapshot
+    level_id (int): id of that level (its table is level_dir/level_<id>.npy)
+    level_settings (4 tuple): path width, path length, min and max segment length of that level
+    simulation (Simulation): the simulation of the last published snapshot
+    colors (ndarray): (cars x 3) colors of that simulation's cars
+    process (Popen): the viewer process
+purpose:
+    shows the training in a window drawn by a separate process, so drawing never slows the simulation down
+Notes:
+    The viewer process runs this file as a script (python viewer.py ...), so it works the same with every multiprocessing
+    start method and for scripts without a __main__ guard. A level's segment table is written once to a file the viewer
+    loads when a snapshot first names it, so every snapshot only carries the cars and the camera.
+'''
+class Viewer:
+
+    '''
+    Constructor
+    parameters:
+        capacity (int): the most cars a generation can have
+        res ([int, int]): size of the window
+        fps (int): frames per second the viewer draws at most
+        zoom (float): zoom factor
+        num_slots (int): number of snapshots the ring holds
+    results:
+        creates the snapshot ring and starts the viewer process
+    returns:
+        a viewer object
+    '''
+    def __init__(self, capacity, res=(1200, 700), fps=30, zoom=0.5, num_slots=4):
+        self.ring = SnapshotRing(capacity, num_slots)
+        self.level_dir = tempfile.TemporaryDirectory()
+        self.level = None
+        self.level_id = 0
+        self.level_settings = (0, 0, 0, 0)
+        self.simulation = None
+        self.colors = None
+
+        script = os.path.abspath(__file__)
+        self.process = subprocess.Popen([sys.executable, script, self.ring.name, str(capacity), str(num_slots), self.level_dir.name,
+                                         str(res[0]), str(res[1]), str(fps), str(zoom)], cwd=os.path.dirname(script))
+
+    '''
+    publish function
+    parameters:
+        simulation (Simulation): the simulation to show
+        generation (int): number of the generation being simulated
+        cx, cy (floats): camera position
+    results:
+        shares the simulation's level with the viewer if it is new, and writes a snapshot of the cars to the ring
+    returns:
+        none
+    '''
+    def publish(self, simulation, generation, cx, cy):
+        if simulation.level is not self.level:
+            self.level = simulation.level
+            self.level_id += 1
+            self.level_settings = (self.level.path_width, self.level.path_length, self.level.min_seg_length, self.level.max_seg_length)
+            save_level_table(level_file(self.level_dir.name, self.level_id), self.level.segment_table())
+
+        # the colors of a generation only change with the generation
+        if simulation is not self.simulation:
+            self.simulation = simulation
+            self.colors = np.array([car.color for car in simulation.cars], dtype=np.uint8).reshape(-1, 3)
+
+        physics = simulation.physics
+        self.ring.write(simulation.ticks, generation, self.level_id, self.level_settings, cx, cy, physics.x, physics.y, self.colors, physics.is_alive)
+
+    '''
+    is_open function
+    parameters:
+        none
+    returns:
+        (bool) whether the viewer window is still open
+    '''
+    def is_open(self):
+        return self.process.poll() is None
+
+    '''
+    close function
+    parameters:
+        none
+    results:
+        stops the viewer process, then removes the snapshot ring and the level files
+    returns:
+        none
+    '''
+    def close(self):
+        if self.is_open():
+            self.process.terminate()
+        self.process.wait()
+        self.ring.close()
+        self.level_dir.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+'''
+level_file function
+parameters:
+    level_dir (str): directory holding the shared level tables
+    level_id (int): id of the level
+returns:
+    (str) path of the level's segment table
+'''
+def level_file(level_dir, level_id):
+    return os.path.join(level_dir, "level_" + str(level_id) + ".npy")
+
+'''
+run_viewer function
+parameters:
+    ring (SnapshotRing): the ring to read the snapshots from
+    level_dir (str): directory holding the shared level tables
+    res ([int, int]): size of the window
+    fps (int): frames per second to draw at most
+    zoom (float): zoom factor
+results:
+    opens the window and draws the newest snapshot every frame until the window is closed or the training process ends
+returns:
+    none
+'''
+def run_viewer(ring, level_dir, res, fps, zoom):
+    import pygame
+    from renderer import TrackRenderer, draw_points
+
+    pygame.init()
+    clock = pygame.time.Clock()
+    game_display = pygame.display.set_mode(res)
+    draw_surface = pygame.Surface(res)
+
+    parent = os.getppid()
+    track_renderer = None
+    level_id = None
+    snapshot = None
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+        if os.getppid() != parent:
+            running = False
+
+        # keeps drawing the last snapshot if no new one came in (or the newest one was being overwritten)
+        new_snapshot = ring.read()
+        if new_snapshot is not None:
+            snapshot = new_snapshot
+
+        if snapshot is not None:
+            if snapshot['level'] != level_id:
+                level_id = snapshot['level']
+                level_settings = [int(value) if value == int(value) else value for value in snapshot['level_settings']]
+                track_renderer = TrackRenderer(Level(*level_settings, segments=np.load(level_file(level_dir, level_id))))
+            track_renderer.draw(draw_surface, snapshot['cx'], snapshot['cy'], zoom, res)
+
+            # cars that stopped driving are drawn darker
+            colors = np.where(snapshot['alive'][:, None], snapshot['color'], snapshot['color'] // 2)
+            draw_points(draw_surface, snapshot['x'], snapshot['y'], colors, snapshot['cx'], snapshot['cy'], zoom, res)
+            pygame.display.set_caption("generation " + str(snapshot['generation']) + " - tick " + str(snapshot['tick']))
+
+        game_display.blit(draw_surface, (0, 0))
+        pygame.display.update()
+        clock.tick(fps)
+
+    pygame.quit()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="draws the snapshots a training process writes to a snapshot ring (started by Viewer)")
+    parser.add_argument('ring_name')
+    parser.add_argument('capacity', type=int)
+    parser.add_argument('num_slots', type=int)
+    parser.add_argument('level_dir')
+    parser.add_argument('width', type=int)
+    parser.add_argument('height', type=int)
+    parser.add_argument('fps', type=int)
+    parser.add_argument('zoom', type=float)
+    args = parser.parse_args()
+
+    ring = SnapshotRing(args.capacity, args.num_slots, args.ring_name)
+    try:
+        run_viewer(ring, args.level_dir, [args.width, args.height], args.fps, args.zoom)
+    finally:
+        ring.close()